@@ -0,0 +1,52 @@
+"""Time binding named dims at a call site, for growing numbers of tensor arguments.
+
+Parameter i is annotated "d{i} d{i+1}" and every argument is "8 8", so each argument
+joins the chain of names bound so far; the time per argument must stay flat.
+Exits with status 1 if the largest call is more than --max-ratio times slower per
+argument than the smallest.
+
+Usage: python benchmarks/bench_binding.py [--sizes 100,200,400,800] [--max-ratio 2.0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from myshaping.binding import Bindings, bind_shape
+from myshaping.type_translator import parse_dimstr
+
+def time_call(n_args: int, repeat: int = 5) -> float:
+    params = [parse_dimstr(None, f"d{i} d{i + 1}") for i in range(n_args)]
+    args = parse_dimstr(None, "8 8")
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        bindings = Bindings()
+        deferred: list = []
+        for i, param in enumerate(params):
+            assert bind_shape(bindings, param, args, f"x{i}", deferred) is None
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,200,400,800", help="comma separated argument counts")
+    parser.add_argument("--max-ratio", type=float, default=2.0)
+    args = parser.parse_args()
+
+    per_arg = {}
+    print(f"{'args':>6} {'call (us)':>10} {'per arg (us)':>13}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        elapsed = time_call(size)
+        per_arg[size] = elapsed / size
+        print(f"{size:>6} {elapsed * 1e6:>10.1f} {per_arg[size] * 1e6:>13.3f}")
+    ratio = per_arg[max(per_arg)] / per_arg[min(per_arg)]
+    print(f"per-argument ratio, largest/smallest: {ratio:.2f}")
+    sys.exit(1 if ratio > args.max_ratio else 0)
+
+if __name__ == "__main__":
+    main()
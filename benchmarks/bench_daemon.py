@@ -0,0 +1,104 @@
+"""Time dmypy re-checks after a one-line shape edit, for growing corpus sizes.
+
+For each size, a daemon checks the corpus once; then the shape alias used by the last
+module is edited (which breaks that module) and reverted (which fixes it again), timing
+`dmypy check` each time. The edit must report errors in that module only, and the
+revert must leave no errors. Exits with status 1 otherwise.
+
+Usage: python benchmarks/bench_daemon.py [--sizes 5,20,40] [--functions M] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import ALIASES, PACKAGE, generate, module_shape
+
+def dmypy(workdir: str, *args: str) -> Tuple[float, List[str]]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "mypy.dmypy", "--status-file", os.path.join(workdir, ".dmypy.json"), *args],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode > 1:
+        raise RuntimeError(f"dmypy {' '.join(args)} exited with {proc.returncode}:\n{proc.stdout}")
+    return elapsed, [line for line in proc.stdout.splitlines() if line.startswith(PACKAGE + os.sep)]
+
+def rewrite(path: str, text: str):
+    # dmypy compares mtimes in whole seconds, and the edits keep the file size.
+    stamp = int(os.stat(path).st_mtime) + 2
+    with open(path, "w") as f:
+        f.write(text)
+    os.utime(path, (stamp, stamp))
+
+def bench_size(n_modules: int, n_functions: int) -> Tuple[Dict[str, float], List[str]]:
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        generate(workdir, n_modules, n_functions)
+        with open(os.path.join(workdir, "mypy.ini"), "w") as f:
+            f.write(
+                "[mypy]\n"
+                "ignore_missing_imports = True\n"
+                f"mypy_path = {os.path.join(ROOT, 'myshaping', 'stubs')}\n"
+                f"plugins = {os.path.join(ROOT, 'myshaping', 'check_shape_plugin.py')}\n"
+            )
+        aliases = os.path.join(workdir, PACKAGE, f"{ALIASES}.py")
+        with open(aliases) as f:
+            original = f.read()
+        last = n_modules - 1
+        row = f'Row{last} = Float[Tensor, "1 {module_shape(last)[1]}"]'
+        edited = original.replace(row, row.replace('"1 ', '"2 '))
+        assert edited != original
+
+        dmypy(workdir, "start", "--", "--config-file", "mypy.ini")
+        try:
+            initial, diagnostics = dmypy(workdir, "check", PACKAGE)
+            if diagnostics:
+                failures.append(f"{n_modules} modules, initial: {diagnostics}")
+            rewrite(aliases, edited)
+            edit, diagnostics = dmypy(workdir, "check", PACKAGE)
+            broken = os.path.join(PACKAGE, f"m{last}.py:")
+            if not diagnostics or any(not d.startswith(broken) for d in diagnostics):
+                failures.append(f"{n_modules} modules, edit: expected errors in {broken} only, got {diagnostics}")
+            rewrite(aliases, original)
+            revert, diagnostics = dmypy(workdir, "check", PACKAGE)
+            if diagnostics:
+                failures.append(f"{n_modules} modules, revert: {diagnostics}")
+        finally:
+            dmypy(workdir, "stop")
+    return {"initial": initial, "edit": edit, "revert": revert}, failures
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="5,20,40", help="comma separated module counts")
+    parser.add_argument("--functions", type=int, default=10)
+    parser.add_argument("--output", default="bench_daemon.json")
+    args = parser.parse_args()
+
+    results = {}
+    failures: List[str] = []
+    print(f"{'modules':>8} {'initial (s)':>12} {'edit (s)':>9} {'revert (s)':>11}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        times, size_failures = bench_size(size, args.functions)
+        results[size] = times
+        failures.extend(size_failures)
+        print(f"{size:>8} {times['initial']:>12.2f} {times['edit']:>9.3f} {times['revert']:>11.3f}")
+
+    with open(args.output, "w") as f:
+        json.dump({"functions": args.functions, "runs": results, "failures": failures}, f, indent=2)
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Count plugin hook calls per operator expression on code annotated with dtype categories.
+
+Usage: python benchmarks/bench_dtype_sets.py [--exprs N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from myshaping import registry
+
+CASES = [
+    ("Float32", "Float32"),
+    ("Float", "Float32"),
+    ("Float", "Float"),
+    ("Real", "Float32"),
+    ("Num", "Num"),
+]
+
+def make_source(x_dtype: str, y_dtype: str, n_exprs: int) -> str:
+    lines = [
+        "from jaxtyping import Float, Float32, Num, Real",
+        "from torch import Tensor",
+        "",
+        f'def f(x: {x_dtype}[Tensor, "8 16"], y: {y_dtype}[Tensor, "8 16"]) -> None:',
+    ]
+    lines.extend(f"    z{i} = x + y" for i in range(n_exprs))
+    return "\n".join(lines) + "\n"
+
+def count_hook_calls() -> Counter:
+    """Count the calls of the method hooks that the plugin gets from the registry.
+
+    The hook modules are imported on the first lookup, and the array operators are registered
+    for a whole family of classes, so the lookup is wrapped rather than METHOD_HOOKS. mypy
+    imports the plugin from its path after this, and so binds the wrapped lookup."""
+    calls: Counter = Counter()
+    get_method_hook = registry.get_method_hook
+    def counting_get_method_hook(name: str):
+        hook = get_method_hook(name)
+        if hook is None:
+            return None
+        def counted(ctx):
+            calls[hook.__name__] += 1
+            return hook(ctx)
+        counted.__name__ = hook.__name__
+        return counted
+    registry.get_method_hook = counting_get_method_hook
+    return calls
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--exprs", type=int, default=50)
+    args = parser.parse_args()
+
+    from mypy import api
+    calls = count_hook_calls()
+    print(f"{'self':>8} {'other':>8} {'hook calls/expr':>16} {'time (s)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for x_dtype, y_dtype in CASES:
+            path = os.path.join(tmp, f"case_{x_dtype}_{y_dtype}.py")
+            with open(path, "w") as f:
+                f.write(make_source(x_dtype, y_dtype, args.exprs))
+            calls.clear()
+            start = time.perf_counter()
+            api.run([
+                "--config-file", os.path.join(ROOT, "pyproject.toml"),
+                "--cache-dir", os.path.join(tmp, ".mypy_cache"),
+                path,
+            ])
+            elapsed = time.perf_counter() - start
+            per_expr = sum(calls.values()) / args.exprs
+            print(f"{x_dtype:>8} {y_dtype:>8} {per_expr:>16.1f} {elapsed:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Measure the cost of ShapePlugin hook lookups.
+
+Records every fullname mypy asks the plugin about while checking the given files
+(default: test.py, which pulls in the whole torch package), then times
+get_function_hook/get_method_hook over the recorded names.
+
+Usage: python benchmarks/bench_hook_dispatch.py [files ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mypy import api
+from mypy.options import Options
+
+from myshaping.check_shape_plugin import ShapePlugin
+
+def record_fullnames(files):
+    with tempfile.TemporaryDirectory() as tmp:
+        config = os.path.join(tmp, "mypy.ini")
+        with open(config, "w") as f:
+            f.write(
+                "[mypy]\n"
+                "ignore_missing_imports = True\n"
+                f"plugins = {os.path.join(ROOT, 'benchmarks', 'recording_plugin.py')}\n"
+                f"mypy_path = {os.path.join(ROOT, 'myshaping', 'stubs')}\n"
+            )
+        api.run(["--config-file", config, "--cache-dir", os.path.join(tmp, "cache"), *files])
+    return sys.modules["recording_plugin"].RECORDED
+
+def time_lookups(lookup, names, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in names:
+            lookup(name)
+        best = min(best, time.perf_counter() - start)
+    return best / max(len(names), 1)
+
+def main():
+    files = sys.argv[1:] or [os.path.join(ROOT, "test.py")]
+    recorded = record_fullnames(files)
+    plugin = ShapePlugin(Options())
+    for kind, lookup in [("function", plugin.get_function_hook), ("method", plugin.get_method_hook)]:
+        names = recorded[kind]
+        hits = sum(lookup(name) is not None for name in names)
+        per_lookup = time_lookups(lookup, names)
+        print(f"{kind:>8}: {len(names):>7} lookups, {hits:>5} hooked, {per_lookup * 1e9:7.1f} ns/lookup")
+
+if __name__ == "__main__":
+    main()
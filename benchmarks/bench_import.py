@@ -0,0 +1,65 @@
+"""Time importing the plugin, on top of the mypy modules that are loaded before it.
+
+Runs `python -X importtime` in fresh processes and reads the cumulative time of
+myshaping.check_shape_plugin. Also reports the hook modules that are imported on first
+use (torch and jaxtyping names). Exits with status 1 if the plugin import takes longer
+than --max-ms, or if it imports jaxtyping, numpy or torch.
+
+Usage: python benchmarks/bench_import.py [--repeat 5] [--max-ms 40]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What mypy has imported by the time it loads a plugin.
+PRELUDE = "import mypy.build, mypy.checker, mypy.plugin, mypy.semanal"
+FORBIDDEN = ("jaxtyping", "numpy", "torch")
+LAZY = ["myshaping.torch_function_hooks", "myshaping.tensor_method_hooks", "myshaping.torch_rule_hooks"]
+
+_line = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def importtime(statement: str) -> List[Tuple[str, int, int]]:
+    """(module, cumulative us, depth) of every module imported by statement, after PRELUDE."""
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); {PRELUDE}; sys.stderr.write('--\\n'); {statement}"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.split("--\n", 1)[1].splitlines():
+        match = _line.match(line)
+        if match:
+            modules.append((match[4], int(match[2]), len(match[3]) // 2))
+    return modules
+
+def best(statement: str, module: str, repeat: int) -> Tuple[float, List[str]]:
+    times = []
+    imported: List[str] = []
+    for _ in range(repeat):
+        modules = importtime(statement)
+        imported = [name for name, _, _ in modules]
+        times.append(sum(us for name, us, _ in modules if name == module) / 1e3)
+    return min(times), imported
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    plugin_ms, imported = best("import myshaping.check_shape_plugin", "myshaping.check_shape_plugin", args.repeat)
+    forbidden = sorted({name for name in imported if name.split(".")[0] in FORBIDDEN})
+    print(f"plugin import: {plugin_ms:.1f} ms, {len(imported)} modules")
+    lazy: Dict[str, float] = {}
+    for module in LAZY:
+        lazy[module], _ = best(f"import myshaping.check_shape_plugin; import {module}", module, args.repeat)
+        print(f"  on first use: {module} {lazy[module]:.1f} ms")
+    if forbidden:
+        print(f"plugin import loads {', '.join(forbidden)}")
+    sys.exit(1 if forbidden or plugin_ms > args.max_ms else 0)
+
+if __name__ == "__main__":
+    main()
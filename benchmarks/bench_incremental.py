@@ -0,0 +1,116 @@
+"""Check and time incremental mypy runs with ShapePlugin over a synthetic corpus.
+
+Runs, all sharing one cache directory:
+
+    cold          empty cache
+    warm          nothing changed: no corpus module may be rechecked
+    edit-leaf     the last module reveals the signature it imports from the previous
+                  module: only it is rechecked, against the cached (deserialized)
+                  jaxtyping types, and the diagnostics must match a cold run of the
+                  same sources
+    config        `packages` gains an unrelated package: no module changes scope,
+                  so nothing is rechecked
+    warm-again    nothing changed
+
+From edit-leaf on, the leaf is rechecked by every run: mypy does not cache modules
+with diagnostics, and reveal_type leaves a note.
+
+Exits with status 1 when a run rechecks other modules than expected or the
+diagnostics differ, so it doubles as a regression test for the cache support.
+
+Usage: python benchmarks/bench_incremental.py [--modules N] [--functions M] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import ALIASES, PACKAGE, generate
+
+SCC_LOG = re.compile(r"Processing SCC (?:singleton|of size \d+) \((.*)\) as (.*)")
+
+def write_config(path: str, packages: List[str]):
+    with open(path, "w") as f:
+        f.write(
+            "[mypy]\n"
+            "ignore_missing_imports = True\n"
+            f"mypy_path = {os.path.join(ROOT, 'myshaping', 'stubs')}\n"
+            f"plugins = {os.path.join(ROOT, 'myshaping', 'check_shape_plugin.py')}\n"
+            "\n[myshaping]\n"
+            f"packages = {', '.join(packages)}\n"
+        )
+
+def run_mypy(workdir: str, config: str, cache_dir: str) -> Tuple[float, Set[str], List[str]]:
+    """Return the wall time, the rechecked corpus modules and the diagnostics for corpus files."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "mypy", "-v", "--config-file", config, "--cache-dir", cache_dir, PACKAGE],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode > 1:
+        raise RuntimeError(f"mypy exited with {proc.returncode}:\n{proc.stdout}\n{proc.stderr[-2000:]}")
+    rechecked = set()
+    for match in SCC_LOG.finditer(proc.stderr):
+        if match.group(2) != "fresh":
+            rechecked.update(m for m in match.group(1).split() if m.startswith(PACKAGE + "."))
+    diagnostics = [line for line in proc.stdout.splitlines() if line.startswith(PACKAGE + os.sep)]
+    return elapsed, rechecked, diagnostics
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--functions", type=int, default=10)
+    parser.add_argument("--output", default="bench_incremental.json")
+    args = parser.parse_args()
+
+    modules = [f"{PACKAGE}.m{i}" for i in range(args.modules)]
+    leaf = modules[-1]
+    every_module = set(modules) | {f"{PACKAGE}.{ALIASES}"}
+    results: Dict[str, dict] = {}
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = generate(workdir, args.modules, args.functions)
+        config = os.path.join(workdir, "mypy.ini")
+        cache_dir = os.path.join(workdir, ".mypy_cache")
+        write_config(config, [PACKAGE])
+
+        def step(name: str, expected: Set[str], cache_dir: str = cache_dir):
+            elapsed, rechecked, diagnostics = run_mypy(workdir, config, cache_dir)
+            results[name] = {"seconds": elapsed, "rechecked": sorted(rechecked)}
+            print(f"{name:>12}: {elapsed:7.2f} s, {len(rechecked):>3} corpus modules rechecked")
+            if rechecked != expected:
+                failures.append(f"{name}: rechecked {sorted(rechecked)}, expected {sorted(expected)}")
+            return diagnostics
+
+        step("cold", every_module)
+        step("warm", set())
+        with open(paths[-1], "a") as f:
+            f.write("\nreveal_type(prev)\n")
+        edited = step("edit-leaf", {leaf})
+        reference = step("cold-edited", every_module, cache_dir=os.path.join(workdir, ".mypy_cache_reference"))
+        if not edited or edited != reference:
+            failures.append(f"edit-leaf: diagnostics {edited} differ from a cold run: {reference}")
+        write_config(config, [PACKAGE, "unrelated"])
+        step("config", {leaf})
+        step("warm-again", {leaf})
+
+    with open(args.output, "w") as f:
+        json.dump({"corpus": {"modules": args.modules, "functions": args.functions},
+                   "runs": results, "failures": failures}, f, indent=2)
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Time cold and warm mypy runs over a synthetic corpus, with and without ShapePlugin.
+
+A cold run starts from an empty cache directory; a warm run repeats it on the cache
+the cold run left behind. Every run is a fresh mypy process.
+
+Results go to a JSON file. With --thresholds, the summary is compared against the
+maxima in that file (see benchmarks/thresholds.json) and the script exits with
+status 1 when any of them is exceeded, so that CI can enforce them.
+
+Usage: python benchmarks/bench_mypy_runs.py [--modules N] [--functions M] [--repeat R]
+                                             [--output results.json] [--thresholds benchmarks/thresholds.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import PACKAGE, generate
+
+VARIANTS = ["plugin", "no_plugin"]
+
+def write_config(path: str, with_plugin: bool):
+    with open(path, "w") as f:
+        f.write(
+            "[mypy]\n"
+            "ignore_missing_imports = True\n"
+            f"mypy_path = {os.path.join(ROOT, 'myshaping', 'stubs')}\n"
+        )
+        if with_plugin:
+            f.write(f"plugins = {os.path.join(ROOT, 'myshaping', 'check_shape_plugin.py')}\n")
+
+def run_mypy(workdir: str, config: str, cache_dir: str) -> float:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "mypy", "--config-file", config, "--cache-dir", cache_dir, PACKAGE],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    # 0: clean, 1: type errors. Anything else is a crash or a usage error.
+    if proc.returncode > 1:
+        raise RuntimeError(f"mypy exited with {proc.returncode}:\n{proc.stdout}")
+    return elapsed
+
+def bench(workdir: str, repeat: int) -> Dict[str, Dict[str, List[float]]]:
+    runs: Dict[str, Dict[str, List[float]]] = {}
+    for variant in VARIANTS:
+        config = os.path.join(workdir, f"{variant}.ini")
+        write_config(config, with_plugin=variant == "plugin")
+        cache_dir = os.path.join(workdir, f".mypy_cache_{variant}")
+        runs[variant] = {"cold": [], "warm": []}
+        for _ in range(repeat):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            runs[variant]["cold"].append(run_mypy(workdir, config, cache_dir))
+            runs[variant]["warm"].append(run_mypy(workdir, config, cache_dir))
+    return runs
+
+def summarize(runs: Dict[str, Dict[str, List[float]]]) -> Dict[str, float]:
+    summary = {}
+    for variant, kinds in runs.items():
+        for kind, times in kinds.items():
+            summary[f"{variant}.{kind}"] = statistics.median(times)
+    for kind in ["cold", "warm"]:
+        summary[f"overhead.{kind}"] = summary[f"plugin.{kind}"] / summary[f"no_plugin.{kind}"]
+    return summary
+
+def check_thresholds(summary: Dict[str, float], thresholds: Dict[str, float]) -> List[str]:
+    failures = []
+    for key, limit in thresholds.items():
+        if key not in summary:
+            failures.append(f"{key}: unknown metric")
+        elif summary[key] > limit:
+            failures.append(f"{key}: {summary[key]:.3f} > {limit}")
+    return failures
+
+def environment() -> Dict[str, str]:
+    import mypy.version
+    env = {"python": platform.python_version(), "platform": platform.platform(), "mypy": mypy.version.__version__}
+    try:
+        import torch
+        env["torch"] = torch.__version__
+    except ImportError:
+        pass
+    return env
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=int, default=20)
+    parser.add_argument("--functions", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_mypy_runs.json")
+    parser.add_argument("--thresholds", help="JSON file of metric -> maximum")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        generate(workdir, args.modules, args.functions)
+        runs = bench(workdir, args.repeat)
+    summary = summarize(runs)
+    result = {
+        "corpus": {"modules": args.modules, "functions": args.functions},
+        "repeat": args.repeat,
+        "environment": environment(),
+        "runs": runs,
+        "summary": summary,
+    }
+    failures = []
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+        failures = check_thresholds(summary, thresholds)
+        result["thresholds"] = thresholds
+        result["failures"] = failures
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    for key, value in summary.items():
+        print(f"{key:>16}: {value:8.3f}")
+    for failure in failures:
+        print(f"threshold exceeded: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
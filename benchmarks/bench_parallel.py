@@ -0,0 +1,122 @@
+"""Time `myshaping check -j N` against one mypy process on the synthetic corpus.
+
+The corpus is --modules modules in import chains of --chain modules (see corpus.py), checked
+with the generated torch stubs (python -m myshaping.stubgen), from an empty cache each time.
+For every N, reports:
+
+    wall       the elapsed time of `myshaping check -j N`
+    projected  the same schedule replayed one mypy process at a time on a virtual clock
+               with N slots: the wall time with N free cores, which this machine may not have
+    work       the time of every mypy process of the schedule added up
+
+Usage: python benchmarks/bench_parallel.py [--modules N] [--functions M] [--chain L] [--jobs 1 4 16] [--output results.json]
+"""
+
+import argparse
+import heapq
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mypy.main import process_options
+
+from benchmarks.corpus import PACKAGE, generate
+from myshaping.driver import Scheduler, _prime_file, plan, run_mypy
+from myshaping.stubgen import ensure_stubs
+
+def write_config(workdir: str) -> str:
+    config = os.path.join(workdir, "mypy.ini")
+    stubs = os.path.join(ROOT, "myshaping", "stubs")
+    with open(config, "w") as f:
+        f.write(
+            "[mypy]\n"
+            "ignore_missing_imports = True\n"
+            f"mypy_path = {ensure_stubs(os.path.join(workdir, 'stubgen'))}{os.pathsep}{stubs}\n"
+            f"plugins = {os.path.join(ROOT, 'myshaping', 'check_shape_plugin.py')}\n"
+        )
+    return config
+
+def timed(command: List[str], workdir: str, env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    proc = subprocess.run(command, cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if proc.returncode > 1:
+        raise RuntimeError(f"{' '.join(command)} exited with {proc.returncode}:\n{proc.stdout}")
+    return time.perf_counter() - start
+
+def projected(workdir: str, config: str, cache_dir: str, jobs: int) -> Dict[str, float]:
+    """Replay the schedule of `myshaping check -j jobs` on a virtual clock, running one mypy at a time."""
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        sources, options = process_options(["--config-file", config, PACKAGE])
+        runs = plan(sources, jobs)
+        args = ["--config-file", config, "--cache-dir", cache_dir, "--follow-imports", "silent", "--no-error-summary"]
+        base = check(run_mypy(args, [*(s.path for s in runs.base), _prime_file(cache_dir, runs.externals)]))
+        scheduler = Scheduler(runs.clusters, jobs)
+        clock, work = base, base
+        running: List[Tuple[float, List[int]]] = []
+        while True:
+            while len(running) < jobs:
+                batch = scheduler.take()
+                if batch is None:
+                    break
+                seconds = check(run_mypy(args, [s.path for s in scheduler.sources(batch)]))
+                work += seconds
+                heapq.heappush(running, (clock + seconds, batch))
+            if not running:
+                break
+            clock, batch = heapq.heappop(running)
+            scheduler.done(batch)
+    finally:
+        os.chdir(cwd)
+    return {"base": base, "projected": clock, "work": work}
+
+def check(result: Tuple[int, str, float]) -> float:
+    returncode, output, seconds = result
+    if returncode > 1:
+        raise RuntimeError(f"mypy exited with {returncode}:\n{output}")
+    return seconds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=int, default=256)
+    parser.add_argument("--functions", type=int, default=10)
+    parser.add_argument("--chain", type=int, default=4)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--output", default="bench_parallel.json")
+    args = parser.parse_args()
+
+    # The shards of projected() run with this environment too.
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))
+    env = dict(os.environ)
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        generate(workdir, args.modules, args.functions, args.chain)
+        config = write_config(workdir)
+        cache_dir = os.path.join(workdir, ".mypy_cache")
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        single = timed([sys.executable, "-m", "mypy", "--config-file", config, "--cache-dir", cache_dir, PACKAGE], workdir, env)
+        print(f"cpus: {os.cpu_count()}")
+        print(f"mypy: {single:.2f} s")
+        print(f"{'jobs':>5} {'wall (s)':>9} {'speedup':>8} {'projected':>10} {'speedup':>8} {'work (s)':>9}")
+        for jobs in args.jobs:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            wall = timed([sys.executable, "-m", "myshaping", "check", "--config-file", config, "-j", str(jobs), PACKAGE], workdir, env)
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            result = {"wall": wall, **projected(workdir, config, cache_dir, jobs)} if jobs > 1 else {"wall": wall, "projected": wall, "work": wall}
+            results[str(jobs)] = result
+            print(f"{jobs:>5} {wall:>9.2f} {single / wall:>7.2f}x {result['projected']:>10.2f} {single / result['projected']:>7.2f}x {result['work']:>9.2f}")
+    with open(args.output, "w") as f:
+        json.dump({"cpus": os.cpu_count(), "corpus": {"modules": args.modules, "functions": args.functions, "chain": args.chain},
+                   "mypy": single, "check": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Time runtime shape checks per call on small CPU tensors.
+
+Compares an undecorated function with jaxtyped+beartype and with myshaping.runtime.shapecheck
+(cached, 1 in 10 calls, first 4 signatures), for a 2-argument and an 8-argument function.
+The functions return their first argument, so the time is dominated by the checks.
+
+Usage: python benchmarks/bench_runtime.py [--calls N] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import Callable, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import torch
+from jaxtyping import Float32, jaxtyped
+from torch import Tensor
+
+from myshaping.runtime import shapecheck
+
+def two(x: Float32[Tensor, "b n"], y: Float32[Tensor, "n m"]) -> Float32[Tensor, "b n"]:
+    return x
+
+def eight(
+    a: Float32[Tensor, "b c"], b: Float32[Tensor, "b c"], c: Float32[Tensor, "c d"], d: Float32[Tensor, "d"],
+    e: Float32[Tensor, "*batch d"], f: Float32[Tensor, "*batch d"], g: Float32[Tensor, "b 2*c"], h: Float32[Tensor, "..."],
+) -> Float32[Tensor, "b c"]:
+    return a
+
+def arguments(fn: Callable):
+    if fn is two:
+        return torch.randn(8, 16), torch.randn(16, 4)
+    return (torch.randn(8, 16), torch.randn(8, 16), torch.randn(16, 4), torch.randn(4),
+            torch.randn(2, 3, 4), torch.randn(2, 3, 4), torch.randn(8, 32), torch.randn(5))
+
+def decorators() -> Dict[str, Callable]:
+    result: Dict[str, Callable] = {"undecorated": lambda fn: fn}
+    try:
+        from beartype import beartype
+    except ImportError:
+        print("beartype is not installed, skipping jaxtyped+beartype", file=sys.stderr)
+    else:
+        result["jaxtyped+beartype"] = jaxtyped(typechecker=beartype)
+    result["shapecheck"] = shapecheck
+    result["shapecheck(every=10)"] = shapecheck(every=10)
+    result["shapecheck(first=4)"] = shapecheck(first=4)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--output", default="bench_runtime.json")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'decorator':>22} {'2 args (us)':>12} {'8 args (us)':>12}")
+    for name, decorate in decorators().items():
+        row = results[name] = {}
+        for fn in (two, eight):
+            wrapped = decorate(fn)
+            values = arguments(fn)
+            wrapped(*values)  # warm up the caches
+            row[fn.__name__] = min(timeit.repeat(lambda: wrapped(*values), number=args.calls, repeat=3)) / args.calls * 1e6
+        print(f"{name:>22} {row['two']:>12.2f} {row['eight']:>12.2f}")
+
+    with open(args.output, "w") as f:
+        json.dump({"calls": args.calls, "microseconds_per_call": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
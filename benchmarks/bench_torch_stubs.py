@@ -0,0 +1,93 @@
+"""Time cold mypy runs over the synthetic corpus with three sources of torch types:
+
+    real       the installed torch package (mypy_path has only the jaxtyping stubs)
+    stub       the hand-written myshaping/stubs/torch, which loads the real torch._tensor
+    generated  the pruned stubs of python -m myshaping.stubgen in front of myshaping/stubs
+
+Every run is a fresh mypy process with an empty cache. Also reports how many files mypy
+read and how many errors it reported, since stubs that are too small show up as errors.
+
+Usage: python benchmarks/bench_torch_stubs.py [--modules N] [--functions M] [--repeat R] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import PACKAGE, generate
+from myshaping.stubgen import ensure_stubs
+
+STUBS = os.path.join(ROOT, "myshaping", "stubs")
+
+def mypy_paths(workdir: str) -> Dict[str, List[str]]:
+    jaxtyping_only = os.path.join(workdir, "jaxtyping_stubs")
+    os.makedirs(jaxtyping_only, exist_ok=True)
+    os.symlink(os.path.join(STUBS, "jaxtyping"), os.path.join(jaxtyping_only, "jaxtyping"))
+    return {
+        "real": [jaxtyping_only],
+        "stub": [STUBS],
+        "generated": [ensure_stubs(os.path.join(workdir, "generated")), STUBS],
+    }
+
+def run_mypy(workdir: str, mypy_path: List[str]) -> Dict[str, float]:
+    config = os.path.join(workdir, "mypy.ini")
+    with open(config, "w") as f:
+        f.write(
+            "[mypy]\n"
+            "ignore_missing_imports = True\n"
+            f"mypy_path = {os.pathsep.join(mypy_path)}\n"
+            f"plugins = {os.path.join(ROOT, 'myshaping', 'check_shape_plugin.py')}\n"
+        )
+    cache_dir = os.path.join(workdir, ".mypy_cache")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "mypy", "--config-file", config, "--cache-dir", cache_dir, PACKAGE],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode > 1:
+        raise RuntimeError(f"mypy exited with {proc.returncode}:\n{proc.stdout}")
+    errors = re.search(r"Found (\d+) errors?", proc.stdout)
+    files = sum(len(names) for _, _, names in os.walk(cache_dir) if names) // 2  # one .meta.json and one .data.json per module
+    return {"seconds": elapsed, "errors": int(errors[1]) if errors else 0, "modules": files}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--functions", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="bench_torch_stubs.json")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        generate(workdir, args.modules, args.functions)
+        start = time.perf_counter()
+        paths = mypy_paths(workdir)
+        generate_seconds = time.perf_counter() - start
+        print(f"stubgen: {generate_seconds:.1f} s")
+        print(f"{'torch types':>12} {'cold (s)':>9} {'modules':>8} {'errors':>7}")
+        for variant, mypy_path in paths.items():
+            runs = [run_mypy(workdir, mypy_path) for _ in range(args.repeat)]
+            results[variant] = {**runs[-1], "seconds": statistics.median(r["seconds"] for r in runs)}
+            r = results[variant]
+            print(f"{variant:>12} {r['seconds']:>9.2f} {r['modules']:>8} {r['errors']:>7}")
+    with open(args.output, "w") as f:
+        json.dump({"corpus": {"modules": args.modules, "functions": args.functions},
+                   "stubgen_seconds": generate_seconds, "cold": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Check every rule of myshaping/shape_rules.py against real CPU torch and numpy, and time compiling them.
+
+Each rule is applied to example calls on concrete tensors, and the inferred shape, dtype
+and layout are compared with what torch returns ("_" in an inferred shape matches any size;
+a contiguous layout must be is_contiguous(), and strides must match on the dims larger
+than 1). INDEXING checks x[...] the same way. Calls in ERRORS must fail both in torch and
+in the rule. Exits with status 1 on any mismatch, on a rule without examples, or if
+compiling the rules takes longer than --max-compile-ms.
+
+Usage: python benchmarks/check_shape_rules.py [--max-compile-ms 50] [-v]
+"""
+
+import argparse
+import inspect
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import torch
+
+from myshaping.layouts import CONTIGUOUS, LAYOUT_FUNCTIONS, LAYOUT_OPS, allocated
+from myshaping.shape_functions import SHAPE_FUNCTIONS, ShapeError, TensorIndex, Unknown
+from myshaping.symbolic import constant
+from myshaping.torch_function_hooks import dtype_mapper
+from myshaping.torch_rule_hooks import FUNCTION_RULES, METHOD_RULES, NUMPY_FULLNAMES, Operand, apply_layout, apply_rule, compile_rules, parse_rule
+from myshaping.shape_rules import RULES
+from myshaping.type_translator import AnonymousDim, FixedDim, dtype_masks
+
+torch.manual_seed(0)
+NAMESPACE: Dict[str, Any] = {
+    "torch": torch,
+    "np": np,
+    "x": torch.randn(2, 3, 4),
+    "z": torch.randn(3, 1),
+    "y": torch.randn(4, 5),
+    "s": torch.randn(3, 3),
+    "v": torch.randn(4),
+    "w": torch.randn(3),
+    "bb": torch.randn(2, 4, 5),
+    "i": torch.randint(0, 3, (2, 3, 4)),
+    "m": torch.rand(2, 3, 4) > 0.5,
+}
+NAMESPACE["xt"] = NAMESPACE["x"].transpose(0, 2)  # not contiguous, strides (1, 4, 12)
+NAMESPACE["j"] = torch.tensor([1, 0])
+NAMESPACE["a"] = NAMESPACE["x"].numpy()
+
+# Arguments of example calls, by member name or by "torch.f"/"Tensor.f"/"np.f". For Tensor.f
+# the first argument is self.
+_elementwise = ["x", "i"]
+_float = ["x", "i"]
+_binary = ["x, z", "x, 2", "i, x", "i, 2.5"]
+_like = ["x", "x, dtype=torch.float64"]
+_reduce = ["x", "x, 1", "x, (0, 2), True"]
+_matmul = ["x, y", "v, y", "x, v", "v, v", "torch.randn(5, 1, 3, 4), y", "bb, torch.randn(5, 2)"]
+EXAMPLES: Dict[str, List[str]] = {
+    **{op: _elementwise for op in ["abs", "neg", "negative", "sign", "square", "clone", "detach", "relu",
+                                   "floor", "ceil", "round", "trunc"]},
+    "contiguous": ["x", "xt"],
+    "frac": ["x"],
+    **{op: ["s", "x"] for op in ["tril", "triu", "fliplr", "flipud"]},
+    "flip": ["x, [0, 2]"],
+    "roll": ["x, 1", "x, 1, 0"],
+    **{op: _float for op in ["exp", "exp2", "expm1", "log", "log2", "log10", "log1p", "sqrt", "rsqrt", "sigmoid",
+                             "tanh", "sin", "cos", "tan", "asin", "acos", "atan", "sinh", "cosh", "erf", "erfc",
+                             "reciprocal"]},
+    **{op: ["x, -1, 1", "x, min=0"] for op in ["clamp", "clip"]},
+    **{op: ["x, -1", "x, 1, dtype=torch.float64"] for op in ["softmax", "log_softmax"]},
+    **{op: ["x, 1", "i, 0", "x, 0, dtype=torch.float64"] for op in ["cumsum", "cumprod"]},
+    **{op: ["x"] for op in ["isnan", "isinf", "isfinite"]},
+    "logical_not": ["m", "x"],
+    **{op: _like for op in ["zeros_like", "ones_like", "empty_like", "rand_like", "randn_like"]},
+    "full_like": ["x, 2.0", "x, 1, dtype=torch.int64"],
+    "type_as": ["x, i", "i, x"],
+    **{op: _binary for op in ["add", "sub", "subtract", "mul", "multiply", "fmod", "remainder", "pow"]},
+    **{op: ["x, z", "i, x"] for op in ["maximum", "minimum", "atan2"]},
+    **{op: ["x, z", "i, 2", "i, i"] for op in ["div", "true_divide"]},
+    **{op: ["x, z", "x, 0", "i, x"] for op in ["eq", "ne", "lt", "le", "gt", "ge"]},
+    **{op: ["m, m", "x, z"] for op in ["logical_and", "logical_or", "logical_xor"]},
+    "where": ["m, x, 0.0", "m, x, z", "m, i, x"],
+    "masked_fill": ["x, m, 0.0", "x, torch.rand(3, 1) > 0.5, 1.0"],
+    **{op: [*_reduce, "i, -1", "x, 1, dtype=torch.float64"] for op in ["sum", "nansum"]},
+    **{op: _reduce for op in ["mean", "nanmean", "amax", "amin"]},
+    "prod": ["x", "x, 1, True", "i, 0"],
+    **{op: ["x", "x, 1", "x, (0, 2), keepdim=True"] for op in ["std", "var"]},
+    "logsumexp": ["x, 1", "x, (0, 1), True"],
+    **{op: ["x", "x, 1", "x, -1, True"] for op in ["argmax", "argmin"]},
+    **{op: ["m", "m, 1", "x, 1, True"] for op in ["all", "any"]},
+    "count_nonzero": ["x", "x, 1", "x, (0, 2)"],
+    **{op: ["x, 0, 2", "x, -1, 1", "xt, 0, 1"] for op in ["transpose", "swapaxes", "swapdims"]},
+    "t": ["s", "w", "y", "y.t()"],
+    "adjoint": ["x", "s", "xt"],
+    "torch.permute": ["x, (2, 0, 1)"],
+    "Tensor.permute": ["x, 2, 0, 1", "x, (1, 0, 2)", "xt, 2, 1, 0"],
+    **{op: ["x, 0, 2", "x, -1, 0", "xt, 0, 2"] for op in ["movedim", "moveaxis"]},
+    "torch.reshape": ["x, (6, 4)", "x, (-1, 2)", "xt, (-1,)"],
+    "view": ["x, 6, 4", "x, (4, -1)", "x, -1", "xt, 4, 3, 2", "xt, 2, 2, 3, 2"],
+    "Tensor.reshape": ["x, 6, 4", "x, (4, -1)", "x, -1", "xt, 4, 6", "xt, 2, 2, 3, 2"],
+    "view_as": ["x, torch.randn(6, 4)", "xt, torch.randn(4, 3, 1, 2)"],
+    "reshape_as": ["x, torch.randn(6, 4)", "xt, torch.randn(6, 4)"],
+    "flatten": ["x", "x, 1", "x, 0, 1", "xt", "xt, 0, 0", "x.transpose(1, 2), 0, 1"],
+    "ravel": ["x", "xt"],
+    "unflatten": ["x, 2, (2, 2)", "x, 1, (3, -1)", "xt, 0, (2, 2)"],
+    "unsqueeze": ["x, 0", "x, -1", "xt, 1", "xt, -1"],
+    "squeeze": ["torch.randn(2, 1, 3)", "torch.randn(2, 1, 3), 1", "torch.randn(2, 1, 3), 0", "torch.randn(2, 1, 3).transpose(0, 2)"],
+    "expand": ["z, 2, 3, 4", "z, (-1, 5)", "xt, 2, 4, 3, 2"],
+    "expand_as": ["z, x"],
+    "repeat": ["z, 2, 2", "z, 2, 1, 3"],
+    "torch.tile": ["z, (2,)", "x, (2, 1, 1)"],
+    "Tensor.tile": ["z, 2", "x, 2, 1, 1"],
+    "narrow": ["x, 1, 0, 2", "x, -1, 1, 3", "xt, 0, 1, 2"],
+    "select": ["x, 1, 2", "x, -1, 0", "xt, 1, 0"],
+    "index_select": ["x, 1, torch.tensor([0, 2])"],
+    "gather": ["x, 2, torch.zeros(2, 3, 1, dtype=torch.int64)"],
+    "nonzero": ["m", "x"],
+    **{op: ["[x, x], 1", "(x, torch.randn(1, 3, 4))", "[x, i], -1"] for op in ["cat", "concat", "concatenate"]},
+    "stack": ["[x, x]", "(x, x), -1"],
+    **{op: _matmul for op in ["matmul", "__matmul__"]},
+    "mm": ["s, torch.randn(3, 2)"],
+    "bmm": ["bb, torch.randn(2, 5, 3)"],
+    "mv": ["s, w"],
+    **{op: ["w, w"] for op in ["dot", "vdot"]},
+    **{op: ["w, v"] for op in ["outer", "ger"]},
+    "addmm": ["torch.randn(3), s, s", "s, s, s, beta=0.5"],
+    "eye": ["3", "2, 4", "2, dtype=torch.int32"],
+    "arange": ["5", "2, 9", "0, 10, 3", "10, 0, -2"],
+    "linspace": ["0, 1, 7", "0, 1, 3, dtype=torch.float64"],
+    **{f"np.{op}": ["3", "(2, 3)", "(2, 3), np.float32", "4, dtype='int32'", "(2, 3), dtype=int"] for op in ["zeros", "ones", "empty"]},
+    "np.full": ["(2, 3), 1.0", "3, 1", "(2, 2), True", "3, 0, dtype=np.float32", "(2, 3, 4), a"],
+    **{f"np.{op}": ["a", "a, dtype=np.int64", "x"] for op in ["zeros_like", "ones_like", "empty_like"]},
+    "np.full_like": ["a, 2.0", "x, 1, dtype=np.int32"],
+    "np.eye": ["3", "2, 4", "2, dtype=np.int32", "3, k=1"],
+    "np.arange": ["5", "2, 9", "0, 10, 3", "10, 0, -2", "5, dtype=np.float32"],
+}
+
+# Calls that torch rejects, so the rule must report them.
+ERRORS: List[str] = [
+    "torch.matmul: x, x",
+    "Tensor.transpose: x, 0, 3",
+    "Tensor.permute: x, 0, 1",
+    "torch.cat: [x, y]",
+    "Tensor.view: x, 5, 5",
+    "torch.add: x, y",
+    "Tensor.expand: x, 3, 3, 4",
+    "torch.mm: s, y",
+    "torch.stack: [x, y]",
+    "Tensor.narrow: x, 1, 2, 5",
+    "torch.arange: 0, 5, 0",
+    "torch.dot: w, v",
+    "torch.bmm: bb, bb",
+    "Tensor.unsqueeze: x, 4",
+    "Tensor.sum: x, 3",
+    "Tensor.view: xt, -1",
+    "Tensor.view_as: xt, torch.randn(6, 4)",
+    "torch.unflatten: x.transpose(1, 2), 1, (2, 6)",
+    "np.zeros: (2, -1)",
+]
+
+# x[...], by its index.
+INDEXING: List[str] = [
+    "x[0]", "x[-1, 1:]", "x[:, ::2]", "x[..., 1]", "x[None, :, None]", "x[:, :, None, 1:3]", "xt[::2]", "xt[1]",
+    "x[[0, 1]]", "x[:, j]", "x[j, :, j]", "x[j, j[:, None]]", "x[0, :, j]", "x[1, j]", "x[:, None, j]",
+    "x[m]", "x[:, m[0]]", "xt[:, j]",
+]
+INDEX_ERRORS: List[str] = ["x[2]", "x[0, 0, 0, 0]", "x[j, torch.tensor([0, 1, 2])]"]
+
+def _mask(dtype: torch.dtype) -> int:
+    return dtype_masks[dtype_mapper[str(dtype).split(".")[-1]]]
+
+def _layout(value: torch.Tensor):
+    return CONTIGUOUS if value.is_contiguous() else tuple(map(constant, value.stride()))
+
+def _operand(value):
+    if isinstance(value, torch.Tensor):
+        return Operand(_mask(value.dtype), None, tuple(FixedDim(s) for s in value.shape), _layout(value))
+    if isinstance(value, np.ndarray):
+        return Operand(_mask(value.dtype), None, tuple(FixedDim(s) for s in value.shape))
+    return Operand(type(value).__name__, None, ())
+
+def _value(kind: str, value):
+    """The value of a parameter of the given kind, as the hooks extract it from a mypy type."""
+    if kind in ("tensor", "operand"):
+        return _operand(value)
+    if kind == "tensors":
+        return tuple(_operand(v) for v in value)
+    if kind == "ints":
+        return list(value)
+    if kind == "dims":
+        return value if value is None or isinstance(value, int) else list(value)
+    if kind == "dtype":
+        return None if value is None else _mask(value)
+    if kind == "npdtype":
+        return None if value is None else _mask(np.dtype(value))
+    if kind == "any":
+        return None
+    return value
+
+def _signature(rule) -> inspect.Signature:
+    kinds = {False: inspect.Parameter.POSITIONAL_OR_KEYWORD, True: inspect.Parameter.KEYWORD_ONLY}
+    params = [
+        inspect.Parameter(p.name, inspect.Parameter.VAR_POSITIONAL if p.star else kinds[p.keyword_only],
+                          **({} if p.required or p.star else {"default": p.default}))
+        for p in rule.params
+    ]
+    if rule.kwargs:
+        params.append(inspect.Parameter("kwargs", inspect.Parameter.VAR_KEYWORD))
+    return inspect.Signature(params)
+
+def infer(rule, args, kwargs):
+    """The dims, dtype set and layout of the result (None if unknown)."""
+    bound = _signature(rule).bind(*args, **kwargs)
+    bound.apply_defaults()
+    values = []
+    for p in rule.params:
+        value = bound.arguments[p.name]
+        if p.star and p.kind == "ints":
+            value = value[0] if len(value) == 1 and isinstance(value[0], (tuple, list)) else value
+        values.append(_value(p.kind, value))
+    dims, mask = apply_rule(rule, values)
+    if rule.layout is not None:
+        return dims, mask, apply_layout(rule, values, dims)
+    operands = [v for value in values for v in (value if isinstance(value, tuple) else [value]) if isinstance(v, Operand)]
+    return dims, mask, allocated(rule.names[0].partition(".")[2], [o.layout for o in operands if isinstance(o.dtype, int)])
+
+def _matches(dims, shape) -> bool:
+    return len(dims) == len(shape) and all(isinstance(d, AnonymousDim) or d == FixedDim(s) for d, s in zip(dims, shape))
+
+def _layout_matches(layout, value: torch.Tensor) -> bool:
+    if layout == CONTIGUOUS:
+        return value.is_contiguous()
+    return not value.is_contiguous() and all(
+        size == 1 or stride.constant == expected for size, stride, expected in zip(value.shape, layout, value.stride()))
+
+def _index_item(item):
+    """The item of shape_functions.index for a Python index, as the __getitem__ hook extracts it."""
+    if isinstance(item, torch.Tensor):
+        return TensorIndex(_operand(item).dims, item.dtype in (torch.bool, torch.uint8))
+    if isinstance(item, list):
+        return TensorIndex((FixedDim(len(item)),), False)
+    return item
+
+class _Key:
+    def __getitem__(self, key):
+        return key
+
+def _indexing(text: str):
+    """The tensor and the key of "x[key]"."""
+    owner, _, key = text.partition("[")
+    return eval(owner, NAMESPACE), eval(f"_key[{key}", {**NAMESPACE, "_key": _Key()})
+
+def infer_index(tensor: torch.Tensor, key):
+    """The dims and layout of tensor[key]."""
+    x = _operand(tensor)
+    items = [_index_item(item) for item in (key if isinstance(key, tuple) else (key,))]
+    dims = SHAPE_FUNCTIONS["index"](x.dims, items)
+    return dims, LAYOUT_FUNCTIONS["index"](dims, x.dims, x.layout, items)
+
+def _call(name: str, args, kwargs):
+    owner, _, member = name.partition(".")
+    if owner in ("torch", "np"):
+        return getattr(NAMESPACE[owner], member)(*args, **kwargs)
+    return getattr(args[0], member)(*args[1:], **kwargs)
+
+def _arguments(text: str):
+    return eval(f"_capture({text})", {**NAMESPACE, "_capture": lambda *a, **k: (a, k)})
+
+def check(rules: Dict[str, Any], verbose: bool) -> List[str]:
+    failures = []
+    for name, rule in rules.items():
+        member = name.partition(".")[2]
+        examples = EXAMPLES.get(name, EXAMPLES.get(member))
+        if not examples:
+            failures.append(f"{name}: no examples")
+            continue
+        for text in examples:
+            args, kwargs = _arguments(text)
+            try:
+                expected = _call(name, args, kwargs)
+            except Exception as e:
+                failures.append(f"{name}({text}): torch raises {type(e).__name__}: {e}")
+                continue
+            try:
+                dims, mask, layout = infer(rule, args, kwargs)
+            except (ShapeError, Unknown) as e:
+                failures.append(f"{name}({text}): {type(e).__name__} {e}, torch returns {tuple(expected.shape)}")
+                continue
+            if not _matches(dims, expected.shape) or mask != _mask(expected.dtype):
+                failures.append(f"{name}({text}): inferred {dims} {mask:#x}, torch returns {tuple(expected.shape)} {expected.dtype}")
+            elif isinstance(expected, torch.Tensor) and (layout is not None or rule.layout is not None) and not _layout_matches(layout, expected):
+                failures.append(f"{name}({text}): inferred layout {layout}, torch returns strides {expected.stride()}")
+            elif verbose:
+                print(f"ok {name}({text}) -> {tuple(expected.shape)} {expected.dtype} {layout}")
+        if (rule.layout is not None) != (member in LAYOUT_OPS):
+            failures.append(f"{name}: {'not ' if rule.layout is None else ''}in layouts.LAYOUT_OPS")
+    for error in ERRORS:
+        name, _, text = error.partition(": ")
+        args, kwargs = _arguments(text)
+        try:
+            _call(name, args, kwargs)
+            failures.append(f"{name}({text}): torch accepts it")
+        except (RuntimeError, IndexError, TypeError, ValueError):
+            pass
+        try:
+            infer(rules[name], args, kwargs)
+            failures.append(f"{name}({text}): the rule accepts it")
+        except ShapeError:
+            pass
+    for text in INDEXING:
+        tensor, key = _indexing(text)
+        expected = tensor[key]
+        try:
+            dims, layout = infer_index(tensor, key)
+        except (ShapeError, Unknown) as e:
+            failures.append(f"{text}: {type(e).__name__} {e}, torch returns {tuple(expected.shape)}")
+            continue
+        if not _matches(dims, expected.shape) or (layout is not None and not _layout_matches(layout, expected)):
+            failures.append(f"{text}: inferred {dims} {layout}, torch returns {tuple(expected.shape)} strides {expected.stride()}")
+        elif verbose:
+            print(f"ok {text} -> {tuple(expected.shape)} {layout}")
+    for text in INDEX_ERRORS:
+        tensor, key = _indexing(text)
+        try:
+            tensor[key]
+            failures.append(f"{text}: torch accepts it")
+        except (IndexError, RuntimeError):
+            pass
+        try:
+            infer_index(tensor, key)
+            failures.append(f"{text}: the rule accepts it")
+        except ShapeError:
+            pass
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-compile-ms", type=float, default=50.0)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    rules = {}
+    for line in RULES.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            rule = parse_rule(line)
+            rules.update((name, rule) for name in rule.names)
+    numpy = [name for name in rules if name.startswith("np.")]
+    numpy_hooks = {fullname for name in numpy for fullname in NUMPY_FULLNAMES[name[3:]]}
+    assert len(rules) - len(numpy) + len(numpy_hooks) == len(FUNCTION_RULES) + len(METHOD_RULES)
+    failures = check(rules, args.verbose)
+    for failure in failures:
+        print("FAIL", failure)
+
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        compile_rules()
+        best = min(best, time.perf_counter() - start)
+    methods = sum(name.startswith("Tensor.") for name in rules)
+    print(f"{len(rules)} rules ({len(rules) - methods - len(numpy)} torch functions, {methods} Tensor methods, {len(numpy)} numpy functions), "
+          f"{len(failures)} failures, compiled in {best * 1e3:.1f} ms")
+    sys.exit(1 if failures or best * 1e3 > args.max_compile_ms else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Generate a synthetic tensor-heavy project for benchmarking mypy runs.
+
+Each module has functions with jaxtyping-annotated signatures (concrete dtypes,
+dtype categories and unions of dtypes), torch factories, broadcasting arithmetic,
+casts and in-place updates, and calls into the previous module. Module i also
+uses the shape alias Row<i> from the aliases module. With --chain L, the modules form
+independent import chains of L modules (module i imports module i-1 unless i % L == 0);
+by default they form one chain.
+
+Usage: python benchmarks/corpus.py OUTDIR [--modules N] [--functions M] [--chain L]
+"""
+
+import argparse
+import os
+from typing import List
+
+PACKAGE = "corpus"
+ALIASES = "aliases"
+
+HEADER = """\
+from typing import Union
+import torch
+from torch import Tensor
+from jaxtyping import Float, Float32, Float64, Int64, Real, Bool
+"""
+
+FUNCTION = '''
+def f{j}(x: Float32[Tensor, "{b} {d}"], y: {row}, w: Union[Float32[Tensor, "1 {d}"], Float64[Tensor, "1 {d}"]]) -> Float32[Tensor, "{b} {d}"]:
+    a = torch.randn({b}, {d}, dtype=torch.float32)
+    b = torch.zeros(1, {d}, dtype=torch.float32)
+    c = a + b
+    c = c * x - x / 2.0
+    s = torch.ones({d}, dtype=torch.float64)
+    t = s.float() + c
+    n = torch.ones({b}, 1, dtype=torch.int64)
+    m = n * 3 + n
+    mask = c > b
+    c += a
+    u = y + c
+    v = w.double() + u.double()
+    {call}
+    return t
+'''
+
+def module_shape(i: int):
+    return 2 + i % 7, 8 * (1 + i % 4)
+
+def make_module(i: int, n_functions: int, chain: int = 0) -> str:
+    parts = [HEADER]
+    first = i % chain == 0 if chain else i == 0
+    if not first:
+        parts.append(f"from {PACKAGE}.m{i - 1} import f0 as prev\n")
+    parts.append(f"from {PACKAGE}.{ALIASES} import Row{i}\n")
+    b, d = module_shape(i)
+    for j in range(n_functions):
+        if j > 0:
+            call = f"f{j - 1}(x, y, w)"
+        elif not first:
+            pb, pd = module_shape(i - 1)
+            call = f"prev(torch.randn({pb}, {pd}, dtype=torch.float32), torch.randn(1, {pd}), torch.randn(1, {pd}, dtype=torch.float64))"
+        else:
+            call = "a.float()"
+        parts.append(FUNCTION.format(j=j, b=b, d=d, row=f"Row{i}", call=call))
+    return "".join(parts)
+
+def make_aliases(n_modules: int) -> str:
+    lines = ["from torch import Tensor", "from jaxtyping import Float", ""]
+    for i in range(n_modules):
+        # mypy also analyzes the subscript as a type application, without the plugin.
+        lines.append(f'Row{i} = Float[Tensor, "1 {module_shape(i)[1]}"]  # type: ignore[valid-type]')
+    return "\n".join(lines) + "\n"
+
+def generate(outdir: str, n_modules: int, n_functions: int, chain: int = 0) -> List[str]:
+    """Write the corpus package under outdir and return the paths of the modules m0, m1, ..."""
+    package_dir = os.path.join(outdir, PACKAGE)
+    os.makedirs(package_dir, exist_ok=True)
+    with open(os.path.join(package_dir, "__init__.py"), "w") as f:
+        f.write("")
+    with open(os.path.join(package_dir, f"{ALIASES}.py"), "w") as f:
+        f.write(make_aliases(n_modules))
+    paths = []
+    for i in range(n_modules):
+        path = os.path.join(package_dir, f"m{i}.py")
+        with open(path, "w") as f:
+            f.write(make_module(i, n_functions, chain))
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("outdir")
+    parser.add_argument("--modules", type=int, default=20)
+    parser.add_argument("--functions", type=int, default=10)
+    parser.add_argument("--chain", type=int, default=0)
+    args = parser.parse_args()
+    paths = generate(args.outdir, args.modules, args.functions, args.chain)
+    print(f"wrote {len(paths)} modules to {os.path.join(args.outdir, PACKAGE)}")
+
+if __name__ == "__main__":
+    main()
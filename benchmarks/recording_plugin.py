@@ -0,0 +1,20 @@
+"""ShapePlugin that records every fullname mypy asks it about.
+
+Used by the benchmarks, which put the repository root on sys.path.
+"""
+
+from myshaping.check_shape_plugin import ShapePlugin
+
+RECORDED = {"function": [], "method": []}
+
+class RecordingPlugin(ShapePlugin):
+    def get_function_hook(self, fullname: str):
+        RECORDED["function"].append(fullname)
+        return super().get_function_hook(fullname)
+
+    def get_method_hook(self, fullname: str):
+        RECORDED["method"].append(fullname)
+        return super().get_method_hook(fullname)
+
+def plugin(version: str):
+    return RecordingPlugin
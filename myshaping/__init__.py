@@ -1,4 +1,10 @@
+__version__ = "0.1.0"
+
 def reveal_jaxtype(x):
     from wadler_lindig import pformat
     print("Runtime type is", pformat(x))
-    return x
\ No newline at end of file
+    return x
+
+def hot(f):
+    """Mark f as a hot function for the half-upcast perf lint rule. Does nothing at runtime."""
+    return f
@@ -0,0 +1,3 @@
+from myshaping.cli import main
+
+main()
@@ -0,0 +1,313 @@
+"""Bind named dims across the parameters of a call, like jaxtyped does at runtime.
+
+A function whose parameters have named, variadic or symbolic dims ("b c", "*batch c",
+"n 2*c") is shape-generic: its signature hook erases those shapes so that mypy accepts
+any shape, and its function/method hook then checks the call site. Every dim name of the
+callee is bound to the dims of the arguments in a union-find: names bound to the same dim
+share a set, and each set carries at most one dim of the caller (a fixed size, a caller's
+own name, or a symbolic axis). Binding a set to a second, different dim is a conflict,
+reported at the argument where it happens. Symbolic dims are checked once every name is
+bound, and the bindings are substituted into the return type.
+
+Union by size with path compression keeps a call with hundreds of arguments linear.
+"""
+
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+from mypy import errorcodes as codes
+from mypy.nodes import Context, Decorator, FuncDef, SymbolTableNode, TypeInfo
+from mypy.plugin import FunctionContext, FunctionSigContext, MethodContext, MethodSigContext
+from mypy.types import AnyType, CallableType, Instance, Type, TypeOfAny, UnionType, get_proper_type
+
+from myshaping.manifest import current_manifest
+from myshaping.symbolic import Poly, atom, atoms, constant, substitute
+from myshaping.type_translator import (
+    AbstractDim, AbstractDimOrVariadicDim, AnonymousDim, AnonymousVariadicDim, Dims, FixedDim, NamedDim,
+    NamedVariadicDim, SymbolicDim, construct_instance_from_mask, decompose_dtype_set, dim_from_poly,
+    dump_dims, parse_dimstr,
+)
+
+_variadic = (AnonymousVariadicDim, NamedVariadicDim)  # isinstance on typing.Union is slow
+_generic = (NamedDim, NamedVariadicDim, SymbolicDim)
+
+# Elements are the callee's dim names (str) and the caller's dims (not broadcastable).
+Element = Hashable
+
+class Bindings:
+    """The dims bound to the names of a callee at one call site."""
+
+    def __init__(self):
+        self.parent: Dict[Element, Element] = {}
+        self.size: Dict[Element, int] = {}
+        self.dim: Dict[Element, AbstractDim] = {}  # root -> the caller's dim of its set
+        self.origin: Dict[Element, str] = {}  # root -> the argument that bound its dim
+        self.variadics: Dict[str, Tuple[Dims, str]] = {}
+
+    def find(self, x: Element) -> Element:
+        parent = self.parent
+        root = parent.setdefault(x, x)
+        if root == x:
+            return x
+        while parent[root] != root:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, x: Element, y: Element, origin: str) -> Optional[str]:
+        """Merge the sets of x and y; return an error if they are bound to different dims."""
+        rx, ry = self.find(x), self.find(y)
+        if rx == ry:
+            return None
+        if rx in self.dim and ry in self.dim:
+            name = x if isinstance(x, str) else y
+            return (f'Dimension "{name}" is bound to {self.dim[rx]} by argument "{self.origin[rx]}", '
+                    f'but argument "{origin}" has {self.dim[ry]}')
+        if self.size.get(rx, 1) < self.size.get(ry, 1):
+            rx, ry = ry, rx
+        self.parent[ry] = rx
+        self.size[rx] = self.size.get(rx, 1) + self.size.get(ry, 1)
+        if ry in self.dim:
+            self.dim[rx] = self.dim.pop(ry)
+            self.origin[rx] = self.origin.pop(ry)
+        return None
+
+    def bind(self, name: str, dim: AbstractDim, origin: str) -> Optional[str]:
+        if isinstance(dim, AnonymousDim):
+            return None
+        if isinstance(dim, NamedDim) and dim.broadcastable:
+            dim = NamedDim(dim.name, False)
+        elif isinstance(dim, SymbolicDim) and dim.broadcastable:
+            dim = SymbolicDim(dim.elem, False)
+        if dim not in self.parent:
+            self.parent[dim] = dim
+            self.dim[dim] = dim
+            self.origin[dim] = origin
+        return self.union(name, dim, origin)
+
+    def lookup(self, name: str) -> Optional[AbstractDim]:
+        return self.dim.get(self.find(name))
+
+    def bind_variadic(self, name: str, dims: Dims, origin: str) -> Optional[str]:
+        bound = self.variadics.get(name)
+        if bound is None:
+            self.variadics[name] = (dims, origin)
+            return None
+        if len(bound[0]) == len(dims) and all(
+            isinstance(x, AnonymousDim) or isinstance(y, AnonymousDim) or x == y for x, y in zip(bound[0], dims)
+        ):
+            return None
+        return (f'Dimensions "*{name}" are bound to \'{dump_dims(bound[0])}\' by argument "{bound[1]}", '
+                f'but argument "{origin}" has \'{dump_dims(dims)}\'')
+
+    def values(self, poly: Poly) -> Dict[str, Poly]:
+        values = {}
+        for name in atoms(poly):
+            dim = self.lookup(name)
+            if isinstance(dim, FixedDim):
+                values[name] = constant(dim.size)
+            elif isinstance(dim, NamedDim):
+                values[name] = atom(dim.name)
+            elif isinstance(dim, SymbolicDim):
+                values[name] = dim.elem
+        return values
+
+
+def _split(dims: Dims) -> Tuple[Dims, Optional[AbstractDimOrVariadicDim], Dims]:
+    for i, dim in enumerate(dims):
+        if isinstance(dim, _variadic):
+            return dims[:i], dim, dims[i + 1:]
+    return dims, None, ()
+
+def _bind_dim(bindings: Bindings, param: AbstractDim, arg: AbstractDim, origin: str,
+              deferred: List[Tuple[Poly, AbstractDim, str]]) -> Optional[str]:
+    if isinstance(arg, AnonymousDim) or isinstance(param, AnonymousDim):
+        return None
+    if isinstance(param, FixedDim):
+        return None if param == arg else f'Argument "{origin}" has {arg} where {param} is expected'
+    if param.broadcastable and arg == FixedDim(1):
+        return None
+    if isinstance(param, NamedDim):
+        return bindings.bind(param.name, arg, origin)
+    deferred.append((param.elem, arg, origin))
+    return None
+
+def bind_shape(bindings: Bindings, params: Dims, args: Dims, origin: str,
+               deferred: List[Tuple[Poly, AbstractDim, str]]) -> Optional[str]:
+    """Bind the dims of one argument against its parameter; return the first conflict."""
+    prefix, variadic, suffix = _split(params)
+    arg_prefix, arg_variadic, arg_suffix = _split(args)
+    if arg_variadic is not None:
+        # Only the dims around an argument's own variadic dims are known.
+        if variadic is None or len(arg_prefix) != len(prefix) or len(arg_suffix) != len(suffix):
+            return None
+        middle: Dims = (arg_variadic,)
+    elif variadic is None:
+        if len(args) != len(params):
+            return f'Argument "{origin}" has shape \'{dump_dims(args)}\' where \'{dump_dims(params)}\' is expected'
+        middle = ()
+    else:
+        if len(args) < len(prefix) + len(suffix):
+            return f'Argument "{origin}" has shape \'{dump_dims(args)}\' where \'{dump_dims(params)}\' is expected'
+        arg_prefix, middle, arg_suffix = args[:len(prefix)], args[len(prefix):len(args) - len(suffix)], args[len(args) - len(suffix):]
+    for param, arg in zip((*prefix, *suffix), (*arg_prefix, *arg_suffix)):
+        error = _bind_dim(bindings, param, arg, origin, deferred)
+        if error is not None:
+            return error
+    if isinstance(variadic, NamedVariadicDim):
+        return bindings.bind_variadic(variadic.name, middle, origin)
+    return None
+
+def substitute_dims(bindings: Bindings, dims: Dims) -> List[AbstractDimOrVariadicDim]:
+    """The dims of the callee's return type as seen by the caller; unbound names become anonymous."""
+    result: List[AbstractDimOrVariadicDim] = []
+    for dim in dims:
+        if isinstance(dim, NamedDim):
+            result.append(bindings.lookup(dim.name) or AnonymousDim())
+        elif isinstance(dim, NamedVariadicDim):
+            bound = bindings.variadics.get(dim.name)
+            result.extend(bound[0] if bound is not None else (AnonymousVariadicDim(),))
+        elif isinstance(dim, SymbolicDim):
+            result.append(_resolve(bindings, dim.elem) or AnonymousDim())
+        else:
+            result.append(dim)
+    return result
+
+def _resolve(bindings: Bindings, poly: Poly) -> Optional[AbstractDim]:
+    """A symbolic dim of the callee in terms of the caller's dims, None if some name is unbound."""
+    values = bindings.values(poly)
+    if len(values) != len(atoms(poly)):
+        return None
+    return dim_from_poly(substitute(poly, values))
+
+
+def _array_dims(typ: Type) -> Optional[Tuple[int, Instance, Dims]]:
+    """(dtype set, backend, dims) of a jaxtyping type, None for anything else."""
+    x = decompose_dtype_set(typ)
+    if x is None:
+        return None
+    try:
+        return x[0], x[1], parse_dimstr(None, x[2])
+    except (ValueError, NotImplementedError):
+        return None
+
+def _generic_dims(typ: Type) -> Optional[Dims]:
+    """The dims of a jaxtyping type, if it has dims to bind."""
+    x = _array_dims(typ)
+    if x is not None and any(isinstance(d, _generic) for d in x[2]):
+        return x[2]
+    return None
+
+def has_array_params(sym: Optional[SymbolTableNode], generic_only: bool) -> bool:
+    """Whether sym is a function (or method) with a jaxtyping parameter,
+    or, if generic_only, with a parameter whose shape has dims to bind."""
+    node = sym.node if sym is not None else None
+    if isinstance(node, Decorator):
+        node = node.func
+    if not isinstance(node, FuncDef) or not isinstance(node.type, CallableType):
+        return False
+    check = _generic_dims if generic_only else _array_dims
+    return any(check(t) is not None for t in node.type.arg_types)
+
+def lookup_callee(plugin, fullname: str) -> Optional[SymbolTableNode]:
+    """Look up a function, or a method through the MRO of its class."""
+    sym = plugin.lookup_fully_qualified(fullname)
+    if sym is None and "." in fullname:
+        owner, _, member = fullname.rpartition(".")
+        owner_sym = plugin.lookup_fully_qualified(owner)
+        if owner_sym is not None and isinstance(owner_sym.node, TypeInfo):
+            sym = owner_sym.node.get(member)
+    return sym
+
+
+# Call site -> the signature before erasure, from the signature hook to the function hook.
+_pending: Dict[int, Tuple[Context, CallableType]] = {}
+
+def _erase_shape(typ: Type) -> Type:
+    typ = get_proper_type(typ)
+    if isinstance(typ, UnionType):
+        return UnionType([_erase_shape(t) for t in typ.items], typ.line, typ.column)
+    assert isinstance(typ, Instance)
+    return typ.copy_modified(args=[typ.args[0], AnyType(TypeOfAny.special_form)])
+
+def erase_shapes(ctx: Union[FunctionSigContext, MethodSigContext]) -> CallableType:
+    """Signature hook: accept any shape for the parameters with dims to bind."""
+    sig = ctx.default_signature
+    _pending[id(ctx.context)] = (ctx.context, sig)
+    arg_types = [t if _generic_dims(t) is None else _erase_shape(t) for t in sig.arg_types]
+    if arg_types == sig.arg_types:
+        return sig
+    return sig.copy_modified(arg_types=arg_types)
+
+def _proven(dims: Dims) -> bool:
+    return not any(isinstance(d, (AnonymousDim, AnonymousVariadicDim)) for d in dims)
+
+def _same_backend(backend: Type, param_backend: Type) -> bool:
+    """Compare the backend classes, not the device and layout the trackers keep in extra_attrs."""
+    if isinstance(backend, Instance) and isinstance(param_backend, Instance):
+        return backend.type.fullname == param_backend.type.fullname
+    return backend == param_backend
+
+
+def bind_call(ctx: Union[FunctionContext, MethodContext]) -> Type:
+    """Function/method hook: bind the dims of the arguments and substitute them into the return type.
+
+    The parameters proven at this call are recorded in the manifest, if one is written.
+    """
+    pending = _pending.pop(id(ctx.context), None)
+    if pending is None or pending[0] is not ctx.context:
+        return ctx.default_return_type
+    sig = pending[1]
+    bindings = Bindings()
+    deferred: List[Tuple[Poly, AbstractDim, str]] = []
+    deferred_at: List[Tuple[Context, int]] = []
+    proven: Dict[int, bool] = {}
+    generic: List[int] = []
+    for i, (param_type, arg_types) in enumerate(zip(sig.arg_types, ctx.arg_types)):
+        param = _array_dims(param_type)
+        if param is None:
+            continue
+        param_mask, param_backend, params = param
+        is_generic = any(isinstance(d, _generic) for d in params)
+        if is_generic:
+            generic.append(i)
+        origin = ctx.callee_arg_names[i] or f"#{i + 1}"
+        proven[i] = not sig.arg_kinds[i].is_star()  # no argument passed is proven too
+        for arg_type, arg in zip(arg_types, ctx.args[i]):
+            x = _array_dims(arg_type)
+            if x is None:
+                proven[i] = False
+                continue
+            mask, backend, dims = x
+            proven[i] = proven[i] and _proven(dims) and mask & param_mask == mask and _same_backend(backend, param_backend)
+            if not is_generic:
+                # mypy compares the shape literals itself.
+                proven[i] = proven[i] and dims == params
+                continue
+            error = bind_shape(bindings, params, dims, origin, deferred)
+            if error is not None:
+                ctx.api.fail(error, arg, code=codes.ARG_TYPE)
+                proven[i] = False
+            deferred_at.extend([(arg, i)] * (len(deferred) - len(deferred_at)))
+    for (poly, dim, origin), (arg, i) in zip(deferred, deferred_at):
+        expected = _resolve(bindings, poly)
+        if expected != dim:
+            proven[i] = False
+        if expected is not None and expected != dim:
+            ctx.api.fail(f'Argument "{origin}" has {dim} where {poly} = {expected} is expected', arg, code=codes.ARG_TYPE)
+
+    manifest = current_manifest()
+    if manifest is not None:
+        if not all(proven.values()):
+            # jaxtyped binds the names of a proven argument against the unproven ones.
+            proven.update((i, False) for i in generic)
+        manifest.record(ctx.api, sig, ctx.context, [sig.arg_names[i] for i, ok in proven.items() if ok and sig.arg_names[i]])
+
+    ret = decompose_dtype_set(ctx.default_return_type)
+    if ret is None:
+        return ctx.default_return_type
+    mask, backend, dim_str = ret
+    dims = parse_dimstr(None, dim_str)
+    substituted = substitute_dims(bindings, dims)
+    if tuple(substituted) == dims:
+        return ctx.default_return_type
+    return construct_instance_from_mask(ctx.api, mask, backend, substituted)
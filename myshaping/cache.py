@@ -0,0 +1,59 @@
+"""Incremental cache support.
+
+mypy stores what report_config_data returns in each module's cache metadata and
+rechecks the module when it changes. The plugin reports a fingerprint of its own
+sources, rule tables and stubs, plus whether shape hooks run in the module.
+"""
+
+import hashlib
+import os
+from typing import List, Optional, Tuple
+
+import mypy
+from mypy.nodes import MypyFile, Import, ImportFrom, ImportAll
+
+from myshaping import __version__
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+FINGERPRINTED_SUFFIXES = (".py", ".pyi", ".json", ".toml")
+# Modules from mypy's bundled typeshed never reach a shape hook.
+TYPESHED_DIR = os.path.join(os.path.dirname(os.path.abspath(mypy.__file__)), "typeshed")
+
+_fingerprint: Optional[str] = None
+
+def plugin_fingerprint() -> str:
+    """Hash of the plugin version and every source, rule table and stub file of the package."""
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256(__version__.encode())
+        for dirpath, dirnames, filenames in os.walk(PACKAGE_DIR):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+            for filename in sorted(filenames):
+                if filename.endswith(FINGERPRINTED_SUFFIXES):
+                    path = os.path.join(dirpath, filename)
+                    digest.update(os.path.relpath(path, PACKAGE_DIR).encode())
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+        _fingerprint = f"{__version__}:{digest.hexdigest()[:16]}"
+    return _fingerprint
+
+def is_typeshed_path(path: str) -> bool:
+    return os.path.abspath(path).startswith(TYPESHED_DIR)
+
+
+def _imported_modules(file: MypyFile):
+    for node in file.imports:
+        if isinstance(node, Import):
+            for module, _ in node.ids:
+                yield module
+        elif isinstance(node, (ImportFrom, ImportAll)):
+            yield node.id
+
+def jaxtyping_deps(file: MypyFile) -> List[Tuple[int, str, int]]:
+    """Torch hooks return jaxtyping types, so modules importing torch depend on jaxtyping."""
+    if file.fullname.partition(".")[0] in ("torch", "jaxtyping"):
+        return []
+    for module in _imported_modules(file):
+        if module == "torch" or module.startswith("torch."):
+            return [(10, "jaxtyping", -1)]
+    return []
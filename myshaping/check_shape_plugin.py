@@ -1,13 +1,22 @@
-from typing import Any, Optional, List, Tuple
+from typing import Any, Callable, Dict, Optional, List, Tuple
 import re
-from mypy.plugin import Plugin, FunctionContext, AnalyzeTypeContext
-from mypy.types import Instance, TupleType, Type, UnboundType, LiteralType, EllipsisType, RawExpressionType, TypeStrVisitor
+import os
+from mypy.plugin import Plugin, FunctionContext, AnalyzeTypeContext, ReportConfigContext
+from mypy.nodes import MypyFile
+from mypy.types import AnyType, TypeOfAny, Instance, TupleType, Type, UnboundType, LiteralType, EllipsisType, RawExpressionType, TypeStrVisitor
 from mypy.checker import TypeChecker
+from mypy.errors import CompileError
+from mypy.options import Options
 
-from myshaping.type_translator import construct_instance, repr_instance, parse_dimstr
+from myshaping.type_translator import construct_instance, record_spelling, repr_operand, parse_dimstr
 from myshaping.registry import register_type_analyze_hook, register_function_hook, get_function_hook, get_type_analyze_hook, get_method_hook
-import myshaping.torch_function_hooks
-import myshaping.tensor_method_hooks
+from myshaping.stats import stats_enabled
+from myshaping.config import costs_path, load_config, scoped_hook, in_packages, perflint_enabled, perflint_path
+from myshaping.cache import plugin_fingerprint, is_typeshed_path, jaxtyping_deps
+from myshaping.profiling import enable_profiling, profile_path
+from myshaping.binding import bind_call, erase_shapes, has_array_params, lookup_callee
+from myshaping.manifest import enable_manifest, manifest_path
+from myshaping.memo import clear_memo
 
 
 @register_type_analyze_hook(
@@ -53,38 +62,193 @@ def analyze_jaxtyping(ctx: AnalyzeTypeContext):
         return ctx.type
     backend, shape = ctx.type.args
     if not isinstance(shape, RawExpressionType) or shape.literal_value is None:
-        return ctx.type
+        # e.g. Float[_ArrayType, _Shape] in the stubs, where dtype categories are base classes.
+        return ctx.api.named_type(
+            f"jaxtyping._array_types.{dtype.split('.')[-1]}",
+            [ctx.api.analyze_type(arg) for arg in ctx.type.args],
+        )
     backend = ctx.api.analyze_type(backend)
     dim_str = shape.literal_value
     try:
         parse_dimstr(ctx.api, dim_str)
-    except ValueError as e:
+    except (ValueError, NotImplementedError) as e:
         ctx.api.fail(str(e), ctx.context)
-        return ctx.type
+        return AnyType(TypeOfAny.from_error)
+    record_spelling(ctx.api, dim_str)
     return construct_instance(ctx.api, dtype, backend, dim_str)
 
 
 @register_function_hook("myshaping.reveal_jaxtype")
 def reveal(ctx: FunctionContext):
     typ = ctx.arg_types[0][0]
-    if isinstance(typ, Instance) and typ.type.fullname.startswith("jaxtyping._array_types"):
-        result = repr_instance(typ, ctx.api.msg.options)
-    else:
-        visitor = TypeStrVisitor(options=ctx.api.msg.options)
-        result = typ.accept(visitor)
+    result = repr_operand(typ, ctx.api)
     ctx.api.msg.note(f'Revealed type is "{result}"', ctx.context)
     return ctx.default_return_type
 
 
 class ShapePlugin(Plugin):
+    def __init__(self, options: Options):
+        super().__init__(options)
+        self.config = load_config(options.config_file)
+        profile = profile_path() or self.config.profile
+        self.profiler = enable_profiling(profile, self.config.profile_top) if profile else None
+        manifest = manifest_path() or self.config.manifest
+        self.manifest = enable_manifest(manifest) if manifest else None
+        costs = costs_path() or self.config.costs
+        self.costs = None
+        if costs or self.config.costs_max_bytes or self.config.costs_max_flops:
+            from myshaping.costs import enable_costs
+            self.costs = enable_costs(costs, self.config.costs_max_bytes, self.config.costs_max_flops)
+        perflint = perflint_path() or self.config.perflint_report
+        self.perflint = None
+        if perflint_enabled(self.config):
+            from myshaping.perflint import enable_perflint
+            self.perflint = enable_perflint(self.config, perflint)
+        self._observers: Optional[List[Any]] = None
+        # Modules loaded from the cache would be missing from the manifest and the reports, so
+        # while one is written, report_config_data makes the cache of every module stale.
+        self._run = os.urandom(8).hex() if self.manifest is not None or costs or perflint else None
+        written = [name for name, on in (("stats", stats_enabled()), ("profile", self.profiler is not None),
+                                         ("manifest", self.manifest is not None), ("cost report", costs),
+                                         ("perflint report", perflint)) if on]
+        if written and options.fast_exit:
+            # mypy skips atexit handlers on its fast exit path.
+            raise CompileError([f"{options.config_file or 'mypy'}: error: myshaping writes the {' and '.join(written)} "
+                                "at exit, which needs fast_exit = False in the [mypy] section (or --no-fast-exit)"])
+        self._wrapped_hooks: Dict[Tuple[Callable, str], Callable] = {}
+        self._checked_callees: Dict[str, Tuple[MypyFile, bool]] = {}
+        # fullname -> the (wrapped) hook returned for it, None included, so that the calls mypy
+        # asks about again cost a dict lookup. Cleared when mypy (re)parses a module.
+        self._function_hooks: Dict[str, Optional[Callable]] = {}
+        self._method_hooks: Dict[str, Optional[Callable]] = {}
+
+    def _wrap(self, hook: Callable, scoped: bool, observed: str = "") -> Callable:
+        """Wrap hook for the profiler and the package scope, and for the observers of the
+        torch or numpy function or array method named observed."""
+        wrapped = self._wrapped_hooks.get((hook, observed))
+        if wrapped is None:
+            wrapped = hook
+            if self.profiler is not None:
+                wrapped = self.profiler.wrap_hook(wrapped)
+            if observed:
+                for observer in self.observers():
+                    wrapped = observer.wrap_hook(wrapped, observed.rsplit(".", 1)[1], method=observed.startswith("jaxtyping."))
+            if scoped and self.config.packages:
+                wrapped = scoped_hook(wrapped, self.config.packages)
+            self._wrapped_hooks[hook, observed] = wrapped
+        return wrapped
+
+    def observers(self) -> List[Any]:
+        """Observers of the results of torch and numpy calls: the device and layout tracking, which add
+        the device and the layout to the result, then the cost estimate and the perf lint. Built when
+        the first torch or numpy hook is wrapped, so that importing the plugin stays cheap."""
+        if self._observers is None:
+            from myshaping.devices import DeviceTracker
+            from myshaping.layouts import LayoutTracker
+            from myshaping.perflint import enable_perflint
+            if self.perflint is None:
+                # The default rules (mixed-device, sync-in-loop) lint without any configuration.
+                self.perflint = enable_perflint(self.config, None)
+            self._observers = [observer for observer in (DeviceTracker(), LayoutTracker(), self.costs, self.perflint) if observer is not None]
+        return self._observers
+
+    def _observed(self, hook: Optional[Callable], fullname: str) -> str:
+        if hook is None or hook is bind_call or not fullname.startswith(("torch.", "jaxtyping.", "numpy.")):
+            return ""
+        return fullname
+
+    def report_config_data(self, ctx: ReportConfigContext):
+        if is_typeshed_path(ctx.path):
+            return None
+        scoped = not self.config.packages or in_packages(ctx.id, self.config.packages)
+        return {"plugin": plugin_fingerprint(), "scoped": scoped,
+                "costs_max": [self.config.costs_max_bytes, self.config.costs_max_flops],
+                "perflint": [self.config.perflint, self.config.perflint_hot, self.config.perflint_large,
+                             self.config.perflint_broadcast, self.config.overrides],
+                "run": self._run}
+
+    def get_additional_deps(self, file: MypyFile):
+        # Called for every parsed module, also when dmypy reparses an edited one, whose
+        # functions may have gained or lost shapes to bind, and whose memoized messages
+        # may be stale.
+        self._function_hooks.clear()
+        self._method_hooks.clear()
+        clear_memo()
+        return jaxtyping_deps(file)
+
     def get_type_analyze_hook(self, fullname: str):
-        return get_type_analyze_hook(fullname)
+        hook = get_type_analyze_hook(fullname)
+        if hook is not None and self.profiler is not None:
+            hook = self._wrap(hook, scoped=False)
+        return hook
 
     def get_function_hook(self, fullname: str):
-        return get_function_hook(fullname)
-    
+        try:
+            return self._function_hooks[fullname]
+        except KeyError:
+            hook = self._function_hooks[fullname] = self._call_hook(get_function_hook(fullname), fullname)
+            return hook
+
     def get_method_hook(self, fullname: str):
-        return get_method_hook(fullname)
+        try:
+            return self._method_hooks[fullname]
+        except KeyError:
+            hook = self._method_hooks[fullname] = self._call_hook(get_method_hook(fullname), fullname)
+            return hook
+
+    def _call_hook(self, hook: Optional[Callable], fullname: str) -> Optional[Callable]:
+        if hook is None and self._checks_calls(fullname):
+            hook = bind_call
+        observed = self._observed(hook, fullname)
+        if hook is not None and (self.config.packages or self.profiler is not None or observed):
+            hook = self._wrap(hook, scoped=True, observed=observed)
+        return hook
+
+    def get_function_signature_hook(self, fullname: str):
+        return self._binding_signature_hook(fullname)
+
+    def get_method_signature_hook(self, fullname: str):
+        return self._binding_signature_hook(fullname)
+
+    def _checks_calls(self, fullname: str) -> bool:
+        """Calls to functions with named dims in their parameters are checked by bind_call,
+        and so are the calls of every function with jaxtyping parameters while a manifest is written.
+
+        The answer is cached per fullname, along with the tree of the callee's module, so that
+        a module that dmypy reparses is looked up again. Callees in typeshed, and with packages
+        set, callees outside them, are never bound."""
+        cached = self._checked_callees.get(fullname)
+        if cached is not None and self._modules.get(cached[0].fullname) is cached[0]:
+            return cached[1]
+        tree = self._callee_module(fullname)
+        if tree is None:
+            return False
+        checks = (
+            not is_typeshed_path(tree.path)
+            and (not self.config.packages or in_packages(tree.fullname, self.config.packages))
+            and has_array_params(lookup_callee(self, fullname), generic_only=self.manifest is None)
+        )
+        self._checked_callees[fullname] = (tree, checks)
+        return checks
+
+    def _callee_module(self, fullname: str) -> Optional[MypyFile]:
+        """The tree of the module defining fullname, None before mypy has set the modules."""
+        if self._modules is None:
+            return None
+        name = fullname
+        while "." in name:
+            name = name.rpartition(".")[0]
+            tree = self._modules.get(name)
+            if tree is not None:
+                return tree
+        return None
+
+    def _binding_signature_hook(self, fullname: str):
+        if not self._checks_calls(fullname):
+            return None
+        if self.config.packages or self.profiler is not None:
+            return self._wrap(erase_shapes, scoped=True)
+        return erase_shapes
 
 def plugin(version: str):
     return ShapePlugin
\ No newline at end of file
@@ -0,0 +1,17 @@
+"""The `myshaping` command: myshaping check ... and myshaping stubgen ..."""
+
+import importlib
+import sys
+from typing import List, Optional
+
+COMMANDS = {
+    "check": "myshaping.driver",
+    "stubgen": "myshaping.stubgen",
+}
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(f"usage: myshaping {{{','.join(COMMANDS)}}} ...", file=sys.stderr)
+        sys.exit(2)
+    importlib.import_module(COMMANDS[argv[0]]).main(argv[1:])
@@ -0,0 +1,152 @@
+"""Plugin options, read from the mypy config file.
+
+pyproject.toml::
+
+    [tool.myshaping]
+    packages = ["mymodel"]
+    profile = "myshaping-profile.json"
+    manifest = "myshaping-manifest.json"
+    costs = "myshaping-costs.json"
+    costs_max_bytes = 1e9
+    perflint = ["float64=error", "half-upcast=error", "int-to-float=note"]
+
+    [[tool.myshaping.overrides]]
+    module = ["mymodel.data.*"]
+    perflint = ["float64=note"]
+
+mypy.ini / setup.cfg::
+
+    [myshaping]
+    packages = mymodel, otherpkg
+
+    [myshaping-mymodel.data.*]
+    perflint = float64=note
+
+Overrides, like mypy's per-module sections, apply to the modules matching their patterns
+("pkg.*" is pkg and its submodules), the last match winning. They can set PER_MODULE fields.
+"""
+
+import configparser
+import dataclasses
+import fnmatch
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib  # a mypy dependency on these versions
+
+
+@dataclass(frozen=True)
+class ShapeConfig:
+    # Shape inference (function/method hooks) only runs in these packages and their submodules.
+    # Empty means everywhere. Annotations are translated everywhere regardless.
+    packages: Tuple[str, ...] = ()
+    # Write a per-hook profile to this JSON file at exit (MYSHAPING_PROFILE overrides it).
+    profile: str = ""
+    # Number of source locations in the profile.
+    profile_top: int = 20
+    # Write the manifest of proven call sites to this JSON file at exit (MYSHAPING_MANIFEST overrides it).
+    manifest: str = ""
+    # Write the memory/FLOP estimate to this JSON file at exit (MYSHAPING_COSTS overrides it).
+    costs: str = ""
+    # Note calls, and function totals, above this many bytes allocated / FLOPs. 0 disables.
+    costs_max_bytes: float = 0.0
+    costs_max_flops: float = 0.0
+    # Perf lint rules and their severities, e.g. "float64=error", "half-upcast=note" (see perflint.py).
+    perflint: Tuple[str, ...] = ()
+    # Decorators that mark hot functions for the half-upcast rule.
+    perflint_hot: Tuple[str, ...] = ("myshaping.hot", "torch.compile")
+    # Element count from which the int-to-float rule reports a promotion.
+    perflint_large: float = 1e6
+    # Element-count ratio of a broadcast result to its largest operand above which the broadcast rule reports it.
+    perflint_broadcast: float = 16.0
+    # Write the perf lint findings to this JSON file at exit (MYSHAPING_PERFLINT overrides it).
+    perflint_report: str = ""
+    # (module pattern, ((field, value), ...)) of the override sections, in order.
+    overrides: Tuple[Tuple[str, Tuple[Tuple[str, Any], ...]], ...] = ()
+
+# Fields that overrides can set.
+PER_MODULE = ("perflint", "perflint_hot", "perflint_large", "perflint_broadcast")
+
+
+def _convert(field: dataclasses.Field, value):
+    default = field.default
+    if isinstance(default, tuple):
+        if isinstance(value, str):
+            value = [item.strip() for item in value.replace("\n", ",").split(",")]
+        return tuple(item for item in value if item)
+    if isinstance(default, bool):
+        if isinstance(value, str):
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        return bool(value)
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return value
+
+def _values(section: dict, names) -> Dict[str, Any]:
+    fields = {field.name: field for field in dataclasses.fields(ShapeConfig)}
+    return {name: _convert(fields[name], section[name]) for name in names if name in section}
+
+def load_config(config_file: Optional[str]) -> ShapeConfig:
+    """Read the [tool.myshaping] (pyproject.toml) or [myshaping] (ini) section of config_file, and its overrides."""
+    section: dict = {}
+    overrides = []
+    if config_file is not None:
+        if config_file.endswith(".toml"):
+            with open(config_file, "rb") as f:
+                section = tomllib.load(f).get("tool", {}).get("myshaping", {})
+            for override in section.get("overrides", []):
+                modules = override.get("module", [])
+                for pattern in [modules] if isinstance(modules, str) else modules:
+                    overrides.append((pattern, _values(override, PER_MODULE)))
+        else:
+            parser = configparser.ConfigParser()
+            parser.read(config_file)
+            if parser.has_section("myshaping"):
+                section = dict(parser.items("myshaping"))
+            for name in parser.sections():
+                if name.startswith("myshaping-"):
+                    for pattern in name[len("myshaping-"):].split(","):
+                        overrides.append((pattern.strip(), _values(dict(parser.items(name)), PER_MODULE)))
+    values = _values(section, [field.name for field in dataclasses.fields(ShapeConfig) if field.name != "overrides"])
+    values["overrides"] = tuple((pattern, tuple(sorted(items.items()))) for pattern, items in overrides)
+    return ShapeConfig(**values)
+
+def module_config(config: ShapeConfig, module: str) -> ShapeConfig:
+    """config with the overrides whose patterns match module."""
+    values: Dict[str, Any] = {}
+    for pattern, items in config.overrides:
+        if pattern.endswith(".*") and in_packages(module, (pattern[:-2],)) or fnmatch.fnmatchcase(module, pattern):
+            values.update(items)
+    return dataclasses.replace(config, **values) if values else config
+
+def costs_path() -> Optional[str]:
+    return os.environ.get("MYSHAPING_COSTS") or None
+
+def perflint_path() -> Optional[str]:
+    return os.environ.get("MYSHAPING_PERFLINT") or None
+
+def perflint_enabled(config: ShapeConfig) -> bool:
+    return bool(config.perflint or any(dict(items).get("perflint") for _, items in config.overrides))
+
+
+def in_packages(module: str, packages: Tuple[str, ...]) -> bool:
+    return any(module == package or module.startswith(package + ".") for package in packages)
+
+def scoped_hook(hook: Callable, packages: Tuple[str, ...]) -> Callable:
+    """Wrap a function/method (signature) hook so that it only runs in modules of the given packages."""
+    in_scope: Dict[str, bool] = {}
+    def scoped(ctx):
+        tree = getattr(ctx.api, "tree", None)
+        module = tree.fullname if tree is not None else ""
+        allowed = in_scope.get(module)
+        if allowed is None:
+            allowed = in_scope[module] = in_packages(module, packages)
+        if not allowed:
+            # Signature hooks get a default_signature instead.
+            return getattr(ctx, "default_return_type", None) or ctx.default_signature
+        return hook(ctx)
+    return scoped
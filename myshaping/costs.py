@@ -0,0 +1,240 @@
+"""Static estimate of tensor memory and FLOPs from the inferred shapes.
+
+Set MYSHAPING_COSTS=costs.json (or `costs = costs.json` in the config section) to write,
+when mypy exits, the bytes allocated and the FLOPs of every torch call whose shapes are
+fully static, added up per function and per module:
+
+    modules:    module -> bytes, flops, and the number of calls with unknown sizes
+    functions:  "module.qualname" (or "module.<module>" for top-level code) -> path, line,
+                bytes, flops, unknown
+    largest:    the `TOP_SITES` calls that allocate the most, and the ones with the most FLOPs
+
+A call allocates its result (element count x dtype width; the widest member for a dtype
+set such as Float) unless it is a view or an in-place update. FLOPs are one per element of
+the largest operand or result for elementwise, broadcasting and reducing calls, 2*K per
+output element for matrix products, and none for views, copies and factories. Nested
+functions and lambdas count toward their outermost function.
+
+With `costs_max_bytes` or `costs_max_flops` set, a call above the limit gets a note, and
+so does the call that takes its function's total above it. The notes work without the report.
+
+The report needs every module to be checked, so no module is loaded from the cache while it
+is written. It is written at exit, which needs fast_exit = False in mypy's config.
+"""
+
+import atexit
+import json
+import math
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from mypy.nodes import LambdaExpr
+from mypy.types import Type
+
+from myshaping.messages import report
+from myshaping.type_translator import FixedDim, _members, decompose_dtype_set, parse_dimstr, repr_dtype_set
+
+TOP_SITES = 20
+
+ITEMSIZE = {
+    "Bool": 1, "UInt2": 1, "UInt4": 1, "UInt8": 1, "UInt16": 2, "UInt32": 4, "UInt64": 8,
+    "Int2": 1, "Int4": 1, "Int8": 1, "Int16": 2, "Int32": 4, "Int64": 8,
+    "Float8e4m3b11fnuz": 1, "Float8e4m3fn": 1, "Float8e4m3fnuz": 1, "Float8e5m2": 1, "Float8e5m2fnuz": 1,
+    "BFloat16": 2, "Float16": 2, "Float32": 4, "Float64": 8, "Complex64": 8, "Complex128": 16,
+}
+
+# Calls that return a view of an operand.
+VIEW_OPS = {
+    "transpose", "swapaxes", "swapdims", "t", "adjoint", "permute", "movedim", "moveaxis",
+    "view", "reshape", "view_as", "reshape_as", "flatten", "ravel", "unflatten", "unsqueeze",
+    "squeeze", "expand", "expand_as", "narrow", "select", "detach",
+    "from_numpy", "as_tensor", "numpy", "asarray",  # as_tensor and asarray copy only to change the dtype
+}
+# Calls that allocate their result without arithmetic.
+MEMORY_OPS = {
+    "randn", "rand", "randint", "zeros", "ones", "empty", "full", "eye", "arange", "linspace",
+    "zeros_like", "ones_like", "empty_like", "rand_like", "randn_like", "full_like",
+    "clone", "contiguous", "type_as", "half", "bfloat16", "float", "double", "short", "int", "long",
+    "cat", "concat", "concatenate", "stack", "repeat", "tile", "index_select", "gather", "nonzero",
+    "tensor", "array",
+}
+INPLACE_OPS = {"__iadd__", "__isub__", "__imul__", "__ipow__", "__idiv__"}
+# Matrix products: the position (self first) of the operand whose last dim is contracted,
+# or None for outer products.
+MATMUL_OPS: Dict[str, Optional[int]] = {
+    "matmul": 0, "__matmul__": 0, "mm": 0, "bmm": 0, "mv": 0, "dot": 0, "vdot": 0,
+    "addmm": 1, "outer": None, "ger": None,
+}
+
+def static_size(typ: Type, api) -> Optional[Tuple[int, int]]:
+    """(element count, widest itemsize) of a jaxtyping type with a fully static shape."""
+    decomposed = decompose_dtype_set(typ)
+    if decomposed is None:
+        return None
+    mask, _, dim_str = decomposed
+    try:
+        dims = parse_dimstr(api, dim_str)
+    except (ValueError, NotImplementedError):
+        return None
+    if not all(isinstance(dim, FixedDim) for dim in dims):
+        return None
+    return math.prod(dim.size for dim in dims), max(ITEMSIZE[dtype] for dtype in _members(mask))
+
+def estimate(op: str, operands: Sequence[Optional[Tuple[int, int]]], result: Optional[Tuple[int, int]],
+             contracted: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """(bytes allocated, FLOPs) of a call, or None if a size it needs is unknown."""
+    if op in VIEW_OPS:
+        return 0, 0
+    if op in INPLACE_OPS:
+        if operands[0] is None:
+            return None
+        return 0, max(size[0] for size in operands if size is not None)
+    if result is None:
+        return None
+    allocated = result[0] * result[1]
+    if op in MEMORY_OPS:
+        return allocated, 0
+    if op in MATMUL_OPS:
+        if contracted is None and MATMUL_OPS[op] is not None:
+            return None
+        return allocated, result[0] * (2 * contracted if contracted is not None else 1)
+    if any(size is None for size in operands):
+        return None
+    return allocated, max([result[0], *(size[0] for size in operands if size is not None)])
+
+def _contracted(op: str, operand_types: List[Type], api) -> Optional[int]:
+    index = MATMUL_OPS.get(op)
+    if index is None or index >= len(operand_types):
+        return None
+    decomposed = decompose_dtype_set(operand_types[index])
+    if decomposed is None:
+        return None
+    try:
+        dims = parse_dimstr(api, decomposed[2])
+    except (ValueError, NotImplementedError):
+        return None
+    return dims[-1].size if dims and isinstance(dims[-1], FixedDim) else None
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return ""
+
+def format_flops(n: float) -> str:
+    for unit in ("", "K", "M", "G"):
+        if n < 1000 or unit == "G":
+            return f"{n:.0f} FLOPs" if not unit else f"{n:.1f} {unit}FLOPs"
+        n /= 1000
+    return ""
+
+
+class Site(NamedTuple):
+    function: str
+    costs: Optional[Tuple[int, int]]  # (bytes, FLOPs), None if a size is unknown
+    result: str
+
+
+class CostEstimator:
+    def __init__(self, path: Optional[str], max_bytes: float, max_flops: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_flops = max_flops
+        # (path, line, column, op) -> the call. A call checked again (a deferred function,
+        # a union operand) replaces its entry.
+        self.sites: Dict[Tuple[str, int, int, str], Site] = {}
+        self.functions: Dict[str, Tuple[str, str, int]] = {}  # function -> (module, path, line)
+        self.totals: Dict[str, List[int]] = {}  # function -> [bytes, FLOPs], for the notes
+
+    def wrap_hook(self, hook, op: str, method: bool):
+        def estimated(ctx):
+            result = hook(ctx)
+            self.record(ctx, op, method, result)
+            return result
+        estimated.__name__ = getattr(hook, "__name__", op)
+        return estimated
+
+    def _function(self, api) -> Optional[str]:
+        scope = getattr(api, "scope", None)
+        tree = getattr(api, "tree", None)
+        if scope is None or tree is None:
+            return None
+        func = scope.top_level_function()
+        name = func.fullname if func is not None and not isinstance(func, LambdaExpr) and func.fullname else f"{tree.fullname}.<module>"
+        if name not in self.functions:
+            self.functions[name] = (tree.fullname, api.path, func.line if func is not None else 0)
+        return name
+
+    def record(self, ctx, op: str, method: bool, result: Type):
+        function = self._function(ctx.api)
+        if function is None:
+            return
+        operand_types = ([ctx.type] if method else []) + [typ for types in ctx.arg_types for typ in types]
+        operands = [static_size(typ, ctx.api) for typ in operand_types if decompose_dtype_set(typ) is not None]
+        if not operands and op not in MEMORY_OPS:
+            return  # no arrays involved, e.g. a call on a non-jaxtyping Tensor
+        result_size = static_size(result, ctx.api)
+        costs = estimate(op, operands, result_size, _contracted(op, operand_types, ctx.api))
+        key = (ctx.api.path, ctx.context.line, ctx.context.column, op)
+        decomposed = decompose_dtype_set(result)
+        described = f"{repr_dtype_set(decomposed[0])} '{decomposed[2]}'" if decomposed is not None else ""
+        old = self.sites.get(key)
+        self.sites[key] = Site(function, costs, described)
+        total = self.totals.setdefault(function, [0, 0])
+        for i in range(2):
+            total[i] += (costs[i] if costs else 0) - (old.costs[i] if old and old.costs else 0)
+        if costs is not None:
+            self._notes(ctx, key, function, costs, total, described)
+
+    def _notes(self, ctx, key, function: str, costs: Tuple[int, int], total: List[int], described: str):
+        # mypy may run a hook with its messages filtered (e.g. while it tries the reverse
+        # of an operator) and then again, so the notes are emitted every time, past the
+        # filters (see messages.py), and mypy drops the duplicates.
+        for i, (limit, verb, fmt) in enumerate([(self.max_bytes, "allocates", format_bytes), (self.max_flops, "costs", format_flops)]):
+            if not limit:
+                continue
+            if costs[i] > limit:
+                what = f" for {described}" if i == 0 and described else ""
+                report(ctx.api, f"{key[3]} {verb} {fmt(costs[i])}{what} (limit {fmt(limit)})", ctx.context)
+            if total[i] - costs[i] <= limit < total[i]:
+                report(ctx.api, f"{function} {verb} {fmt(total[i])} in total up to here (limit {fmt(limit)})", ctx.context)
+
+    def report(self) -> dict:
+        functions = {name: {"path": path, "line": line, "bytes": 0, "flops": 0, "unknown": 0}
+                     for name, (_, path, line) in sorted(self.functions.items())}
+        modules = {module: {"bytes": 0, "flops": 0, "unknown": 0} for module, _, _ in sorted(self.functions.values())}
+        sites = []
+        for (path, line, _, op), site in sorted(self.sites.items()):
+            for total in (functions[site.function], modules[self.functions[site.function][0]]):
+                if site.costs is None:
+                    total["unknown"] += 1
+                else:
+                    total["bytes"] += site.costs[0]
+                    total["flops"] += site.costs[1]
+            if site.costs is not None:
+                sites.append({"path": path, "line": line, "op": op, "function": site.function,
+                              "result": site.result, "bytes": site.costs[0], "flops": site.costs[1]})
+        return {
+            "modules": modules,
+            "functions": functions,
+            "largest": {
+                "bytes": sorted(sites, key=lambda site: -site["bytes"])[:TOP_SITES],
+                "flops": sorted(sites, key=lambda site: -site["flops"])[:TOP_SITES],
+            },
+        }
+
+    def dump(self):
+        with open(self.path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+_estimator: Optional[CostEstimator] = None
+
+def enable_costs(path: Optional[str], max_bytes: float, max_flops: float) -> CostEstimator:
+    """Start estimating (once per process), and write the report to path at exit if given."""
+    global _estimator
+    if _estimator is None:
+        _estimator = CostEstimator(path, max_bytes, max_flops)
+        if path:
+            atexit.register(_estimator.dump)
+    return _estimator
@@ -0,0 +1,134 @@
+"""Static tracking of the device of tensors.
+
+The device of a jaxtyping type is known when the tensor comes from
+
+- a factory with `device=` (torch.zeros(3, device="cuda"), torch.arange(n, device=x.device)),
+- .to(device) / .to(other) / .cuda() / .cpu(),
+- a call on tensors whose known devices agree (an operand on an unknown device is assumed
+  to be on the same one, since torch fails otherwise); numpy arrays are on the CPU, so
+  torch.from_numpy(a) is too.
+
+A device is a literal string ("cpu", "cuda", "cuda:1", "mps", ...), torch.device(...) of
+literals, an int (a CUDA index), or the .device of a tensor on a known device. Anything else
+leaves it unknown, and so do annotations: a parameter typed Float32[Tensor, "n"] is on any
+device. The device is an extra attribute of the mypy type (see type_translator.DEVICE), which
+mypy drops where it builds new types, e.g. the join of the branches of a conditional.
+perflint.py reports mixed devices (an error by default, and the result is on no known device)
+and synchronizations inside loops.
+"""
+
+import re
+from typing import List, Optional
+
+from mypy.nodes import CallExpr, Expression, IntExpr, MemberExpr, RefExpr, StrExpr
+from mypy.types import Instance, Type, get_proper_type
+
+from myshaping.type_translator import decompose_dtype_set, device_of, is_numpy, with_device
+
+DEVICE_RE = re.compile(r"[a-z_]+(:\d+)?")
+# Calls that put their result on the device given by their arguments.
+MOVE_OPS = {"to", "cuda", "cpu"}
+# torch functions that create a tensor on the default device unless given device=.
+FACTORIES = {"randn", "rand", "randint", "zeros", "ones", "empty", "full", "eye", "arange", "linspace"}
+
+def parse_device(value: str) -> Optional[str]:
+    return value if DEVICE_RE.fullmatch(value) else None
+
+def conflict(x: str, y: str) -> bool:
+    """Whether tensors on devices x and y can't be used together ("cuda" is any CUDA device)."""
+    x_type, _, x_index = x.partition(":")
+    y_type, _, y_index = y.partition(":")
+    return x_type != y_type or bool(x_index and y_index and x_index != y_index)
+
+def device_value(api, expr: Optional[Expression], typ: Optional[Type] = None) -> Optional[str]:
+    """The device an argument names, if it is known statically."""
+    if isinstance(expr, StrExpr):
+        return parse_device(expr.value)
+    if isinstance(expr, IntExpr):
+        return f"cuda:{expr.value}"
+    if isinstance(expr, CallExpr) and isinstance(expr.callee, RefExpr) and expr.callee.fullname == "torch.device":
+        if expr.args and isinstance(expr.args[0], StrExpr):
+            if len(expr.args) == 2 and isinstance(expr.args[1], IntExpr):
+                return parse_device(f"{expr.args[0].value}:{expr.args[1].value}")
+            if len(expr.args) == 1:
+                return parse_device(expr.args[0].value)
+        return None
+    if isinstance(expr, MemberExpr) and expr.name == "device":
+        owner = api.lookup_type_or_none(expr.expr)
+        return device_of(owner) if owner is not None else None
+    typ = get_proper_type(typ) if typ is not None else None
+    if isinstance(typ, Instance) and typ.last_known_value is not None and isinstance(typ.last_known_value.value, str):
+        return parse_device(typ.last_known_value.value)
+    return None
+
+def operand_types(ctx, method: bool) -> List[Type]:
+    return ([ctx.type] if method else []) + [typ for types in ctx.arg_types for typ in types]
+
+def operand_devices(operands: List[Type]) -> List[str]:
+    """The known devices of the array operands, where numpy arrays are on the CPU. CPU
+    scalars (0-dim tensors) go with any device."""
+    devices = []
+    for typ in operands:
+        decomposed = decompose_dtype_set(typ)
+        device = ("cpu" if is_numpy(decomposed[1]) else device_of(typ)) if decomposed is not None else None
+        if device is not None and not (decomposed[2] == "" and device == "cpu"):
+            devices.append(device)
+    return devices
+
+def common_device(devices: List[str]) -> Optional[str]:
+    """The device of a result computed on devices, None if unknown or mixed."""
+    result = None
+    for device in devices:
+        if result is not None and conflict(result, device):
+            return None
+        if result is None or ":" in device:
+            result = device
+    return result
+
+def _target(ctx, op: str) -> Optional[str]:
+    """The device that op puts its result on, from its arguments: "" if unknown, None if
+    no argument names one."""
+    if op == "cpu":
+        return "cpu"
+    for names, exprs, types in zip(ctx.arg_names, ctx.args, ctx.arg_types):
+        for name, expr, typ in zip(names, exprs, types):
+            if name != "device" and not (name is None and op in MOVE_OPS):
+                continue
+            if name is None and decompose_dtype_set(typ) is not None:
+                return device_of(typ) or ""  # .to(other)
+            device = device_value(ctx.api, expr, typ)
+            if device is not None:
+                return device
+            if name == "device" or _names_device(typ):
+                return ""
+    return "cuda" if op == "cuda" else None
+
+def _names_device(typ: Type) -> bool:
+    typ = get_proper_type(typ)
+    return isinstance(typ, Instance) and typ.type.fullname in ("builtins.str", "builtins.int", "torch.device")
+
+
+class DeviceTracker:
+    def wrap_hook(self, hook, op: str, method: bool):
+        def tracked(ctx):
+            return self.track(ctx, op, method, hook(ctx))
+        tracked.__name__ = getattr(hook, "__name__", op)
+        return tracked
+
+    def track(self, ctx, op: str, method: bool, result: Type) -> Type:
+        if decompose_dtype_set(result) is None:
+            return result
+        if op in MOVE_OPS or "device" in [name for names in ctx.arg_names for name in names]:
+            device = _target(ctx, op)
+            if device is None:
+                device = device_of(ctx.type) if method else "cpu"  # .to(dtype) stays where it is
+            return with_device(ctx.api, result, device or None)
+        devices = operand_devices(operand_types(ctx, method))
+        device = common_device(devices)
+        if devices and device is None:
+            return with_device(ctx.api, result, None)  # mixed: perflint reports it
+        if device_of(result) is not None:
+            return result
+        if op in FACTORIES:
+            return with_device(ctx.api, result, "cpu")
+        return with_device(ctx.api, result, device) if device is not None else result
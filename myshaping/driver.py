@@ -0,0 +1,336 @@
+"""Check a project with several mypy processes.
+
+    myshaping check [-j JOBS] [--config-file FILE] [-v] [files ...]
+
+The files (or the `files` of the mypy config) are grouped along the import graph. Modules
+in an import cycle (a strongly connected component) stay together, and a component that
+only one other component imports joins it, up to 1/JOBS of the project. The modules that
+everything else waits for (e.g. a package __init__ and a module imported everywhere) are
+checked first, in one mypy run that also analyzes every third-party module the project
+imports. Then JOBS mypy processes check batches of clusters, each batch as soon as the
+clusters it imports are checked. Every run shares mypy's cache directory, whose files mypy
+replaces atomically, so a batch loads what it imports from the cache instead of checking
+it again.
+
+Batches run with follow_imports = silent (unless the config skips imports), so every
+diagnostic of a module comes from the one run that checks it. Diagnostics are printed by
+path, and a path is printed as soon as it and every path before it are checked; other
+files (e.g. stubs) come last. A manifest, profile or cost report is one file per mypy
+process, so with any of them configured the check runs in one process.
+"""
+
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+from mypy.find_sources import BuildSource
+from mypy.graph_utils import strongly_connected_components, topsort
+from mypy.main import process_options
+
+from myshaping.config import costs_path, load_config, perflint_path
+from myshaping.manifest import manifest_path
+from myshaping.profiling import profile_path
+
+PRIME_MODULE = "__myshaping_prime__"
+
+_diagnostic = re.compile(r"^(?P<path>[^\s:][^:]*):(?:\d+:)* (?:error|warning|note): ")
+_summary = re.compile(r"^(Found \d+ errors? in|Success: no issues found)")
+
+def _imports(source: BuildSource) -> Set[str]:
+    """Modules that source may import, including packages and names that are not modules."""
+    assert source.path is not None
+    try:
+        with open(source.path, "rb") as f:
+            tree = ast.parse(f.read(), source.path)
+    except (OSError, SyntaxError, ValueError):
+        return set()  # mypy reports it
+    package = source.module if os.path.basename(source.path).startswith("__init__.") else source.module.rpartition(".")[0]
+    names: Set[str] = {source.module}  # mypy also loads the packages of the module
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parent = package.split(".")[:len(package.split(".")) - node.level + 1] if package else []
+                base = ".".join(filter(None, [*parent, base]))
+            if base:
+                names.add(base)
+                names.update(f"{base}.{alias.name}" for alias in node.names if alias.name != "*")
+    for name in list(names):
+        while "." in name:
+            name = name.rpartition(".")[0]
+            names.add(name)
+    return names
+
+
+class Plan(NamedTuple):
+    base: List[BuildSource]  # checked first, with the third-party modules
+    clusters: List["Cluster"]
+    externals: List[str]
+
+class Cluster(NamedTuple):
+    sources: List[BuildSource]
+    deps: FrozenSet[int]  # clusters that must be checked first
+    cost: int  # bytes of source
+
+def plan(sources: List[BuildSource], jobs: int) -> Plan:
+    """Group sources into clusters along the import graph, and list the third-party modules they import."""
+    by_module = {source.module: source for source in sorted(sources, key=lambda s: s.module)}
+    imported = {module: _imports(source) for module, source in by_module.items()}
+    edges = {module: sorted(name for name in names if name in by_module and name != module) for module, names in imported.items()}
+    first_party = {module.split(".")[0] for module in by_module}
+    externals = sorted({name for names in imported.values() for name in names if name.split(".")[0] not in first_party})
+
+    # Dependencies come before their dependents.
+    sccs = [sorted(scc) for scc in strongly_connected_components(by_module.keys(), edges)]
+    scc_of = {module: i for i, scc in enumerate(sccs) for module in scc}
+    deps = [{scc_of[dep] for module in scc for dep in edges[module]} - {i} for i, scc in enumerate(sccs)]
+    dependents: List[Set[int]] = [set() for _ in sccs]
+    for i, scc_deps in enumerate(deps):
+        for dep in scc_deps:
+            dependents[dep].add(i)
+    cost = [sum(os.path.getsize(by_module[module].path) for module in scc) for scc in sccs]
+    # An SCC imported by only one other SCC joins its cluster, up to 1/jobs of the project.
+    # Nothing outside a cluster imports its members but the root, so clusters form a DAG too.
+    cap = sum(cost) / jobs
+    root = list(range(len(sccs)))
+    cluster_cost = list(cost)
+    for i in reversed(range(len(sccs))):
+        if len(dependents[i]) == 1:
+            parent = root[next(iter(dependents[i]))]
+            if cluster_cost[parent] + cost[i] <= cap:
+                root[i] = parent
+                cluster_cost[parent] += cost[i]
+    roots = sorted(set(root))
+    members: Dict[int, List[int]] = {r: [] for r in roots}
+    for i, r in enumerate(root):
+        members[r].append(i)
+    cluster_deps = {r: {root[dep] for i in members[r] for dep in deps[i]} - {r} for r in roots}
+
+    # Clusters that every other cluster imports or is imported by, and that import only
+    # such clusters, are checked before anything else can run. They go to the base run.
+    order = [r for level in topsort({r: set(d) for r, d in cluster_deps.items()}) for r in sorted(level)]
+    ancestors: Dict[int, int] = {}
+    for r in order:
+        ancestors[r] = 0
+        for dep in cluster_deps[r]:
+            ancestors[r] |= ancestors[dep] | 1 << dep
+    everything = sum(1 << r for r in roots)
+    base: Set[int] = set()
+    for r in order:
+        descendants = sum(1 << j for j in roots if ancestors[j] >> r & 1)
+        if ancestors[r] | descendants | 1 << r == everything and cluster_deps[r] <= base:
+            base.add(r)
+
+    index = {r: k for k, r in enumerate(r for r in roots if r not in base)}
+    clusters = [
+        Cluster(
+            [by_module[module] for i in members[r] for module in sccs[i]],
+            frozenset(index[dep] for dep in cluster_deps[r] if dep not in base),
+            sum(cost[i] for i in members[r]),
+        )
+        for r in index
+    ]
+    return Plan([by_module[module] for r in sorted(base) for i in members[r] for module in sccs[i]], clusters, externals)
+
+
+class Scheduler:
+    """Hands out batches of clusters whose imports are checked.
+
+    Ready clusters go longest remaining import chain first, in batches of about 1/jobs of
+    the ready source, so that a few large mypy processes replace many small ones.
+    """
+
+    def __init__(self, clusters: List[Cluster], jobs: int):
+        self.clusters = clusters
+        self.jobs = jobs
+        self.dependents: Dict[int, List[int]] = defaultdict(list)
+        for k, cluster in enumerate(clusters):
+            for dep in cluster.deps:
+                self.dependents[dep].append(k)
+        self.priority: Dict[int, int] = {}
+        for level in reversed(list(topsort({k: set(cluster.deps) for k, cluster in enumerate(clusters)}))):
+            for k in level:
+                self.priority[k] = clusters[k].cost + max((self.priority[j] for j in self.dependents[k]), default=0)
+        self.waiting = {k: set(cluster.deps) for k, cluster in enumerate(clusters)}
+        self.ready: List[int] = []
+        self._add_ready([k for k, deps in self.waiting.items() if not deps])
+
+    def _add_ready(self, ks: List[int]):
+        self.ready = sorted([*self.ready, *ks], key=lambda k: (-self.priority[k], k))
+        self.share = sum(self.clusters[k].cost for k in self.ready) / self.jobs
+
+    def take(self) -> Optional[List[int]]:
+        if not self.ready:
+            return None
+        batch = [self.ready.pop(0)]
+        size = self.clusters[batch[0]].cost
+        while self.ready and size + self.clusters[self.ready[0]].cost / 2 <= self.share:
+            size += self.clusters[self.ready[0]].cost
+            batch.append(self.ready.pop(0))
+        return batch
+
+    def done(self, batch: List[int]):
+        unblocked = []
+        for k in batch:
+            for j in self.dependents[k]:
+                self.waiting[j].discard(k)
+                if not self.waiting[j]:
+                    unblocked.append(j)
+        if unblocked:
+            self._add_ready(unblocked)
+
+    def sources(self, batch: List[int]) -> List[BuildSource]:
+        return [source for k in batch for source in self.clusters[k].sources]
+
+
+class Output:
+    """Diagnostics sorted by path. A path is printed when it and every path before it are checked."""
+
+    def __init__(self, paths: List[str]):
+        self.pending = sorted(paths)
+        self.checked: Set[str] = set()
+        self.blocks: Dict[str, Dict[str, None]] = defaultdict(dict)
+        self.errors = 0
+        self.error_files: Set[str] = set()
+
+    def add(self, paths: List[str], text: str, ignored: Optional[str] = None):
+        block: List[str] = []
+        def close():
+            if block:
+                path = _diagnostic.match(block[0])["path"]
+                if path != ignored:
+                    self.blocks[path].setdefault("\n".join(block))
+                block.clear()
+        for line in text.splitlines():
+            if _diagnostic.match(line):
+                close()
+                block.append(line)
+            elif block:
+                block.append(line)  # --pretty source snippets
+            elif line and not _summary.match(line):
+                print(line, file=sys.stderr)
+        close()
+        self.checked.update(paths)
+        while self.pending and self.pending[0] in self.checked:
+            self._print(self.pending.pop(0))
+
+    def finish(self):
+        for path in sorted({*self.pending, *self.blocks}):
+            self._print(path)
+
+    def _print(self, path: str):
+        for block in self.blocks.pop(path, {}):
+            if " error: " in block.split("\n", 1)[0]:
+                self.errors += 1
+                self.error_files.add(path)
+            print(block, flush=True)
+
+
+def run_mypy(args: List[str], paths: List[str]) -> Tuple[int, str, float]:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "mypy", *args, *paths],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    return proc.returncode, proc.stdout, time.perf_counter() - start
+
+def _prime_file(cache_dir: str, externals: List[str]) -> str:
+    """A module that imports every third-party module, so that the base run caches them for the shards."""
+    path = os.path.join(cache_dir, "myshaping", f"{PRIME_MODULE}.py")
+    text = "".join(f"import {name}\n" for name in externals)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with open(path) as f:
+            unchanged = f.read() == text
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(path, "w") as f:
+            f.write(text)
+    return path
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="myshaping check", description="Check files with mypy and the shape plugin, in parallel.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of mypy processes (default: CPU count)")
+    parser.add_argument("--config-file", default=None, help="mypy config file (default: found as mypy does)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print the batches and their times to stderr")
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args(argv)
+
+    mypy_args = ["--config-file", args.config_file] if args.config_file else []
+    sources, options = process_options([*mypy_args, *args.files])
+    if options.config_file:
+        mypy_args = ["--config-file", options.config_file]
+    config = load_config(options.config_file)
+    jobs = max(1, args.jobs)
+    if jobs > 1 and (manifest_path() or config.manifest or profile_path() or config.profile or costs_path() or config.costs
+                     or perflint_path() or config.perflint_report):
+        print("myshaping check: a manifest, profile, cost or perflint report is written by one mypy process, running with -j 1", file=sys.stderr)
+        jobs = 1
+    if any(source.path is None for source in sources):
+        parser.error("only files and directories can be checked")
+    follow = options.follow_imports if options.follow_imports in ("skip", "error") else "silent"
+    worker_args = [*mypy_args, "--cache-dir", options.cache_dir, "--follow-imports", follow, "--no-error-summary"]
+
+    start = time.perf_counter()
+    runs = plan(sources, jobs) if jobs > 1 else Plan([], [Cluster(sources, frozenset(), 0)], [])
+    if args.verbose:
+        print(f"{len(sources)} modules: {len(runs.base)} in the base run, {len(runs.clusters)} clusters, "
+              f"{len(runs.externals)} third-party imports", file=sys.stderr)
+
+    output = Output([source.path for source in sources if source.path])
+    status = 0
+    def report(name: str, paths: List[str], result: Tuple[int, str, float], ignored: Optional[str] = None):
+        nonlocal status
+        returncode, text, seconds = result
+        if returncode > 1:
+            print(f"myshaping check: mypy exited with {returncode} in {name}:\n{text}", file=sys.stderr)
+            status = 2
+            text = ""
+        output.add(paths, text, ignored)
+        if args.verbose:
+            print(f"{name}: {len(paths)} modules, {seconds:.2f} s", file=sys.stderr)
+
+    if runs.base or runs.externals:
+        prime = _prime_file(options.cache_dir, runs.externals)
+        paths = [source.path for source in runs.base if source.path]
+        report("base", paths, run_mypy(worker_args, [*paths, prime]), ignored=prime)
+    scheduler = Scheduler(runs.clusters, jobs)
+    running: Dict[Future, List[int]] = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while True:
+            while len(running) < jobs:
+                batch = scheduler.take()
+                if batch is None:
+                    break
+                running[pool.submit(run_mypy, worker_args, [s.path for s in scheduler.sources(batch) if s.path])] = batch
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: running[f]):
+                batch = running.pop(future)
+                report(f"clusters {batch}", [s.path for s in scheduler.sources(batch) if s.path], future.result())
+                scheduler.done(batch)
+    output.finish()
+
+    if options.error_summary:
+        if output.errors:
+            print(f"Found {output.errors} error{'s' if output.errors != 1 else ''} in {len(output.error_files)} "
+                  f"file{'s' if len(output.error_files) != 1 else ''} (checked {len(sources)} source file{'s' if len(sources) != 1 else ''})")
+        else:
+            print(f"Success: no issues found in {len(sources)} source file{'s' if len(sources) != 1 else ''}")
+    if args.verbose:
+        print(f"total: {time.perf_counter() - start:.2f} s with {jobs} jobs", file=sys.stderr)
+    sys.exit(status or (1 if output.errors else 0))
+
+if __name__ == "__main__":
+    main()
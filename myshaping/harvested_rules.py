@@ -0,0 +1,27 @@
+"""Shape rules of torch 2.7.1, harvested from meta tensors.
+
+Generated by tools/harvest_shape_rules.py. Do not edit. The syntax is that of shape_rules.py;
+torch_rule_hooks compiles the rules of the ops without a hook of their own.
+"""
+
+TORCH_VERSION = "2.7.1"
+
+RULES = """
+{torch,Tensor}.{absolute,bernoulli,bitwise_not,conj,conj_physical,fix,msort,nan_to_num,positive,resolve_conj,resolve_neg,sgn} (input) -> input
+torch.{alias_copy,asarray,celu,detach_copy,normal,poisson,real,rrelu,selu} (input) -> input
+Tensor.to_dense (input) -> input
+{torch,Tensor}.{acosh,angle,arccos,arccosh,arcsin,arcsinh,arctan,arctanh,asinh,atanh,deg2rad,digamma} (input) -> input : float(input)
+{torch,Tensor}.{erfinv,i0,lgamma,logit,rad2deg,sinc} (input) -> input : float(input)
+{torch,Tensor}.{isneginf,isposinf,isreal,signbit} (input) -> input : bool
+Tensor.bool (input) -> input : bool
+{torch,Tensor}.{bitwise_and,bitwise_left_shift,bitwise_or,bitwise_right_shift,bitwise_xor,clamp_max,clamp_min,floor_divide,fmax,fmin,gcd,heaviside} (input, other: operand) -> broadcast(input, other) : promote(input, other)
+{torch,Tensor}.{hypot,lcm,logaddexp,logaddexp2,nextafter} (input, other: operand) -> broadcast(input, other) : promote(input, other)
+torch.{binary_cross_entropy_with_logits,kl_div,rsub} (input, other: operand) -> broadcast(input, other) : promote(input, other)
+{torch,Tensor}.{arctan2,copysign,divide,igamma,igammac,ldexp,xlogy} (input, other: operand) -> broadcast(input, other) : div(input, other)
+{torch,Tensor}.{greater,greater_equal,isclose,less,less_equal,not_equal} (input, other: operand) -> broadcast(input, other) : bool
+"""
+
+# torch version -> owner -> (public native ops, ops with a hand-written hook, ops with a harvested rule).
+COVERAGE = {
+    "2.7.1": {"torch": (549, 142, 76), "Tensor": (387, 139, 66)},
+}
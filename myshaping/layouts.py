@@ -0,0 +1,315 @@
+"""Static tracking of the memory layout of tensors, and of the views torch can't make.
+
+The layout of a torch array is tracked like its device (see type_translator.LAYOUT):
+
+    CONTIGUOUS        what torch's is_contiguous() returns True for
+    a tuple of Polys  the strides of a view that may not be contiguous, as polynomials of
+                      the sizes, e.g. (1, n) for the transpose of a contiguous "n 4"
+    None              unknown, e.g. for annotated parameters: a Float32[Tensor, "n m"]
+                      may be a view of anything; `x = x.contiguous()` makes it known
+
+The calls in LAYOUT_OPS compute the layout of their result with the `@ layout` clause of
+their rule in shape_rules.py (a function of LAYOUT_FUNCTIONS), or in the __getitem__ hook.
+They follow torch: a view permutes, drops or scales the strides of its input, and view and
+reshape find the strides of the new shape as torch's computeStride does. x.view(...) of a
+shape that needs a copy fails, and x.reshape(...) copies into a contiguous tensor. Every
+other call on contiguous tensors returns a contiguous tensor (LayoutTracker); on a view,
+TensorIterator may keep its strides, so the layout of the result is unknown.
+
+Named dims are assumed to be larger than 1 (and than the bounds of slices), so a named dim
+that is 1 at run time can make a tensor contiguous where the plugin says it may not be.
+Strides that can't be compared statically (n vs 4) leave the layout unknown. perflint.py
+reports the copies that a known layout forces.
+"""
+
+import ast
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from mypy.types import Type
+
+from myshaping.devices import operand_types
+from myshaping.shape_functions import (
+    DYNAMIC, ShapeError, TensorIndex, Unknown, _axis, _poly, adjoint, movedim, permute, select, t, transpose,
+)
+from myshaping.symbolic import Poly, constant, mul, parse_symbolic
+from myshaping.type_translator import LAYOUT, Dims, decompose_dtype_set, tracked, with_tracked
+
+CONTIGUOUS = "contiguous"
+Strides = Tuple[Poly, ...]
+Layout = Union[None, str, Strides]
+
+# Calls whose hooks compute the layout of their result: the rules with a layout clause, and indexing.
+LAYOUT_OPS = {
+    "transpose", "swapaxes", "swapdims", "t", "adjoint", "permute", "movedim", "moveaxis",
+    "view", "reshape", "view_as", "reshape_as", "flatten", "ravel", "unflatten", "unsqueeze",
+    "squeeze", "expand", "expand_as", "narrow", "select", "contiguous", "__getitem__",
+}
+# Calls that return their input, or a view of it, when its layout allows, and copy it otherwise.
+COPY_OPS = {"reshape", "reshape_as", "flatten", "ravel", "contiguous"}
+INPLACE_OPS = {"__iadd__", "__isub__", "__imul__", "__ipow__", "__idiv__"}
+# Calls that allocate a result that isn't contiguous: nonzero fills the transpose of its result.
+STRIDED_OPS = {"nonzero"}
+# Calls that copy their operand into a new contiguous tensor, whatever its layout: torch.tensor(a)
+# of a numpy array, whose layout is not tracked.
+NEW_OPS = {"tensor"}
+
+_ZERO, _ONE = constant(0), constant(1)
+
+
+def dump_layout(layout: Layout) -> Optional[str]:
+    if isinstance(layout, tuple):
+        return f"({', '.join(map(repr, layout))}{',' if len(layout) == 1 else ''})"
+    return layout
+
+@lru_cache(maxsize=None)
+def load_layout(text: Optional[str]) -> Layout:
+    if text is None or text == CONTIGUOUS:
+        return text
+    node = ast.parse(text, mode="eval").body
+    return tuple(parse_symbolic(ast.unparse(item)) for item in node.elts)  # type: ignore[attr-defined]
+
+def layout_of(typ: Type) -> Layout:
+    """The layout of a jaxtyping type, if known."""
+    return load_layout(tracked(typ, LAYOUT))
+
+def with_layout(api, typ: Type, layout: Layout) -> Type:
+    return with_tracked(api, typ, LAYOUT, dump_layout(layout))
+
+def fresh(layouts: Iterable[Layout]) -> Layout:
+    """The layout of a tensor that a call allocates from operands with these layouts."""
+    return CONTIGUOUS if all(layout == CONTIGUOUS for layout in layouts) else None
+
+def allocated(op: str, layouts: Iterable[Layout]) -> Layout:
+    """The layout of the result of op, a call not in LAYOUT_OPS, on operands with these layouts."""
+    if op in NEW_OPS:
+        return CONTIGUOUS
+    return None if op in STRIDED_OPS else fresh(layouts)
+
+
+"""Stride algebra. Sizes and strides are polynomials of the named dims."""
+
+def _compare(x: Poly, y: Poly) -> Optional[int]:
+    """-1, 0 or 1 as x < y, x == y or x > y for every size of the named dims (at least 2),
+    None if that depends on them. Only monomials, c*n*m, are compared."""
+    if x is y:
+        return 0
+    monomials = []
+    for p in (x, y):
+        if not p.terms:
+            monomials.append((0, {}))
+        elif len(p.terms) == 1 and p.terms[0][1] > 0:
+            monomials.append((p.terms[0][1], dict(p.terms[0][0])))
+        else:
+            return None
+    (cx, mx), (cy, my) = monomials
+    if cx <= cy and all(power <= my.get(name, 0) for name, power in mx.items()):
+        return -1
+    if cy <= cx and all(power <= mx.get(name, 0) for name, power in my.items()):
+        return 1
+    return None
+
+def _less(x: Poly, y: Poly) -> bool:
+    order = _compare(x, y)
+    if order is None:
+        raise Unknown()
+    return order < 0
+
+def _differ(x: Poly, y: Poly) -> bool:
+    order = _compare(x, y)
+    if order is None:
+        raise Unknown()
+    return order != 0
+
+def contiguous_strides(sizes: Sequence[Poly]) -> Strides:
+    strides = []
+    stride = _ONE
+    for size in reversed(sizes):
+        strides.append(stride)
+        stride = mul(stride, size if size is not _ZERO else _ONE)
+    return tuple(reversed(strides))
+
+def is_contiguous(sizes: Sequence[Poly], strides: Sequence[Poly]) -> Optional[bool]:
+    """torch's is_contiguous(), None if it depends on the sizes of the named dims."""
+    if _ZERO in sizes:
+        return True
+    expected = _ONE
+    for size, stride in zip(reversed(sizes), reversed(strides)):
+        if size is _ONE:
+            continue
+        order = _compare(stride, expected)
+        if order != 0:
+            return None if order is None else False
+        expected = mul(expected, size)
+    return True
+
+def normalize(sizes: Sequence[Poly], strides: Sequence[Poly]) -> Layout:
+    return CONTIGUOUS if is_contiguous(sizes, strides) else tuple(strides)
+
+def view_strides(sizes: Sequence[Poly], strides: Sequence[Poly], new_sizes: Sequence[Poly]) -> Optional[Strides]:
+    """The strides of the view of a tensor as new_sizes (torch's computeStride), None if it
+    takes a copy. Raises Unknown when that depends on the sizes of the named dims."""
+    if not sizes:
+        return tuple(_ONE for _ in new_sizes)
+    if _ZERO in sizes:
+        return contiguous_strides(new_sizes)
+    new_strides = [_ONE] * len(new_sizes)
+    view_d = len(new_sizes) - 1
+    # Each chunk of dims that are contiguous with each other can be split and merged freely.
+    chunk_base = strides[-1]
+    tensor_numel = view_numel = _ONE
+    for tensor_d in reversed(range(len(sizes))):
+        tensor_numel = mul(tensor_numel, sizes[tensor_d])
+        if tensor_d == 0 or (sizes[tensor_d - 1] is not _ONE and _differ(strides[tensor_d - 1], mul(tensor_numel, chunk_base))):
+            while view_d >= 0 and (_less(view_numel, tensor_numel) or new_sizes[view_d] is _ONE):
+                new_strides[view_d] = mul(view_numel, chunk_base)
+                view_numel = mul(view_numel, new_sizes[view_d])
+                view_d -= 1
+            if _differ(view_numel, tensor_numel):
+                return None
+            if tensor_d > 0:
+                chunk_base = strides[tensor_d - 1]
+                tensor_numel = view_numel = _ONE
+    return tuple(new_strides) if view_d == -1 else None
+
+def _sizes(dims: Dims) -> List[Poly]:
+    sizes = [_poly(dim) for dim in dims]
+    if None in sizes:
+        raise Unknown()
+    return sizes  # type: ignore[return-value]
+
+def _strides(x: Dims, layout: Layout) -> Tuple[List[Poly], Sequence[Poly]]:
+    """The sizes and strides of a tensor with dims x."""
+    if layout is None:
+        raise Unknown()
+    sizes = _sizes(x)
+    return sizes, contiguous_strides(sizes) if layout == CONTIGUOUS else layout
+
+def copies(op: str, x: Dims, layout: Layout, result: Dims) -> bool:
+    """Whether op, one of COPY_OPS, copies x to return result."""
+    if not isinstance(layout, tuple):
+        return False
+    try:
+        sizes, strides = _strides(x, layout)
+        if op in ("contiguous", "ravel"):
+            return is_contiguous(sizes, strides) is False
+        return view_strides(sizes, strides, _sizes(result)) is None
+    except Unknown:
+        return False
+
+
+"""Layout functions. They take the dims of the result, then the arguments of the clause,
+with each tensor parameter passed as its dims and its layout. They raise ShapeError for a
+view torch would reject, and Unknown when the layout can't be inferred."""
+
+def _permutation(shape_function: Callable[..., Any]) -> Callable[..., Layout]:
+    """The layout function of a view whose shape function only reorders or drops dims: the
+    strides go the same way."""
+    def layout(result: Dims, x: Dims, x_layout: Layout, *args: Any) -> Layout:
+        sizes, strides = _strides(x, x_layout)
+        return normalize(_sizes(result), shape_function(strides, *args))
+    layout.__name__ = shape_function.__name__
+    return layout
+
+def view(result: Dims, x: Dims, layout: Layout) -> Layout:
+    if layout == CONTIGUOUS:
+        return CONTIGUOUS
+    sizes, strides = _strides(x, layout)
+    new_sizes = _sizes(result)
+    new_strides = view_strides(sizes, strides, new_sizes)
+    if new_strides is None:
+        raise ShapeError("view size is not compatible with input tensor's size and stride (at least one dimension "
+                         "spans across two contiguous subspaces). Use .reshape(...) instead.")
+    return normalize(new_sizes, new_strides)
+
+def reshape(result: Dims, x: Dims, layout: Layout) -> Layout:
+    try:
+        return view(result, x, layout)
+    except ShapeError:
+        return CONTIGUOUS
+
+def contiguous(result: Dims) -> Layout:
+    return CONTIGUOUS
+
+def unsqueeze(result: Dims, x: Dims, layout: Layout, dim: int) -> Layout:
+    sizes, strides = _strides(x, layout)
+    i = _axis(x, dim, extra=1)
+    stride = mul(sizes[i], strides[i]) if i < len(x) else _ONE
+    return normalize(_sizes(result), (*strides[:i], stride, *strides[i:]))
+
+def squeeze(result: Dims, x: Dims, layout: Layout, dim: Union[None, int, Sequence[int]] = None) -> Layout:
+    sizes, strides = _strides(x, layout)
+    axes = range(len(x)) if dim is None else {_axis(x, d) for d in ([dim] if isinstance(dim, int) else dim)}
+    kept = [stride for i, (size, stride) in enumerate(zip(sizes, strides)) if not (i in axes and size is _ONE)]
+    if len(kept) != len(result):
+        raise Unknown()
+    return normalize(_sizes(result), kept)
+
+def expand(result: Dims, x: Dims, layout: Layout) -> Layout:
+    """torch's inferExpandGeometry: expanded dims get stride 0."""
+    sizes, strides = _strides(x, layout)
+    new_sizes = _sizes(result)
+    new_strides: List[Poly] = [_ONE] * len(new_sizes)
+    lead = len(new_sizes) - len(sizes)
+    for i in reversed(range(len(new_sizes))):
+        if i >= lead:
+            size, stride = sizes[i - lead], strides[i - lead]
+        else:
+            size, stride = _ONE, mul(new_sizes[i + 1], new_strides[i + 1]) if i + 1 < len(new_sizes) else _ONE
+        new_strides[i] = stride if size is new_sizes[i] else _ZERO
+    return normalize(new_sizes, new_strides)
+
+def narrow(result: Dims, x: Dims, layout: Layout) -> Layout:
+    sizes, strides = _strides(x, layout)
+    return normalize(_sizes(result), strides)
+
+def index(result: Dims, x: Dims, layout: Layout, items: Sequence[Any]) -> Layout:
+    """x[items] (see shape_functions.index). Indexing with tensors gathers into a new tensor,
+    contiguous if x is."""
+    if any(isinstance(item, TensorIndex) for item in items):
+        return fresh([layout])
+    sizes, strides = _strides(x, layout)
+    if Ellipsis not in items:
+        items = [*items, Ellipsis]
+    spanned = len(x) - sum(item is not None and item is not Ellipsis for item in items)
+    new_strides: List[Poly] = []
+    axis = 0
+    for item in items:
+        if item is None:
+            new_strides.append(mul(sizes[axis], strides[axis]) if axis < len(x) else _ONE)
+        elif item is Ellipsis:
+            new_strides.extend(strides[axis:axis + spanned])
+            axis += spanned
+        elif isinstance(item, slice):
+            if item.step is DYNAMIC:
+                raise Unknown()
+            new_strides.append(mul(strides[axis], constant(item.step or 1)))
+            axis += 1
+        else:
+            axis += 1
+    return normalize(_sizes(result), new_strides)
+
+
+LAYOUT_FUNCTIONS: Dict[str, Callable[..., Layout]] = {
+    f.__name__: f for f in [
+        *map(_permutation, [transpose, t, adjoint, permute, movedim, select]),
+        view, reshape, contiguous, unsqueeze, squeeze, expand, narrow, index,
+    ]
+}
+
+
+class LayoutTracker:
+    """Sets the layout of the result of every call not in LAYOUT_OPS: contiguous when its
+    array operands are. Its hook built the result from an operand, whose layout it keeps
+    until then. In-place updates keep the layout of their target."""
+    def wrap_hook(self, hook, op: str, method: bool):
+        def tracked(ctx):
+            return self.track(ctx, op, method, hook(ctx))
+        tracked.__name__ = getattr(hook, "__name__", op)
+        return tracked
+
+    def track(self, ctx, op: str, method: bool, result: Type) -> Type:
+        if op in LAYOUT_OPS or op in INPLACE_OPS or decompose_dtype_set(result) is None:
+            return result
+        operands = [typ for typ in operand_types(ctx, method) if decompose_dtype_set(typ) is not None]
+        return with_layout(ctx.api, result, allocated(op, map(layout_of, operands)))
@@ -0,0 +1,93 @@
+"""Manifest of call sites whose array arguments the plugin fully proved.
+
+Set MYSHAPING_MANIFEST=proven.json (or `manifest = proven.json` in the config section)
+to write it when mypy exits. An argument is proven at a call site when its static type
+is a jaxtyping type of the parameter's backend and dtype(s), and its shape has no
+unknown ("_", "...") dims and matches the parameter, binding its named dims consistently
+with the other arguments. myshaping.runtime.jaxtyped reads the manifest and skips the
+runtime checks of proven arguments.
+
+    files:      path -> sha256 of every module of the build but typeshed's. A proof depends
+                on the types of whatever the caller imports, so the runtime ignores the whole
+                manifest once any of them changed
+    functions:  "path:qualname" of the callee -> "path:line" of a call -> proven parameters
+
+Every line of a call is listed. Calls of the same function on the same line share one
+entry, which keeps only the parameters proven in all of them.
+
+The manifest needs every module to be checked, so no module is loaded from the cache
+while it is written. It is written at exit, which needs fast_exit = False in mypy's config.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from mypy.nodes import Context, MypyFile
+from mypy.types import CallableType
+
+from myshaping.cache import is_typeshed_path
+
+MANIFEST_VERSION = 2
+
+def manifest_path() -> Optional[str]:
+    return os.environ.get("MYSHAPING_MANIFEST") or None
+
+
+class Manifest:
+    def __init__(self, path: str):
+        self.path = path
+        self.functions: Dict[str, Dict[str, FrozenSet[str]]] = {}
+        self.modules: Dict[str, MypyFile] = {}
+
+    def record(self, api, sig: CallableType, context: Context, proven: Iterable[str]):
+        """Record the parameters proven at one call of sig."""
+        defn = sig.definition
+        modules = getattr(api, "modules", {})
+        if defn is None or not defn.fullname or not api.path:
+            return
+        module = defn.fullname
+        while module and module not in modules:
+            module = module.rpartition(".")[0]
+        if not module or not modules[module].path:
+            return
+        callee_path = os.path.abspath(modules[module].path)
+        caller_path = os.path.abspath(api.path)
+        sites = self.functions.setdefault(f"{callee_path}:{defn.fullname[len(module) + 1:]}", {})
+        proven = frozenset(proven)
+        for line in range(context.line, max(context.line, context.end_line or 0) + 1):
+            site = f"{caller_path}:{line}"
+            sites[site] = sites[site] & proven if site in sites else proven
+        self.modules = modules
+
+    def dump(self):
+        files = {}
+        paths = {os.path.abspath(file.path) for file in self.modules.values() if file.path and not is_typeshed_path(file.path)}
+        for path in sorted(paths):
+            try:
+                with open(path, "rb") as f:
+                    files[path] = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                pass
+        functions = {
+            function: {site: sorted(proven) for site, proven in sorted(sites.items())}
+            for function, sites in sorted(self.functions.items())
+        }
+        with open(self.path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": files, "functions": functions}, f, indent=1)
+
+
+_manifest: Optional[Manifest] = None
+
+def enable_manifest(path: str) -> Manifest:
+    """Start recording proven call sites (once per process) and write them to path at exit."""
+    global _manifest
+    if _manifest is None:
+        _manifest = Manifest(path)
+        atexit.register(_manifest.dump)
+    return _manifest
+
+def current_manifest() -> Optional[Manifest]:
+    return _manifest
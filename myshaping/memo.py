@@ -0,0 +1,99 @@
+"""Memoized hook results.
+
+The same operator on the same operand types recurs all over a model (every residual add on
+Float32[Tensor, "b s d"]). A memoized hook runs once per (hook, module, self type, argument
+types) and the later calls get its result type back, with the errors and notes it reported
+re-emitted at their own location. Messages spell shapes as the module writes them, so the key
+also has the version of the module's spellings; the device and layout the trackers keep are
+part of the types. dmypy merges a reparsed module into the old TypeInfos, so types from before
+an edit would still hit: the plugin clears the cache whenever a build or a dmypy update parses
+modules. Nothing is written to mypy's cache.
+
+The hit rate is in the MYSHAPING_STATS counters (memo.hit, memo.miss).
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, List, Tuple
+
+from myshaping.messages import report
+from myshaping.stats import STATS
+from myshaping.type_translator import spelling_version
+
+MAXSIZE = 4096
+_DEFAULT = object()  # the result was ctx.default_return_type
+
+_cache: "OrderedDict[tuple, Tuple[Any, List[Tuple[str, str, dict]]]]" = OrderedDict()
+
+
+class _RecordingMessages:
+    def __init__(self, msg, reports: list):
+        self._msg = msg
+        self._reports = reports
+
+    def report(self, message: str, context, severity: str, **kwargs):
+        self._reports.append(("report", message, dict(kwargs, severity=severity)))
+        self._msg.report(message, context, severity, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._msg, name)
+
+
+class _RecordingApi:
+    """ctx.api, recording what the hook reports."""
+    def __init__(self, api, reports: list):
+        self._api = api
+        self.msg = _RecordingMessages(api.msg, reports)
+        self._reports = reports
+
+    def fail(self, message: str, context, **kwargs):
+        self._reports.append(("fail", message, kwargs))
+        self._api.fail(message, context, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._api, name)
+
+
+def _replay(ctx, reports: List[Tuple[str, str, dict]]):
+    for kind, message, kwargs in reports:
+        if kind == "fail":
+            ctx.api.fail(message, ctx.context, **kwargs)
+        else:
+            report(ctx.api, message, ctx.context, **kwargs)
+
+
+def memoized(hook: Callable) -> Callable:
+    """Memoize a method hook whose result depends only on the types of self and the arguments."""
+    def memoized_hook(ctx):
+        try:
+            tree = getattr(ctx.api, "tree", None)
+            module = tree.fullname if tree is not None else ""
+            key = (hook, module, spelling_version(module), ctx.type, tuple(tuple(types) for types in ctx.arg_types))
+            entry = _cache.get(key)
+        except TypeError:  # an unhashable type
+            return hook(ctx)
+        if entry is not None:
+            STATS["memo.hit"] += 1
+            _cache.move_to_end(key)
+            result, reports = entry
+            _replay(ctx, reports)
+            return ctx.default_return_type if result is _DEFAULT else result
+        STATS["memo.miss"] += 1
+        reports: List[Tuple[str, str, dict]] = []
+        result = hook(ctx._replace(api=_RecordingApi(ctx.api, reports)))
+        _cache[key] = (_DEFAULT if result is ctx.default_return_type else result, reports)
+        if len(_cache) > MAXSIZE:
+            _cache.popitem(last=False)
+        return result
+    memoized_hook.__name__ = hook.__name__
+    memoized_hook.__wrapped__ = hook  # type: ignore[attr-defined]
+    return memoized_hook
+
+
+def clear_memo():
+    """Forget every memoized result."""
+    _cache.clear()
+
+
+def memo_cache_info() -> Tuple[int, int, int]:
+    """Return (hits, misses, currsize) of the memoized hook results."""
+    return STATS["memo.hit"], STATS["memo.miss"], len(_cache)
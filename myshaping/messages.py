@@ -0,0 +1,20 @@
+"""Notes and perf findings that hooks report on a call.
+
+mypy checks `x + y` speculatively: it calls x.__add__(y) with errors filtered, and falls back
+to y.__radd__(x) if anything at all was reported, a note included; the result is Any when both
+report. A hook's note about a call it inferred, or a perf lint finding, is not a reason for the
+call to fail, so these go to mypy's errors past the filters. When the reversed method reports
+the same message again, mypy drops the duplicate.
+"""
+
+from mypy.nodes import Context
+
+
+def report(api, message: str, context: Context, severity: str = "note", **kwargs) -> None:
+    """Report message about the call at context without making the call fail."""
+    errors = api.msg.errors
+    watchers, errors._watchers = errors._watchers, []
+    try:
+        api.msg.report(message, context, severity, **kwargs)
+    finally:
+        errors._watchers = watchers
@@ -0,0 +1,152 @@
+"""Hooks of the conversions between numpy arrays and torch tensors.
+
+Arithmetic on numpy arrays follows numpy's promotion rules (see tensor_method_hooks), and
+the numpy factories have np rules in shape_rules.py. The conversions keep the shape and
+the dtype:
+
+    torch.from_numpy(a), torch.as_tensor(a), t.numpy(), np.asarray(t)   share memory
+    torch.tensor(a), np.array(t)                                        copy
+
+as_tensor and asarray copy too when given another dtype. Only a tensor on the CPU with a
+dtype that numpy has (not BFloat16, ...) converts to numpy; t.numpy(force=True) copies it
+from another device. The perf lint rule interop-copy (perflint.py) reports the copies
+that a conversion sharing memory would avoid.
+"""
+
+from typing import Optional
+
+from mypy.nodes import Expression, NameExpr, RefExpr, StrExpr
+from mypy.plugin import FunctionContext, MethodContext
+from mypy.types import Instance, Type, get_proper_type
+
+from myshaping.function_helper import transpose_funcargs
+from myshaping.registry import register_function_hook, register_method_hook
+from myshaping.tensor_method_hooks import array_family
+from myshaping.torch_function_hooks import dtype_mapper
+from myshaping.type_translator import (
+    NDARRAY, construct_instance_from_mask, decompose_dtype_set, device_of, dtype_masks, is_numpy, parse_dimstr, repr_dtype_set, repr_operand,
+)
+
+numpy_dtype_mapper = {  # mapping numpy dtype names to jaxtyping type
+    "bool": "Bool",
+    "bool_": "Bool",
+    "uint8": "UInt8",
+    "uint16": "UInt16",
+    "uint32": "UInt32",
+    "uint64": "UInt64",
+    "int8": "Int8",
+    "int16": "Int16",
+    "int32": "Int32",
+    "int64": "Int64",
+    "intp": "Int64",
+    "int_": "Int64",
+    "float16": "Float16",
+    "half": "Float16",
+    "float32": "Float32",
+    "single": "Float32",
+    "float64": "Float64",
+    "double": "Float64",
+    "complex64": "Complex64",
+    "csingle": "Complex64",
+    "complex128": "Complex128",
+    "cdouble": "Complex128",
+}
+python_dtype_mapper = {"bool": "Bool", "int": "Int64", "float": "Float64", "complex": "Complex128"}
+
+NUMPY_DTYPES = 0  # the dtypes numpy has
+for _dtype in set(numpy_dtype_mapper.values()):
+    NUMPY_DTYPES |= dtype_masks[_dtype]
+
+def numpy_dtype(expr: Expression) -> Optional[str]:
+    """The dtype a numpy dtype argument names: np.float32, "float32", float, ..."""
+    if isinstance(expr, StrExpr):
+        return numpy_dtype_mapper.get(expr.value)
+    if isinstance(expr, RefExpr) and expr.fullname.startswith("numpy."):
+        return numpy_dtype_mapper.get(expr.fullname.rpartition(".")[2])
+    if isinstance(expr, RefExpr) and expr.fullname.startswith("builtins."):
+        return python_dtype_mapper.get(expr.fullname.rpartition(".")[2])
+    return None
+
+def _dtype_argument(ctx, torch_dtype: bool) -> Optional[int]:
+    """The dtype set given by the dtype argument: 0 if there is none, None if it is unknown."""
+    dtype = transpose_funcargs(ctx).get("dtype")
+    if dtype is None or (isinstance(dtype.arg[0], NameExpr) and dtype.arg[0].fullname == "builtins.None"):
+        return 0
+    expr, typ = dtype.arg[0], get_proper_type(dtype.arg_type[0])
+    if not torch_dtype:
+        name = numpy_dtype(expr)
+    elif isinstance(expr, RefExpr) and isinstance(typ, Instance) and typ.type.fullname == "torch.dtype":
+        name = dtype_mapper.get(expr.name)
+    else:
+        name = None
+    return dtype_masks[name] if name is not None else None
+
+def _convertible(ctx, typ: Type, mask: int, what: str, force: bool = False) -> bool:
+    """Whether a tensor converts to numpy, failing with torch's message if it doesn't."""
+    if not mask & NUMPY_DTYPES:
+        ctx.api.fail(f"{what} got unsupported ScalarType {repr_dtype_set(mask)}", ctx.context)
+        return False
+    device = device_of(typ)
+    if device is not None and device != "cpu" and not force:
+        ctx.api.fail(f"{what} can't convert {device} device type tensor to numpy. Use Tensor.cpu() to copy the tensor to host memory first.", ctx.context)
+        return False
+    return True
+
+
+@register_function_hook("torch.from_numpy", "torch.as_tensor", "torch.tensor")
+def handle_to_tensor(ctx: FunctionContext) -> Type:
+    """torch.from_numpy(a) and torch.as_tensor(a) share the memory of a numpy array,
+    torch.tensor(a) copies it. The tensor is on the CPU unless given device=."""
+    if not ctx.arg_types or not ctx.arg_types[0]:
+        return ctx.default_return_type
+    x = decompose_dtype_set(ctx.arg_types[0][0])
+    if x is None:
+        return ctx.default_return_type
+    mask, backend, dim_str = x
+    if "ndarray" in ctx.callee_arg_names and not is_numpy(backend):
+        ctx.api.fail(f"torch.from_numpy expects a numpy array, got {repr_operand(ctx.arg_types[0][0], ctx.api)}", ctx.context)
+        return ctx.default_return_type
+    dtype = _dtype_argument(ctx, torch_dtype=True)
+    if dtype is None:
+        return ctx.default_return_type
+    return construct_instance_from_mask(ctx.api, dtype or mask, ctx.api.named_type("torch.Tensor"), parse_dimstr(ctx.api, dim_str))
+
+
+@register_method_hook(f"{array_family}.numpy")
+def handle_numpy(ctx: MethodContext) -> Type:
+    """t.numpy() shares the memory of a CPU tensor."""
+    x = decompose_dtype_set(ctx.type)
+    if x is None or is_numpy(x[1]) or "numpy" not in ctx.api.modules:
+        return ctx.default_return_type
+    mask, _, dim_str = x
+    force = transpose_funcargs(ctx).get("force")
+    force_value = force is not None and isinstance(force.arg[0], NameExpr) and force.arg[0].fullname == "builtins.True"
+    if not _convertible(ctx, ctx.type, mask, "Tensor.numpy", force_value):
+        return ctx.default_return_type
+    return construct_instance_from_mask(ctx.api, mask & NUMPY_DTYPES, ctx.api.named_type(NDARRAY), parse_dimstr(ctx.api, dim_str))
+
+
+# np.array copies a numpy array or a tensor, np.asarray shares its memory. Where numpy 2,
+# and numpy 1, define them:
+NUMPY_CONVERSIONS = {
+    "array": ["numpy._core.multiarray.array", "numpy.core.multiarray.array"],
+    "asarray": ["numpy._core.multiarray.asarray", "numpy.core.multiarray.asarray"],
+}
+
+for name, fullnames in NUMPY_CONVERSIONS.items():
+    def handle_array(ctx: FunctionContext, name: str = name) -> Type:
+        if not ctx.arg_types or not ctx.arg_types[0]:
+            return ctx.default_return_type
+        x = decompose_dtype_set(ctx.arg_types[0][0])
+        if x is None:
+            return ctx.default_return_type
+        mask, backend, dim_str = x
+        dtype = _dtype_argument(ctx, torch_dtype=False)
+        if dtype is None:
+            return ctx.default_return_type
+        if not is_numpy(backend):
+            if not _convertible(ctx, ctx.arg_types[0][0], mask, f"np.{name}"):
+                return ctx.default_return_type
+            mask &= NUMPY_DTYPES
+        return construct_instance_from_mask(ctx.api, dtype or mask, ctx.api.named_type(NDARRAY), parse_dimstr(ctx.api, dim_str))
+    register_function_hook(*fullnames)(handle_array)
@@ -0,0 +1,347 @@
+"""Performance lint of dtype promotions, broadcasts, device use and copies.
+
+Enable rules with their severity (error, note or off) in the config section, e.g.
+`perflint = float64=error, half-upcast=note`, and change them per module in override
+sections (see config.py). mixed-device (error) and sync-in-loop (note) are on by default:
+
+    half-upcast   a Float16/BFloat16 operand promoted to Float32 or Float64, inside a
+                  function decorated with one of `perflint_hot` (myshaping.hot, torch.compile)
+    float64       a Float64 result of a call without Float64 operands: a factory with
+                  dtype=torch.double, a cast, or a promotion
+    int-to-float  an integer or Bool operand promoted to a float result of at least
+                  `perflint_large` elements (static shapes only)
+    broadcast     a broadcast result with more than `perflint_broadcast` times the elements
+                  of its largest operand, or with a whole named dim more (x: "N 1" + y: "1 M");
+                  and an in-place update from a broadcast temporary (x += a * b), which
+                  a fused in-place op (x.addcmul_(a, b)) would avoid
+    mixed-device  a call on tensors on different known devices (see devices.py), which
+                  fails at run time; 0-dim CPU tensors mix with any device
+    sync-in-loop  .item(), .tolist(), nonzero or a move to the CPU inside a for or while
+                  loop, on a tensor that isn't known to be on the CPU
+    copy          reshape, flatten, ravel or contiguous that copies its input because its
+                  known layout (see layouts.py) can't be viewed as the result
+    interop-copy  torch.tensor(a) of a numpy array or np.array(t) of a tensor that copies
+                  without changing the dtype or the device, where torch.from_numpy(a)
+                  or t.numpy() would share the memory (see numpy_hooks.py)
+
+Explicit casts (.float(), .type_as(), ...) count for float64 only. A Float64 tensor from a
+numpy array (torch.from_numpy(a), t + a) counts as created, and numpy results are not
+linted. Every rule reports with its own error code, perf-<rule>, so
+`# type: ignore[perf-float64]` suppresses a finding on its line, and `mypy -O json`
+carries the code. Set MYSHAPING_PERFLINT=perflint.json (or
+`perflint_report`) to also write every finding, suppressed or not, at exit (which needs
+fast_exit = False in mypy's config). The report needs every module to be checked, so no
+module is loaded from the cache while it is written.
+"""
+
+import atexit
+import functools
+import json
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from mypy.errorcodes import ErrorCode
+from mypy.errors import Errors
+from mypy.nodes import CallExpr, Decorator, Expression, FuncDef, MemberExpr, OpExpr, RefExpr
+from mypy.types import Type
+
+from myshaping.config import ShapeConfig, module_config
+from myshaping.costs import static_size
+from myshaping.devices import MOVE_OPS, common_device, operand_devices
+from myshaping.layouts import COPY_OPS, copies, dump_layout, layout_of
+from myshaping.messages import report as report_message
+from myshaping.type_translator import AbstractDim, broadcast_growth, check_shape_compatibility, decompose_dtype_set, device_of, dtype_masks, is_numpy, parse_dimstr, repr_dtype_set
+
+RULES = {
+    "half-upcast": ErrorCode("perf-half-upcast", "Float16/BFloat16 promoted in a hot function", "Performance"),
+    "float64": ErrorCode("perf-float64", "Float64 created", "Performance"),
+    "int-to-float": ErrorCode("perf-int-to-float", "Large integer tensor promoted to float", "Performance"),
+    "broadcast": ErrorCode("perf-broadcast", "Broadcast much larger than its operands", "Performance"),
+    "mixed-device": ErrorCode("perf-mixed-device", "Tensors on different devices", "Performance"),
+    "sync-in-loop": ErrorCode("perf-sync-in-loop", "Host-device synchronization inside a loop", "Performance"),
+    "copy": ErrorCode("perf-copy", "Copy of a tensor that is not contiguous", "Performance"),
+    "interop-copy": ErrorCode("perf-interop-copy", "Copy between numpy and torch that could share memory", "Performance"),
+}
+SEVERITIES = ("error", "note", "off")
+# Rules that are on unless configured otherwise: mixed devices fail at run time.
+DEFAULT_RULES = {"mixed-device": "error", "sync-in-loop": "note"}
+
+# Elementwise calls whose operands broadcast.
+BROADCAST_OPS = {
+    "__add__", "__radd__", "__sub__", "__rsub__", "__mul__", "__rmul__", "__pow__", "__div__", "__rdiv__",
+    "__eq__", "__ne__", "__lt__", "__le__", "__gt__", "__ge__",
+    "add", "sub", "subtract", "mul", "multiply", "maximum", "minimum", "fmod", "remainder", "atan2", "pow",
+    "div", "true_divide", "eq", "ne", "lt", "le", "gt", "ge", "logical_and", "logical_or", "logical_xor", "where",
+}
+INPLACE_OPS = {"__iadd__", "__isub__", "__imul__", "__ipow__", "__idiv__", "add_", "sub_", "mul_", "div_", "pow_"}
+# Calls that wait for the device to produce a host value: a scalar, a list, or a size
+# that depends on the data. Moving to the CPU (.cpu(), .to("cpu")) waits too.
+SYNC_OPS = {"item", "tolist", "nonzero"}
+EXPLICIT_CASTS = {"half", "bfloat16", "float", "double", "short", "int", "long", "type_as"}
+# Copying conversions between numpy and torch -> the conversion that shares memory instead.
+INTEROP_COPIES = {"tensor": "torch.from_numpy or torch.as_tensor", "array": "Tensor.numpy or np.asarray"}
+
+HALF = dtype_masks["Float16"] | dtype_masks["BFloat16"]
+FLOAT64 = dtype_masks["Float64"]
+WIDE_FLOAT = dtype_masks["Float32"] | FLOAT64
+INTEGER = dtype_masks["Integer"] | dtype_masks["Bool"]
+FLOAT = dtype_masks["Float"]
+
+def parse_rules(items: Tuple[str, ...]) -> Dict[str, str]:
+    """{rule: severity} of "rule=severity" items; a bare rule is an error."""
+    rules = {}
+    for item in items:
+        rule, _, severity = item.partition("=")
+        rule, severity = rule.strip(), severity.strip() or "error"
+        if rule not in RULES:
+            raise ValueError(f"Unknown perflint rule {rule!r}, expected one of {', '.join(RULES)}")
+        if severity not in SEVERITIES:
+            raise ValueError(f"Unknown perflint severity {severity!r} for {rule}, expected one of {', '.join(SEVERITIES)}")
+        rules[rule] = severity
+    return rules
+
+def _dims(api, typ: Type):
+    decomposed = decompose_dtype_set(typ)
+    if decomposed is None:
+        return None
+    try:
+        return parse_dimstr(api, decomposed[2])
+    except (ValueError, NotImplementedError):
+        return None
+
+def growth(api, result: Optional[Type], operand_types: List[Type]) -> Optional[Tuple[int, List[AbstractDim]]]:
+    """broadcast_growth of result over its largest array operand, if known. Without result,
+    the broadcast of the operands."""
+    operands = []
+    for typ in operand_types:
+        if decompose_dtype_set(typ) is None:
+            continue  # a scalar
+        dims = _dims(api, typ)
+        if dims is None:
+            return None
+        operands.append(dims)
+    if not operands:
+        return None
+    result_dims = _dims(api, result) if result is not None else functools.reduce(
+        lambda xs, ys: xs and check_shape_compatibility(xs, ys, allow_broadcast=True), operands)
+    if not result_dims:
+        return None
+    growths = [broadcast_growth(result_dims, dims) for dims in operands]
+    if None in growths:
+        return None
+    return min(growths, key=lambda g: (len(g[1]), g[0]))
+
+def _times(factor: int, symbolic: List[AbstractDim]) -> str:
+    return "*".join(([str(factor)] if factor > 1 or not symbolic else []) + [repr(dim) for dim in symbolic])
+
+def _broadcast_operands(api, expr: Expression) -> Optional[List[Type]]:
+    """The operand types of a broadcasting expression: a binary operator or a call of a BROADCAST_OPS method."""
+    if isinstance(expr, OpExpr) and expr.op in ("+", "-", "*", "/", "**"):
+        operands = [expr.left, expr.right]
+    elif isinstance(expr, CallExpr) and isinstance(expr.callee, MemberExpr) and expr.callee.name in BROADCAST_OPS:
+        operands = [expr.callee.expr, *expr.args]
+        if isinstance(expr.callee.expr, RefExpr) and expr.callee.expr.fullname == "torch":
+            operands = list(expr.args)
+    else:
+        return None
+    types = [api.lookup_type_or_none(operand) for operand in operands]
+    return None if None in types else types
+
+def _decorators(api, func: FuncDef) -> List[str]:
+    names = func.info.names if func.info and func.info.fullname else api.tree.names
+    symbol = names.get(func.name)
+    if symbol is None or not isinstance(symbol.node, Decorator):
+        return []
+    fullnames = []
+    for decorator in symbol.node.decorators:
+        if isinstance(decorator, CallExpr):
+            decorator = decorator.callee
+        if isinstance(decorator, RefExpr) and decorator.fullname:
+            fullnames.append(decorator.fullname)
+    return fullnames
+
+
+class Finding(NamedTuple):
+    path: str
+    line: int
+    column: int
+    rule: str
+    severity: str
+    message: str
+    suppressed: bool
+
+
+class PerfLint:
+    def __init__(self, config: ShapeConfig, path: Optional[str]):
+        self.config = config
+        self.path = path
+        for _, items in config.overrides:
+            parse_rules(dict(items).get("perflint", ()))  # fail early on a typo
+        self._modules: Dict[str, Tuple[Dict[str, str], ShapeConfig]] = {}
+        # (path, line, column, rule) -> finding. A call checked again replaces its finding.
+        self.rules = {**DEFAULT_RULES, **parse_rules(config.perflint)}
+        self.findings: Dict[Tuple[str, int, int, str], Finding] = {}
+        self.errors: Optional[Errors] = None
+
+    def _settings(self, module: str) -> Tuple[Dict[str, str], ShapeConfig]:
+        settings = self._modules.get(module)
+        if settings is None:
+            config = module_config(self.config, module)
+            # The rules of an override update the global ones.
+            rules = {**self.rules, **parse_rules(config.perflint)}
+            settings = self._modules[module] = ({r: s for r, s in rules.items() if s != "off"}, config)
+        return settings
+
+    def wrap_hook(self, hook, op: str, method: bool):
+        def linted(ctx):
+            result = hook(ctx)
+            self.check(ctx, op, method, result)
+            return result
+        linted.__name__ = getattr(hook, "__name__", op)
+        return linted
+
+    def _in_hot_function(self, api, hot: Tuple[str, ...]) -> bool:
+        return any(
+            isinstance(item, FuncDef) and any(name in hot for name in _decorators(api, item))
+            for item in api.scope.stack
+        )
+
+    def check(self, ctx, op: str, method: bool, result: Type):
+        tree = getattr(ctx.api, "tree", None)
+        if tree is None:
+            return
+        rules, config = self._settings(tree.fullname)
+        if not rules:
+            return
+        operand_types = ([ctx.type] if method else []) + [typ for types in ctx.arg_types for typ in types]
+        decomposed = decompose_dtype_set(result)
+        numpy = decomposed is not None and is_numpy(decomposed[1])
+        name = f"{'Tensor' if method else 'np' if numpy else 'torch'}.{op}"
+        if "mixed-device" in rules and op not in MOVE_OPS:
+            devices = operand_devices(operand_types)
+            if devices and common_device(devices) is None:
+                self.report(ctx, "mixed-device", rules, f"{name} mixes tensors on {' and '.join(sorted(set(devices)))}")
+        if "sync-in-loop" in rules and ctx.api.binder.break_frames:
+            self._check_sync(ctx, op, method, result, operand_types, rules, name)
+        if "copy" in rules and op in COPY_OPS and operand_types:
+            source, result_dims = _dims(ctx.api, operand_types[0]), _dims(ctx.api, result)
+            layout = layout_of(operand_types[0])
+            if source is not None and result_dims is not None and copies(op, source, layout, result_dims):
+                self.report(ctx, "copy", rules, f"{name} copies its input, which is not contiguous (strides {dump_layout(layout)})")
+        if decomposed is None:
+            return
+        if "interop-copy" in rules and op in INTEROP_COPIES and not method and operand_types:
+            self._check_interop(ctx, op, result, operand_types[0], rules, name)
+        if numpy:
+            return
+        result_mask = decomposed[0]
+        arrays = [d for d in map(decompose_dtype_set, operand_types) if d is not None]
+        operands = [d[0] for d in arrays if not is_numpy(d[1])]
+        explicit = op in EXPLICIT_CASTS
+
+        if "float64" in rules and result_mask == FLOAT64 and FLOAT64 not in operands:
+            if len(operands) < len(arrays):
+                how = "from a numpy array"
+            else:
+                how = "promotion of " + ", ".join(repr_dtype_set(mask) for mask in operands) if operands and not explicit else "explicitly"
+            self.report(ctx, "float64", rules, f"Float64 created by {name} ({how})")
+        if "broadcast" in rules and op in BROADCAST_OPS:
+            grown = growth(ctx.api, result, operand_types)
+            if grown is not None and (grown[1] or grown[0] > config.perflint_broadcast):
+                self.report(ctx, "broadcast", rules,
+                            f"{name} broadcasts to '{decomposed[2]}', {_times(*grown)} times the elements of its largest operand")
+        if "broadcast" in rules and op in INPLACE_OPS and ctx.args and ctx.args[0]:
+            inner = _broadcast_operands(ctx.api, ctx.args[0][0])
+            grown = growth(ctx.api, None, inner) if inner is not None else None
+            if grown is not None and (grown[1] or grown[0] > 1):
+                self.report(ctx, "broadcast", rules,
+                            f"{name} updates from a broadcast temporary, {_times(*grown)} times the elements of its largest operand; a fused in-place op avoids it")
+        if explicit:
+            return
+        if "half-upcast" in rules and result_mask & WIDE_FLOAT and not result_mask & ~WIDE_FLOAT:
+            halves = [mask for mask in operands if not mask & ~HALF]
+            if halves and self._in_hot_function(ctx.api, config.perflint_hot):
+                self.report(ctx, "half-upcast", rules,
+                            f"{repr_dtype_set(halves[0])} promoted to {repr_dtype_set(result_mask)} by {name} in a hot function")
+        if "int-to-float" in rules and result_mask and not result_mask & ~FLOAT:
+            integers = [mask for mask in operands if not mask & ~INTEGER]
+            size = static_size(result, ctx.api)
+            if integers and size is not None and size[0] >= config.perflint_large:
+                self.report(ctx, "int-to-float", rules,
+                            f"{repr_dtype_set(integers[0])} promoted to {repr_dtype_set(result_mask)} by {name} for {size[0]} elements")
+
+    def _check_interop(self, ctx, op: str, result: Type, source: Type, rules: Dict[str, str], name: str):
+        decomposed = decompose_dtype_set(source)
+        if decomposed is None or is_numpy(decomposed[1]) == (op == "array"):
+            return  # not a conversion
+        names = [name for names in ctx.arg_names for name in names]
+        if decompose_dtype_set(result)[0] != decomposed[0] or "device" in names or "copy" in names:
+            return  # the copy changes the dtype or the device, or np.array(t, copy=...) says what it wants
+        self.report(ctx, "interop-copy", rules,
+                    f"{name} copies a {'tensor' if op == 'array' else 'numpy array'} that {INTEROP_COPIES[op]} would share")
+
+    def _check_sync(self, ctx, op: str, method: bool, result: Type, operand_types: List[Type], rules: Dict[str, str], name: str):
+        if op in MOVE_OPS:
+            synced = device_of(result) == "cpu"
+        else:
+            synced = op in SYNC_OPS
+        source = operand_types[0] if operand_types else None
+        if not synced or source is None or decompose_dtype_set(source) is None:
+            return
+        device = device_of(source)
+        if device == "cpu":
+            return
+        where = device if device is not None else "the device (unless the tensor is on the CPU)"
+        self.report(ctx, "sync-in-loop", rules, f"{name} inside a loop waits for {where} on every iteration")
+
+    def report(self, ctx, rule: str, rules: Dict[str, str], message: str):
+        report_message(ctx.api, message, ctx.context, rules[rule], code=RULES[rule])
+        self.errors = ctx.api.msg.errors
+        path, line, column = ctx.api.path, ctx.context.line, ctx.context.column
+        self.findings[path, line, column, rule] = Finding(path, line, column, rule, rules[rule], message, False)
+
+    def report_json(self) -> dict:
+        # mypy may run a hook with its messages filtered (e.g. while it tries the reflected
+        # operator), so the findings are the messages mypy kept, and the ones a type: ignore
+        # comment suppressed.
+        codes = {code.code: rule for rule, code in RULES.items()}
+        shown = {}
+        if self.errors is not None:
+            for infos in self.errors.error_info_map.values():
+                for info in infos:
+                    if info.code is not None and info.code.code in codes:
+                        shown[info.origin[0], info.line, info.column, codes[info.code.code]] = info
+        findings = []
+        for key, finding in sorted(self.findings.items()):
+            info = shown.get(key)
+            if info is not None:
+                finding = finding._replace(message=info.message, severity=info.severity)
+            elif RULES[finding.rule].code in self.errors.used_ignored_lines.get(finding.path, {}).get(finding.line, ()):
+                finding = finding._replace(suppressed=True)
+            else:
+                continue
+            findings.append(finding)
+        counts: Dict[str, Dict[str, int]] = {}
+        for finding in findings:
+            if not finding.suppressed:
+                by_severity = counts.setdefault(finding.rule, {})
+                by_severity[finding.severity] = by_severity.get(finding.severity, 0) + 1
+        return {
+            "counts": counts,
+            "findings": [finding._asdict() for finding in findings],
+        }
+
+    def dump(self):
+        with open(self.path, "w") as f:
+            json.dump(self.report_json(), f, indent=2)
+
+
+_perflint: Optional[PerfLint] = None
+
+def enable_perflint(config: ShapeConfig, path: Optional[str]) -> PerfLint:
+    """Start linting (once per process), and write the findings to path at exit if given."""
+    global _perflint
+    if _perflint is None:
+        _perflint = PerfLint(config, path)
+        if path:
+            atexit.register(_perflint.dump)
+    return _perflint
@@ -0,0 +1,146 @@
+"""Per-hook profiling.
+
+Set MYSHAPING_PROFILE=report.json (or `profile = report.json` in the config section)
+to time every plugin hook and the shape helpers they call. A JSON report is written
+when mypy exits:
+
+    hooks: per hook, call count, total/mean/p99 time, and time spent in the helpers
+           below (inclusive: construct_instance contains its parse_dimstr)
+    locations: the `profile_top` source locations with the most hook time
+"""
+
+import atexit
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Helpers timed inside hooks. Modules that imported them by name are rebound too.
+PROFILED_FUNCTIONS = [
+    ("myshaping.type_translator", "parse_dimstr"),
+    ("myshaping.type_translator", "check_shape_compatibility"),
+    ("myshaping.type_translator", "construct_instance"),
+    ("myshaping.type_translator", "construct_instance_from_dims"),
+    ("myshaping.type_translator", "construct_instance_from_mask"),
+]
+
+_OUTSIDE_HOOKS = "<outside hooks>"
+
+def profile_path() -> Optional[str]:
+    return os.environ.get("MYSHAPING_PROFILE") or None
+
+
+class Profiler:
+    def __init__(self, path: str, top: int):
+        self.path = path
+        self.top = top
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        # hook -> helper -> [calls, seconds]
+        self.inner: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        # (path, line) -> [calls, seconds, {hook names}]
+        self.locations: Dict[Tuple[str, int], List[Any]] = {}
+        self.current = _OUTSIDE_HOOKS
+
+    def wrap_hook(self, hook: Callable) -> Callable:
+        name = hook.__name__
+        durations = self.durations[name]
+        def profiled(ctx):
+            outer, self.current = self.current, name
+            start = time.perf_counter()
+            try:
+                return hook(ctx)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.current = outer
+                durations.append(elapsed)
+                self._record_location(ctx, name, elapsed)
+        profiled.__name__ = name
+        return profiled
+
+    def wrap_helper(self, func: Callable) -> Callable:
+        name = func.__name__
+        def profiled(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry = self.inner[self.current][name]
+                entry[0] += 1
+                entry[1] += time.perf_counter() - start
+        profiled.__name__ = name
+        profiled.__wrapped__ = func  # type: ignore[attr-defined]
+        return profiled
+
+    def instrument_helpers(self):
+        for defining_module, name in PROFILED_FUNCTIONS:
+            original = getattr(sys.modules[defining_module], name)
+            wrapped = self.wrap_helper(original)
+            for module_name, module in list(sys.modules.items()):
+                if module_name.startswith("myshaping") and getattr(module, name, None) is original:
+                    setattr(module, name, wrapped)
+
+    def _record_location(self, ctx, hook_name: str, elapsed: float):
+        key = (source_path(ctx.api), getattr(ctx.context, "line", -1))
+        entry = self.locations.get(key)
+        if entry is None:
+            entry = self.locations[key] = [0, 0.0, set()]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2].add(hook_name)
+
+    def report(self) -> dict:
+        hooks = {}
+        for name, durations in self.durations.items():
+            if not durations:
+                continue
+            ordered = sorted(durations)
+            hooks[name] = {
+                "calls": len(ordered),
+                "total_s": sum(ordered),
+                "mean_us": sum(ordered) / len(ordered) * 1e6,
+                "p99_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6,
+                "helpers": {
+                    helper: {"calls": calls, "total_s": seconds}
+                    for helper, (calls, seconds) in sorted(self.inner.get(name, {}).items())
+                },
+            }
+        if _OUTSIDE_HOOKS in self.inner:
+            hooks[_OUTSIDE_HOOKS] = {"helpers": {
+                helper: {"calls": calls, "total_s": seconds}
+                for helper, (calls, seconds) in sorted(self.inner[_OUTSIDE_HOOKS].items())
+            }}
+        locations = sorted(self.locations.items(), key=lambda item: item[1][1], reverse=True)[:self.top]
+        return {
+            "total_s": sum(sum(durations) for durations in self.durations.values()),
+            "hooks": dict(sorted(hooks.items(), key=lambda item: item[1].get("total_s", 0.0), reverse=True)),
+            "locations": [
+                {"path": path, "line": line, "calls": calls, "total_s": seconds, "hooks": sorted(names)}
+                for (path, line), (calls, seconds, names) in locations
+            ],
+        }
+
+    def dump(self):
+        with open(self.path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def source_path(api) -> str:
+    # TypeChecker for function/method hooks, TypeAnalyser (wrapping the semantic analyzer) for type analysis.
+    path = getattr(api, "path", None)
+    if path is None:
+        module = getattr(getattr(api, "api", None), "cur_mod_node", None)
+        path = getattr(module, "path", None)
+    return path or "?"
+
+_profiler: Optional[Profiler] = None
+
+def enable_profiling(path: str, top: int) -> Profiler:
+    """Start profiling (once per process) and write the report to path at exit."""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(path, top)
+        _profiler.instrument_helpers()
+        atexit.register(_profiler.dump)
+    return _profiler
@@ -0,0 +1,165 @@
+"""Dtype promotion rules of torch 2.7.1 and numpy 2.2.6.
+
+Generated by tools/gen_promotion_table.py. Do not edit.
+Row i, column j of each table is for (DTYPES[i], DTYPES[j]).
+"""
+
+TORCH_VERSION = "2.7.1"
+NUMPY_VERSION = "2.2.6"
+
+DTYPES = ['Bool', 'UInt2', 'UInt4', 'UInt8', 'UInt16', 'UInt32', 'UInt64', 'Int2', 'Int4', 'Int8', 'Int16', 'Int32', 'Int64', 'Float8e4m3b11fnuz', 'Float8e4m3fn', 'Float8e4m3fnuz', 'Float8e5m2', 'Float8e5m2fnuz', 'BFloat16', 'Float16', 'Float32', 'Float64', 'Complex64', 'Complex128']
+
+# Index of the promoted dtype in ALPHABET, or "-" if torch refuses to promote.
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+PROMOTION = (
+    "0--3-----9abc-----ijklmn"  # Bool
+    "-1----------------ijkl--"  # UInt2
+    "--2---------------ijkl--"  # UInt4
+    "3--3-----aabc-----ijklmn"  # UInt8
+    "----4-------------ijkl--"  # UInt16
+    "-----5------------ijkl--"  # UInt32
+    "------6-----------ijkl--"  # UInt64
+    "-------7----------------"  # Int2
+    "--------8---------------"  # Int4
+    "9--a-----9abc-----ijklmn"  # Int8
+    "a--a-----aabc-----ijklmn"  # Int16
+    "b--b-----bbbc-----ijklmn"  # Int32
+    "c--c-----cccc-----ijklmn"  # Int64
+    "-------------d----------"  # Float8e4m3b11fnuz
+    "--------------e---------"  # Float8e4m3fn
+    "---------------f--------"  # Float8e4m3fnuz
+    "----------------g-------"  # Float8e5m2
+    "-----------------h------"  # Float8e5m2fnuz
+    "iiiiiii--iiii-----ikklmn"  # BFloat16
+    "jjjjjjj--jjjj-----kjklmn"  # Float16
+    "kkkkkkk--kkkk-----kkklmn"  # Float32
+    "lllllll--llll-----llllnn"  # Float64
+    "m--m-----mmmm-----mmmnmn"  # Complex64
+    "n--n-----nnnn-----nnnnnn"  # Complex128
+)
+
+# "1" if every value of DTYPES[i] is exactly representable in DTYPES[j].
+SAFE_CAST = (
+    "111111111111111111111111"  # Bool
+    "011111101111101111111111"  # UInt2
+    "001111100111101101111111"  # UInt4
+    "000111100011100000111111"  # UInt8
+    "000011100001100000001111"  # UInt16
+    "000001100000100000000101"  # UInt32
+    "000000100000000000000000"  # UInt64
+    "000000011111101111111111"  # Int2
+    "000000001111101101111111"  # Int4
+    "000000000111100000111111"  # Int8
+    "000000000011100000001111"  # Int16
+    "000000000001100000000101"  # Int32
+    "000000000000100000000000"  # Int64
+    "000000000000010000000000"  # Float8e4m3b11fnuz
+    "000000000000001001111111"  # Float8e4m3fn
+    "000000000000001101111111"  # Float8e4m3fnuz
+    "000000000000000011111111"  # Float8e5m2
+    "000000000000000001111111"  # Float8e5m2fnuz
+    "000000000000000000101111"  # BFloat16
+    "000000000000000000011111"  # Float16
+    "000000000000000000001111"  # Float32
+    "000000000000000000000101"  # Float64
+    "000000000000000000000011"  # Complex64
+    "000000000000000000000001"  # Complex128
+)
+
+# "1" if a DTYPES[i] result can be written into a DTYPES[j] tensor in-place.
+CAN_CAST = (
+    "111111111111101111111111"  # Bool
+    "011111111111101111111111"  # UInt2
+    "011111111111101111111111"  # UInt4
+    "011111111111101111111111"  # UInt8
+    "011111111111101111111111"  # UInt16
+    "011111111111101111111111"  # UInt32
+    "011111111111101111111111"  # UInt64
+    "011111111111101111111111"  # Int2
+    "011111111111101111111111"  # Int4
+    "011111111111101111111111"  # Int8
+    "011111111111101111111111"  # Int16
+    "011111111111101111111111"  # Int32
+    "011111111111101111111111"  # Int64
+    "000000000000010000000000"  # Float8e4m3b11fnuz
+    "011000011000001111111111"  # Float8e4m3fn
+    "011000011000001111111111"  # Float8e4m3fnuz
+    "011000011000001111111111"  # Float8e5m2
+    "011000011000001111111111"  # Float8e5m2fnuz
+    "011000011000001111111111"  # BFloat16
+    "011000011000001111111111"  # Float16
+    "011000011000001111111111"  # Float32
+    "011000011000001111111111"  # Float64
+    "000000000000000000000011"  # Complex64
+    "000000000000000000000011"  # Complex128
+)
+
+# Python scalar kind -> dtype of `tensor <op> scalar` for each tensor dtype.
+SCALAR_PROMOTION = {
+    "bool": "0123456789abcdefghijklmn",
+    "int": "c123456789abcdefghijklmn",
+    "float": "kkkkkkk--kkkkdefghijklmn",
+    "complex": "mmmmmmmmmmmmm-----m-mnmn",
+}
+
+# The same for numpy arrays, "-" where numpy has no such dtype.
+NUMPY_PROMOTION = (
+    "0--3456--9abc------jklmn"  # Bool
+    "------------------------"  # UInt2
+    "------------------------"  # UInt4
+    "3--3456--aabc------jklmn"  # UInt8
+    "4--4456--bbbc------kklmn"  # UInt16
+    "5--5556--cccc------lllnn"  # UInt32
+    "6--6666--llll------lllnn"  # UInt64
+    "------------------------"  # Int2
+    "------------------------"  # Int4
+    "9--abcl--9abc------jklmn"  # Int8
+    "a--abcl--aabc------kklmn"  # Int16
+    "b--bbcl--bbbc------lllnn"  # Int32
+    "c--cccl--cccc------lllnn"  # Int64
+    "------------------------"  # Float8e4m3b11fnuz
+    "------------------------"  # Float8e4m3fn
+    "------------------------"  # Float8e4m3fnuz
+    "------------------------"  # Float8e5m2
+    "------------------------"  # Float8e5m2fnuz
+    "------------------------"  # BFloat16
+    "j--jkll--jkll------jklmn"  # Float16
+    "k--kkll--kkll------kklmn"  # Float32
+    "l--llll--llll------lllnn"  # Float64
+    "m--mmnn--mmnn------mmnmn"  # Complex64
+    "n--nnnn--nnnn------nnnnn"  # Complex128
+)
+
+NUMPY_CAN_CAST = (
+    "100111100111100000011111"  # Bool
+    "000000000000000000000000"  # UInt2
+    "000000000000000000000000"  # UInt4
+    "000111100111100000011111"  # UInt8
+    "000111100111100000011111"  # UInt16
+    "000111100111100000011111"  # UInt32
+    "000111100111100000011111"  # UInt64
+    "000000000000000000000000"  # Int2
+    "000000000000000000000000"  # Int4
+    "000000000111100000011111"  # Int8
+    "000000000111100000011111"  # Int16
+    "000000000111100000011111"  # Int32
+    "000000000111100000011111"  # Int64
+    "000000000000000000000000"  # Float8e4m3b11fnuz
+    "000000000000000000000000"  # Float8e4m3fn
+    "000000000000000000000000"  # Float8e4m3fnuz
+    "000000000000000000000000"  # Float8e5m2
+    "000000000000000000000000"  # Float8e5m2fnuz
+    "000000000000000000000000"  # BFloat16
+    "000000000000000000011111"  # Float16
+    "000000000000000000011111"  # Float32
+    "000000000000000000011111"  # Float64
+    "000000000000000000000011"  # Complex64
+    "000000000000000000000011"  # Complex128
+)
+
+NUMPY_SCALAR_PROMOTION = {
+    "bool": "0--3456--9abc------jklmn",
+    "int": "c--3456--9abc------jklmn",
+    "float": "l--llll--llll------jklmn",
+    "complex": "n--nnnn--nnnn------mmnmn",
+}
@@ -1,19 +1,60 @@
-from typing import List, Callable, Optional
-FUNCTION_HOOKS = {}
-TYPE_ANALYZE_HOOKS = {}
-METHOD_HOOKS = {}
+import importlib
+from typing import List, Callable, Optional, Dict, Tuple
+# fullname -> hook. A name like "jaxtyping._array_types.*.__add__" matches the method of every class in that module.
+FUNCTION_HOOKS: Dict[str, Callable] = {}
+TYPE_ANALYZE_HOOKS: Dict[str, Callable] = {}
+METHOD_HOOKS: Dict[str, Callable] = {}
+
+# fullname prefix -> modules registering hooks for it. They are imported the first time
+# a name with the prefix is looked up, so that mypy runs over code without tensors never load them.
+LAZY_HOOK_MODULES: Dict[str, Tuple[str, ...]] = {
+    "torch.": ("myshaping.torch_function_hooks", "myshaping.torch_rule_hooks"),
+    "jaxtyping._array_types.": ("myshaping.tensor_method_hooks", "myshaping.torch_rule_hooks"),
+    "numpy.": ("myshaping.torch_rule_hooks",),
+}
+
+def _load_hook_modules(name: str):
+    for prefix in [p for p in LAZY_HOOK_MODULES if name.startswith(p)]:
+        for module in LAZY_HOOK_MODULES.pop(prefix):
+            importlib.import_module(module)
 
 def construct_registry(hooks: dict):
+    # mypy asks about every call it checks, almost all of which have no hook.
+    # Resolved lookups (including misses) are kept so that each fullname costs a single dict lookup.
+    resolved: Dict[str, Optional[Callable]] = {}
+    # member -> module -> hook, for the wildcard registrations
+    families: Dict[str, Dict[str, Callable]] = {}
+
     def register(*names: str):
         def decorator(func: Callable):
             for name in names:
                 hooks[name] = func
+                owner, _, member = name.rpartition(".")
+                if owner.endswith(".*"):
+                    families.setdefault(member, {})[owner[:-2]] = func
+            resolved.clear()
             return func
         return decorator
+
+    def resolve(name: str) -> Optional[Callable]:
+        if LAZY_HOOK_MODULES:
+            _load_hook_modules(name)
+        hook = hooks.get(name)
+        if hook is None:
+            owner, _, member = name.rpartition(".")
+            modules = families.get(member)
+            if modules is not None:
+                hook = modules.get(owner.rpartition(".")[0])
+        resolved[name] = hook
+        return hook
+
     def get(name: str) -> Optional[Callable]:
-        return hooks.get(name, None)
+        try:
+            return resolved[name]
+        except KeyError:
+            return resolve(name)
     return register, get
 
 register_function_hook, get_function_hook = construct_registry(FUNCTION_HOOKS)
 register_type_analyze_hook, get_type_analyze_hook = construct_registry(TYPE_ANALYZE_HOOKS)
-register_method_hook, get_method_hook = construct_registry(METHOD_HOOKS)
\ No newline at end of file
+register_method_hook, get_method_hook = construct_registry(METHOD_HOOKS)
@@ -0,0 +1,352 @@
+"""Runtime shape checks that skip the arguments mypy already proved.
+
+A drop-in for jaxtyping.jaxtyped on functions::
+
+    from beartype import beartype
+    from myshaping.runtime import jaxtyped
+
+    @jaxtyped(typechecker=beartype)
+    def step(x: Float[Tensor, "b c"], w: Float[Tensor, "c d"]) -> Float[Tensor, "b d"]: ...
+
+The manifest written by the plugin (see myshaping.manifest) is read once, when the first
+function is decorated, from the `manifest` argument or MYSHAPING_MANIFEST. Each call
+looks up its call site (file and line of the caller):
+
+- where some or all annotated arguments are proven, a jaxtyped copy of the function
+  without their annotations checks the others and the return value (mypy can't prove
+  the shape a function returns, only that its return statements match the annotation);
+  without a return annotation, a call with every argument proven runs unchecked;
+- anywhere else, including calls mypy never saw, the function is checked as
+  jaxtyped(typechecker=...) would.
+
+The manifest is ignored as a whole once any module of the build it was written from
+changed, since a proof depends on the types of everything the caller imports.
+
+shapecheck is a standalone checker for the array annotations of a function. It compiles
+each annotation once and caches the verdict per concrete signature (array type, dtype
+and shape of every array argument), so a call with a signature seen before costs one
+lookup in an LRU cache. It can also sample: check 1 in `every` calls, or only the first
+`first` distinct signatures.
+
+This module only imports jaxtyping, not mypy.
+"""
+
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import sys
+import types
+import typing
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple, TypeVar
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+MANIFEST_VERSION = 2
+
+# manifest path -> "path:qualname" of the function -> (path, line) of a call -> proven parameters
+_manifests: Dict[str, Dict[str, Dict[Tuple[str, int], FrozenSet[str]]]] = {}
+_abspaths: Dict[str, str] = {}
+
+def _abspath(path: str) -> str:
+    result = _abspaths.get(path)
+    if result is None:
+        result = _abspaths[path] = os.path.abspath(path)
+    return result
+
+def _unchanged(path: str, digest: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest() == digest
+    except OSError:
+        return False
+
+def load_manifest(path: str) -> Dict[str, Dict[Tuple[str, int], FrozenSet[str]]]:
+    """Read a manifest, or nothing if a module of the build changed since it was written."""
+    functions = _manifests.get(path)
+    if functions is not None:
+        return functions
+    functions = _manifests[path] = {}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return functions
+    if data.get("version") != MANIFEST_VERSION:
+        return functions
+    if not all(_unchanged(file, digest) for file, digest in data.get("files", {}).items()):
+        return functions
+    for function, sites in data.get("functions", {}).items():
+        entries = {}
+        for site, proven in sites.items():
+            file, _, line = site.rpartition(":")
+            entries[file, int(line)] = frozenset(proven)
+        functions[function] = entries
+    return functions
+
+
+def _without_annotations(fn: Callable, names: FrozenSet[str]) -> Callable:
+    """A copy of fn without the annotations of the given parameters."""
+    copy = types.FunctionType(fn.__code__, fn.__globals__, fn.__name__, fn.__defaults__, fn.__closure__)
+    copy.__kwdefaults__ = fn.__kwdefaults__
+    copy.__dict__.update(fn.__dict__)
+    copy.__qualname__ = fn.__qualname__
+    copy.__module__ = fn.__module__
+    copy.__doc__ = fn.__doc__
+    copy.__annotations__ = {k: v for k, v in fn.__annotations__.items() if k not in names}
+    return copy
+
+def jaxtyped(*, typechecker: Any, manifest: Optional[str] = None) -> Callable[[_F], _F]:
+    """jaxtyping.jaxtyped(typechecker=...) for functions, skipping the checks of proven arguments."""
+    import jaxtyping
+
+    def decorator(fn: _F) -> _F:
+        checked = jaxtyping.jaxtyped(typechecker=typechecker)(fn)
+        path = manifest or os.environ.get("MYSHAPING_MANIFEST")
+        sites = load_manifest(path).get(f"{_abspath(fn.__code__.co_filename)}:{fn.__qualname__}") if path else None
+        if not sites:
+            return checked
+        annotated = frozenset(name for name in fn.__annotations__ if name != "return")
+        variants: Dict[FrozenSet[str], Callable] = {}
+        targets: Dict[Tuple[str, int], Callable] = {}
+        for site, proven in sites.items():
+            proven = proven & annotated
+            if not proven:
+                continue
+            if proven not in variants:
+                variants[proven] = fn if proven == annotated and "return" not in fn.__annotations__ else \
+                    jaxtyping.jaxtyped(typechecker=typechecker)(_without_annotations(fn, proven))
+            targets[site] = variants[proven]
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            caller = sys._getframe(1)
+            target = targets.get((_abspath(caller.f_code.co_filename), caller.f_lineno), checked)
+            return target(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+_missing = object()
+
+def _dtype_name(dtype: Any) -> str:
+    """The dtype of an array as jaxtyping spells it, e.g. "float32"."""
+    if hasattr(dtype, "type") and hasattr(dtype.type, "__name__"):  # numpy, JAX
+        return str(dtype) if dtype.type.__name__ == "void" else dtype.type.__name__
+    if hasattr(dtype, "as_numpy_dtype"):  # TensorFlow
+        return dtype.as_numpy_dtype.__name__
+    return dtype if isinstance(dtype, str) else repr(dtype).rsplit(".", 1)[-1]  # torch
+
+def _broadcast(x: Tuple[int, ...], y: Tuple[int, ...]) -> Optional[Tuple[int, ...]]:
+    if len(x) < len(y):
+        x, y = y, x
+    y = (1,) * (len(x) - len(y)) + tuple(y)
+    result = []
+    for a, b in zip(x, y):
+        if a != b and a != 1 and b != 1:
+            return None
+        result.append(b if a == 1 else a)
+    return tuple(result)
+
+
+class _Memo:
+    """The sizes bound to dim names during one check."""
+
+    def __init__(self, single: Optional[Dict[str, int]] = None, variadic: Optional[Dict[str, Tuple[bool, Tuple[int, ...]]]] = None):
+        self.single = dict(single or {})
+        self.variadic = dict(variadic or {})
+        self.symbolic: List[Tuple[Any, int, str]] = []  # (symbolic dim, size, where)
+
+
+class _ArraySpec:
+    """A jaxtyping array annotation, compiled once."""
+
+    def __init__(self, annotation: Any):
+        from jaxtyping._array_types import _any_dtype, _anonymous_dim, _anonymous_variadic_dim, _FixedDim, _NamedDim, _SymbolicDim  # type: ignore[attr-defined]
+        self.annotation = annotation
+        self.array_type = annotation.array_type
+        self.dtypes = None if annotation.dtypes is _any_dtype else frozenset(annotation.dtypes)
+        self.index_variadic = annotation.index_variadic
+        self.dims = annotation.dims
+        self.n_dims = len(self.dims) - (self.index_variadic is not None)
+        # (kind, payload, broadcastable) per dim; kinds: "_", "fixed", "named", "symbolic", "variadic"
+        self.compiled: List[Tuple[str, Any, bool]] = []
+        for dim in self.dims:
+            dim_type = type(dim)
+            if dim is _anonymous_dim or dim is _anonymous_variadic_dim:
+                self.compiled.append(("_", None, False))
+            elif dim_type is _FixedDim:
+                self.compiled.append(("fixed", dim.size, dim.broadcastable))
+            elif dim_type is _NamedDim:
+                self.compiled.append(("named", dim.name, dim.broadcastable))
+            elif dim_type is _SymbolicDim:
+                self.compiled.append(("symbolic", (dim.elem, compile(dim.elem, "<shape>", "eval")), dim.broadcastable))
+            else:  # _NamedVariadicDim
+                self.compiled.append(("variadic", dim.name, dim.broadcastable))
+
+    def check(self, array_type: type, dtype: Any, shape: Tuple[int, ...], memo: _Memo, where: str) -> str:
+        if self.array_type is not Any and not issubclass(array_type, self.array_type):
+            return f"this value is not an instance of the underlying array type {self.array_type}"
+        if self.dtypes is not None and _dtype_name(dtype) not in self.dtypes:
+            return f"this array has dtype {_dtype_name(dtype)}, not any of {sorted(self.dtypes)} as expected by the type hint"
+        i = self.index_variadic
+        if i is None:
+            if len(shape) != len(self.dims):
+                return f"this array has {len(shape)} dimensions, not the {len(self.dims)} expected by the type hint"
+            return self._check_dims(self.compiled, shape, memo, where)
+        if len(shape) < self.n_dims:
+            return f"this array has {len(shape)} dimensions, which is fewer than {self.n_dims} that is the minimum expected by the type hint"
+        j = len(shape) - (len(self.dims) - i - 1)
+        error = self._check_dims(self.compiled[:i], shape[:i], memo, where) or \
+            self._check_dims(self.compiled[i + 1:], shape[j:], memo, where)
+        if error:
+            return error
+        kind, name, broadcastable = self.compiled[i]
+        if kind == "_":
+            return ""
+        new = tuple(shape[i:j])
+        if name not in memo.variadic:
+            memo.variadic[name] = (broadcastable, new)
+            return ""
+        prev_broadcastable, prev = memo.variadic[name]
+        if broadcastable or prev_broadcastable:
+            joined = _broadcast(new, prev)
+            if joined is None:
+                return f"the shape of its variadic dimensions '*{name}' is {new}, which cannot be broadcast with the existing value of {prev}"
+            memo.variadic[name] = (broadcastable and prev_broadcastable, joined)
+        elif new != prev:
+            return f"the shape of its variadic dimensions '*{name}' is {new}, which does not equal the existing value of {prev}"
+        return ""
+
+    @staticmethod
+    def _check_dims(dims: List[Tuple[str, Any, bool]], shape: Tuple[int, ...], memo: _Memo, where: str) -> str:
+        for (kind, payload, broadcastable), size in zip(dims, shape):
+            if kind == "_" or (broadcastable and size == 1):
+                continue
+            if kind == "fixed":
+                if payload != size:
+                    return f"the dimension size {size} does not equal {payload} as expected by the type hint"
+            elif kind == "named":
+                bound = memo.single.setdefault(payload, size)
+                if bound != size:
+                    return f"the size of dimension {payload} is {size} which does not equal the existing value of {bound}"
+            else:
+                # Symbolic dims may refer to names bound by later parameters.
+                memo.symbolic.append((payload, size, where))
+        return ""
+
+def _check_symbolic(memo: _Memo) -> Tuple[str, str]:
+    """(where, error) of the first symbolic dim that doesn't hold, ("", "") if all do."""
+    for (elem, code), size, where in memo.symbolic:
+        try:
+            expected = eval(code, dict(memo.single))
+        except NameError:
+            return where, f"the symbolic axis {elem} refers to names no argument binds"
+        if expected != size:
+            return where, f"the dimension size {size} does not equal the existing value of {elem}={expected}"
+    memo.symbolic.clear()
+    return "", ""
+
+def _signature(value: Any) -> Any:
+    """The part of a value its array annotation depends on."""
+    if value is _missing:  # not passed
+        return _missing
+    try:
+        shape, dtype = value.shape, value.dtype
+    except AttributeError:
+        return type(value), None, None
+    # torch.Size is a tuple already.
+    return type(value), dtype, shape if isinstance(shape, tuple) else tuple(shape)
+
+def _spec(annotation: Any) -> Optional[_ArraySpec]:
+    if isinstance(annotation, type) and hasattr(annotation, "dims") and hasattr(annotation, "index_variadic"):
+        return _ArraySpec(annotation)
+    return None
+
+def shapecheck(fn: Optional[_F] = None, *, maxsize: int = 1024, every: int = 1, first: Optional[int] = None) -> Any:
+    """Check the jaxtyping array annotations of fn, caching the verdict per concrete signature.
+
+    Other annotations are not checked. At most `maxsize` signatures are cached. With
+    every=N only 1 in N calls is checked; with first=K only the first K distinct signatures
+    are checked and calls with any other signature run unchecked.
+    """
+    if fn is None:
+        return functools.partial(shapecheck, maxsize=maxsize, every=every, first=first)
+    from jaxtyping import TypeCheckError
+
+    try:
+        hints = typing.get_type_hints(fn)
+    except Exception:
+        hints = dict(fn.__annotations__)
+    parameters = list(inspect.signature(fn).parameters.values())
+    # (position or None, name, spec) of the parameters with array annotations
+    checked = []
+    for index, parameter in enumerate(parameters):
+        spec = _spec(hints.get(parameter.name))
+        if spec is None or parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        position = index if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD) else None
+        checked.append((position, parameter.name, spec))
+    returns = _spec(hints.get("return"))
+    if not checked and returns is None:
+        return fn
+    name = fn.__qualname__
+
+    @functools.lru_cache(maxsize=maxsize)
+    def check_arguments(key: Tuple) -> Tuple[str, Optional[_Memo]]:
+        memo = _Memo()
+        for (_, param, spec), signature in zip(checked, key):
+            if signature is _missing:
+                continue
+            array_type, dtype, shape = signature
+            error = spec.check(array_type, dtype, shape, memo, param)
+            if error:
+                return f"Type-check error whilst checking the parameters of {name}.\nParameter {param}: {error}", None
+        param, error = _check_symbolic(memo)
+        if error:
+            return f"Type-check error whilst checking the parameters of {name}.\nParameter {param}: {error}", None
+        return "", memo
+
+    @functools.lru_cache(maxsize=maxsize)
+    def check_return(key: Tuple, signature: Tuple) -> str:
+        memo = check_arguments(key)[1]
+        assert returns is not None and memo is not None
+        memo = _Memo(memo.single, memo.variadic)
+        array_type, dtype, shape = signature
+        error = returns.check(array_type, dtype, shape, memo, "return") or _check_symbolic(memo)[1]
+        return f"Type-check error whilst checking the return value of {name}.\n{error}" if error else ""
+
+    positions = [position for position, _, _ in checked if position is not None]
+    # Calls passing every array argument positionally take the fast path.
+    last_position = max(positions) if positions and len(positions) == len(checked) else sys.maxsize
+    calls = itertools.count()
+    seen: Set[Tuple] = set()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if every > 1 and next(calls) % every:
+            return fn(*args, **kwargs)
+        if not kwargs and len(args) > last_position:
+            key = tuple([_signature(args[position]) for position in positions])
+        else:
+            key = tuple([
+                _signature(args[position] if position is not None and position < len(args) else kwargs.get(param, _missing))
+                for position, param, _ in checked
+            ])
+        if first is not None and key not in seen:
+            if len(seen) >= first:
+                return fn(*args, **kwargs)
+            seen.add(key)
+        error, _ = check_arguments(key)
+        if error:
+            raise TypeCheckError(error)
+        result = fn(*args, **kwargs)
+        if returns is not None:
+            error = check_return(key, _signature(result))
+            if error:
+                raise TypeCheckError(error)
+        return result
+    wrapper.cache_info = check_arguments.cache_info  # type: ignore[attr-defined]
+    return wrapper
@@ -0,0 +1,539 @@
+"""Shape and dtype functions the rules in shape_rules.py are written with.
+
+Shape functions take parsed dims (and plain Python values for the other parameters) and
+return the dims of the result. They raise ShapeError for a call torch would reject, and
+Unknown when the result can't be inferred statically, e.g. the rank of "*b" or squeeze
+of a named dim that may be 1 at runtime.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from myshaping.symbolic import Poly, add, atom, constant, floordiv, mul, sub
+from myshaping.type_translator import (
+    AbstractDimOrVariadicDim, AnonymousDim, AnonymousVariadicDim, Dims, FixedDim, NamedDim, NamedVariadicDim,
+    SymbolicDim, check_shape_compatibility, dim_from_poly, dtype_masks, dump_dims, promote_dtype_sets, union_mapper,
+)
+
+class ShapeError(Exception):
+    """The call fails at runtime."""
+
+class Unknown(Exception):
+    """The result can't be inferred."""
+
+_variadic = (AnonymousVariadicDim, NamedVariadicDim)
+
+def _has_variadic(dims: Dims) -> bool:
+    return any(isinstance(d, _variadic) for d in dims)
+
+def _axis(dims: Dims, d: int, extra: int = 0) -> int:
+    """Normalize axis d of dims (of dims with `extra` axes inserted)."""
+    n = len(dims) + extra
+    for i, dim in enumerate(dims):
+        if isinstance(dim, _variadic):
+            # Axes before the variadic dims count from the front, the others from the back.
+            if 0 <= d < i or (d < 0 and -d <= n - i - 1):
+                return d % n
+            raise Unknown()
+    if not -n <= d < n:
+        raise ShapeError(f"Dimension out of range (expected to be in range of [{-n}, {n - 1}], but got {d})")
+    return d % n
+
+def _poly(dim: AbstractDimOrVariadicDim) -> Optional[Poly]:
+    if isinstance(dim, FixedDim):
+        return constant(dim.size)
+    if isinstance(dim, NamedDim):
+        return atom(dim.name)
+    if isinstance(dim, SymbolicDim):
+        return dim.elem
+    return None
+
+def _same(x: AbstractDimOrVariadicDim, y: AbstractDimOrVariadicDim) -> Optional[AbstractDimOrVariadicDim]:
+    """The dim x and y are both equal to, None if they differ."""
+    if isinstance(x, AnonymousDim):
+        return y
+    if isinstance(y, AnonymousDim) or x == y:
+        return x
+    px, py = _poly(x), _poly(y)
+    if px is not None and px is py:  # e.g. a broadcastable and a plain "n"
+        return x
+    return None
+
+def _numel(dims: Dims) -> Optional[Poly]:
+    result = constant(1)
+    for dim in dims:
+        p = _poly(dim)
+        if p is None:
+            return None
+        result = mul(result, p)
+    return result
+
+def _product(dims: Dims) -> AbstractDimOrVariadicDim:
+    p = _numel(dims)
+    return AnonymousDim() if p is None else dim_from_poly(p)
+
+def _dims(sizes: Sequence[int]) -> Dims:
+    for size in sizes:
+        if size < 0:
+            raise ShapeError(f"Trying to create tensor with negative dimension {size}: {list(sizes)}")
+    return tuple(FixedDim(size) for size in sizes)
+
+
+def same(x: Dims) -> Dims:
+    return x
+
+def broadcast(*xs: Dims) -> Dims:
+    result = xs[0]
+    for x in xs[1:]:
+        joined = check_shape_compatibility(result, x, allow_broadcast=True)
+        if joined is None:
+            raise ShapeError(f"'{dump_dims(result)}' and '{dump_dims(x)}' can't be broadcast")
+        result = tuple(joined)
+    return result
+
+def broadcast_to(x: Dims, *others: Dims) -> Dims:
+    """x, after checking that each of others broadcasts to it (masked_fill, in-place ops)."""
+    for other in others:
+        joined = check_shape_compatibility(x, other, allow_broadcast=True)
+        if joined is None or tuple(joined) != tuple(x):
+            raise ShapeError(f"'{dump_dims(other)}' doesn't broadcast to '{dump_dims(x)}'")
+    return x
+
+def sizes(shape: Union[int, Sequence[int]]) -> Dims:
+    if shape is None:
+        raise Unknown()
+    return _dims([shape] if isinstance(shape, int) else shape)
+
+def transpose(x: Dims, dim0: int, dim1: int) -> Dims:
+    i, j = _axis(x, dim0), _axis(x, dim1)
+    result = list(x)
+    result[i], result[j] = result[j], result[i]
+    return tuple(result)
+
+def t(x: Dims) -> Dims:
+    if _has_variadic(x):
+        raise Unknown()
+    if len(x) > 2:
+        raise ShapeError(f"t() expects a tensor with <= 2 dimensions, but self is {len(x)}D")
+    return tuple(reversed(x))
+
+def adjoint(x: Dims) -> Dims:
+    """mT/mH: swap the last two dims."""
+    if len(x) < 2:
+        raise ShapeError("tensor.mT is only supported on matrices or batches of matrices")
+    return transpose(x, -2, -1)
+
+def permute(x: Dims, dims: Sequence[int]) -> Dims:
+    if _has_variadic(x):
+        raise Unknown()
+    if len(dims) != len(x):
+        raise ShapeError(f"number of dims don't match in permute: '{dump_dims(x)}' vs {list(dims)}")
+    axes = [_axis(x, d) for d in dims]
+    if len(set(axes)) != len(axes):
+        raise ShapeError(f"repeated dim in permute: {list(dims)}")
+    return tuple(x[a] for a in axes)
+
+def movedim(x: Dims, source: int, destination: int) -> Dims:
+    if _has_variadic(x):
+        raise Unknown()
+    i, j = _axis(x, source), _axis(x, destination)
+    result = list(x)
+    result.insert(j, result.pop(i))
+    return tuple(result)
+
+def reshape(x: Dims, shape: Sequence[int]) -> Dims:
+    if shape.count(-1) > 1:
+        raise ShapeError("only one dimension can be inferred")
+    if any(s < -1 for s in shape):
+        raise ShapeError(f"invalid shape dimension {min(shape)}")
+    numel = _numel(x)
+    known = 1
+    for s in shape:
+        if s != -1:
+            known *= s
+    if numel is not None and numel.constant is not None:
+        total = numel.constant
+        if -1 in shape:
+            if known == 0 or total % known:
+                raise ShapeError(f"shape '{list(shape)}' is invalid for input of size {total}")
+            shape = [total // known if s == -1 else s for s in shape]
+        elif known != total:
+            raise ShapeError(f"shape '{list(shape)}' is invalid for input of size {total}")
+        return _dims(shape)
+    if -1 not in shape:
+        return _dims(shape)
+    # Infer -1 symbolically, e.g. "b 4 c" viewed as (4, -1) is "4 b*c".
+    inferred: AbstractDimOrVariadicDim = AnonymousDim()
+    if numel is not None and known > 0 and all(c % known == 0 for _, c in numel.terms):
+        inferred = dim_from_poly(floordiv(numel, known))
+    return tuple(inferred if s == -1 else FixedDim(s) for s in shape)
+
+def flatten(x: Dims, start_dim: int = 0, end_dim: int = -1) -> Dims:
+    if not x:
+        return (FixedDim(1),)
+    i, j = _axis(x, start_dim), _axis(x, end_dim)
+    if i > j:
+        raise ShapeError("flatten() has invalid args: start_dim cannot come after end_dim")
+    return (*x[:i], _product(x[i:j + 1]), *x[j + 1:])
+
+def unflatten(x: Dims, dim: int, shape: Sequence[int]) -> Dims:
+    i = _axis(x, dim)
+    return (*x[:i], *reshape((x[i],), shape), *x[i + 1:])
+
+def unsqueeze(x: Dims, dim: int) -> Dims:
+    i = _axis(x, dim, extra=1)
+    return (*x[:i], FixedDim(1), *x[i:])
+
+def squeeze(x: Dims, dim: Union[None, int, Sequence[int]] = None) -> Dims:
+    if dim is None:
+        if any(not isinstance(d, FixedDim) for d in x):
+            # A named dim may be 1 at runtime.
+            raise Unknown()
+        return tuple(d for d in x if d != FixedDim(1))
+    axes = {_axis(x, d) for d in ([dim] if isinstance(dim, int) else dim)} if x else set()
+    if any(not isinstance(x[a], FixedDim) for a in axes):
+        raise Unknown()
+    return tuple(d for i, d in enumerate(x) if not (i in axes and d == FixedDim(1)))
+
+def reduce(x: Dims, dim: Union[None, int, Sequence[int]] = None, keepdim: bool = False) -> Dims:
+    if dim is None or (not isinstance(dim, int) and not dim):  # amax's default dim=() reduces every dim too
+        if keepdim:
+            if _has_variadic(x):
+                raise Unknown()
+            return tuple(FixedDim(1) for _ in x)
+        return ()
+    axes = {_axis(x, d) for d in ([dim] if isinstance(dim, int) else dim)} if x else set()
+    if keepdim:
+        return tuple(FixedDim(1) if i in axes else d for i, d in enumerate(x))
+    return tuple(d for i, d in enumerate(x) if i not in axes)
+
+def _check_inner(a: AbstractDimOrVariadicDim, b: AbstractDimOrVariadicDim, x: Dims, y: Dims):
+    if isinstance(a, _variadic) or isinstance(b, _variadic):
+        raise Unknown()
+    if _same(a, b) is None:
+        raise ShapeError(f"'{dump_dims(x)}' and '{dump_dims(y)}' cannot be multiplied ({a} vs {b})")
+
+def matmul(x: Dims, y: Dims) -> Dims:
+    if (_has_variadic(x) and len(x) < 3) or (_has_variadic(y) and len(y) < 3):
+        raise Unknown()  # may be 1-D
+    if not x or not y:
+        raise ShapeError("both arguments to matmul need to be at least 1D")
+    if len(x) == 1 and len(y) == 1:
+        _check_inner(x[0], y[0], x, y)
+        return ()
+    if len(x) == 1:
+        _check_inner(x[0], y[-2], x, y)
+        return (*y[:-2], y[-1])
+    if len(y) == 1:
+        _check_inner(x[-1], y[0], x, y)
+        return x[:-1]
+    _check_inner(x[-1], y[-2], x, y)
+    return (*broadcast(x[:-2], y[:-2]), x[-2], y[-1])
+
+def mm(x: Dims, y: Dims) -> Dims:
+    if len(x) != 2 or len(y) != 2 or _has_variadic(x) or _has_variadic(y):
+        if _has_variadic(x) or _has_variadic(y):
+            raise Unknown()
+        raise ShapeError(f"mm expects 2D tensors, got '{dump_dims(x)}' and '{dump_dims(y)}'")
+    return matmul(x, y)
+
+def bmm(x: Dims, y: Dims) -> Dims:
+    if _has_variadic(x) or _has_variadic(y):
+        raise Unknown()
+    if len(x) != 3 or len(y) != 3:
+        raise ShapeError(f"bmm expects 3D tensors, got '{dump_dims(x)}' and '{dump_dims(y)}'")
+    if _same(x[0], y[0]) is None:
+        raise ShapeError(f"batch sizes of '{dump_dims(x)}' and '{dump_dims(y)}' differ")
+    _check_inner(x[2], y[1], x, y)
+    return (_same(x[0], y[0]), x[1], y[2])
+
+def mv(x: Dims, y: Dims) -> Dims:
+    if len(x) != 2 or len(y) != 1 or _has_variadic(x) or _has_variadic(y):
+        raise ShapeError(f"mv expects a matrix and a vector, got '{dump_dims(x)}' and '{dump_dims(y)}'")
+    return matmul(x, y)
+
+def dot(x: Dims, y: Dims) -> Dims:
+    if len(x) != 1 or len(y) != 1 or _has_variadic(x) or _has_variadic(y):
+        raise ShapeError(f"1D tensors expected, but got '{dump_dims(x)}' and '{dump_dims(y)}'")
+    return matmul(x, y)
+
+def outer(x: Dims, y: Dims) -> Dims:
+    if len(x) != 1 or len(y) != 1 or _has_variadic(x) or _has_variadic(y):
+        raise ShapeError(f"outer expects 1D tensors, got '{dump_dims(x)}' and '{dump_dims(y)}'")
+    return (x[0], y[0])
+
+def addmm(x: Dims, y: Dims, z: Dims) -> Dims:
+    return broadcast_to(mm(y, z), x)
+
+def cat(xs: Sequence[Dims], dim: int = 0) -> Dims:
+    if not xs:
+        raise ShapeError("expected a non-empty list of Tensors")
+    first = xs[0]
+    if any(_has_variadic(x) for x in xs):
+        raise Unknown()
+    axis = _axis(first, dim)
+    result = list(first)
+    total: Optional[Poly] = constant(0)
+    for x in xs:
+        if len(x) != len(first):
+            raise ShapeError(f"Tensors must have same number of dimensions: got '{dump_dims(first)}' and '{dump_dims(x)}'")
+        for i, (a, b) in enumerate(zip(result, x)):
+            if i == axis:
+                p = _poly(b)
+                total = None if total is None or p is None else add(total, p)
+            elif (merged := _same(a, b)) is None:
+                raise ShapeError(f"Sizes of tensors must match except in dimension {axis}: '{dump_dims(first)}' vs '{dump_dims(x)}'")
+            else:
+                result[i] = merged
+    result[axis] = AnonymousDim() if total is None else dim_from_poly(total)
+    return tuple(result)
+
+def stack(xs: Sequence[Dims], dim: int = 0) -> Dims:
+    if not xs:
+        raise ShapeError("stack expects a non-empty TensorList")
+    first = xs[0]
+    for x in xs[1:]:
+        if len(x) != len(first) or any(_same(a, b) is None for a, b in zip(first, x)):
+            raise ShapeError(f"stack expects each tensor to be equal size, but got '{dump_dims(first)}' and '{dump_dims(x)}'")
+    axis = _axis(first, dim, extra=1)
+    return (*first[:axis], FixedDim(len(xs)), *first[axis:])
+
+def expand(x: Dims, shape: Sequence[int]) -> Dims:
+    if _has_variadic(x):
+        raise Unknown()
+    if len(shape) < len(x):
+        raise ShapeError(f"the number of sizes provided ({len(shape)}) must be greater or equal to the number of dimensions in the tensor ({len(x)})")
+    lead = len(shape) - len(x)
+    result: List[AbstractDimOrVariadicDim] = [FixedDim(s) for s in shape[:lead]]
+    for d, s in zip(x, shape[lead:]):
+        if s == -1:
+            result.append(d)
+        elif d == FixedDim(1) or d == FixedDim(s) or isinstance(d, AnonymousDim):
+            result.append(FixedDim(s))
+        elif isinstance(d, FixedDim):
+            raise ShapeError(f"The expanded size of the tensor ({s}) must match the existing size ({d.size}) at non-singleton dimension")
+        else:
+            raise Unknown()
+    return tuple(result)
+
+def expand_as(x: Dims, other: Dims) -> Dims:
+    return broadcast_to(other, x)
+
+def repeat(x: Dims, shape: Sequence[int]) -> Dims:
+    if _has_variadic(x):
+        raise Unknown()
+    if len(shape) < len(x):
+        raise ShapeError("Number of dimensions of repeat dims can not be smaller than number of dimensions of tensor")
+    lead = len(shape) - len(x)
+    result = [FixedDim(s) for s in shape[:lead]]
+    for d, s in zip(x, shape[lead:]):
+        p = _poly(d)
+        result.append(AnonymousDim() if p is None else dim_from_poly(mul(p, constant(s))))
+    return tuple(result)
+
+def tile(x: Dims, shape: Sequence[int]) -> Dims:
+    if _has_variadic(x):
+        raise Unknown()
+    shape = [1] * (len(x) - len(shape)) + list(shape)
+    return repeat(x, shape)
+
+def narrow(x: Dims, dim: int, start: int, length: int) -> Dims:
+    i = _axis(x, dim)
+    if isinstance(x[i], FixedDim) and not 0 <= start + length <= x[i].size:
+        raise ShapeError(f"start ({start}) + length ({length}) exceeds dimension size ({x[i].size}).")
+    return (*x[:i], FixedDim(length), *x[i + 1:])
+
+def select(x: Dims, dim: int, index: int) -> Dims:
+    i = _axis(x, dim)
+    if isinstance(x[i], FixedDim) and not -x[i].size <= index < x[i].size:
+        raise ShapeError(f"select(): index {index} out of range for tensor of size {x[i].size} at dimension {dim}")
+    return (*x[:i], *x[i + 1:])
+
+def index_select(x: Dims, dim: int, index: Dims) -> Dims:
+    if len(index) > 1:
+        raise ShapeError("index_select(): Index is supposed to be a vector")
+    i = _axis(x, dim)
+    return (*x[:i], index[0] if index else FixedDim(1), *x[i + 1:])
+
+def gather(x: Dims, dim: int, index: Dims) -> Dims:
+    if not _has_variadic(x) and not _has_variadic(index) and len(index) != len(x):
+        raise ShapeError("Index tensor must have the same number of dimensions as input tensor")
+    _axis(x, dim)
+    return index
+
+def nonzero(x: Dims) -> Dims:
+    if _has_variadic(x):
+        raise Unknown()
+    return (AnonymousDim(), FixedDim(len(x)))
+
+def eye(n: int, m: Optional[int] = None) -> Dims:
+    return _dims([n, n if m is None else m])
+
+def arange(start: int, end: Optional[int] = None, step: int = 1) -> Dims:
+    if end is None:
+        start, end = 0, start
+    if step == 0:
+        raise ShapeError("step must be nonzero")
+    return _dims([max(0, -((start - end) // step))])
+
+def linspace(start: int, end: int, steps: int) -> Dims:
+    return _dims([steps])
+
+class Dynamic:
+    """An int index or slice bound whose value isn't known statically."""
+    def __repr__(self):
+        return "DYNAMIC"
+
+DYNAMIC = Dynamic()
+
+class TensorIndex(NamedTuple):
+    """A tensor or list used as an index: its dims, and whether it is a Bool mask."""
+    dims: Dims
+    mask: bool
+
+def _consumed(item: Any) -> int:
+    """The number of dims of the indexed tensor an index item consumes."""
+    if item is None or item is Ellipsis:
+        return 0
+    return len(item.dims) if isinstance(item, TensorIndex) and item.mask else 1
+
+def _slice(dim: AbstractDimOrVariadicDim, s: slice) -> AbstractDimOrVariadicDim:
+    start, stop, step = s.start, s.stop, 1 if s.step is None else s.step
+    if isinstance(step, int) and step <= 0:
+        raise ShapeError("step must be greater than zero")
+    if start in (None, 0) and stop is None and step == 1:
+        return dim
+    if DYNAMIC in (start, stop, step):
+        return AnonymousDim()
+    if isinstance(dim, FixedDim):
+        return FixedDim(len(range(*s.indices(dim.size))))
+    p = _poly(dim)
+    start = start or 0
+    # Only bounds relative to the same end give a symbolic length (named dims are assumed
+    # to be at least as large as the bounds).
+    if p is None or (stop is not None and stop >= 0):
+        return AnonymousDim()
+    if stop is None:
+        length = sub(p, constant(start)) if start >= 0 else constant(-start)
+    else:
+        length = add(p, constant(stop - start)) if start >= 0 else constant(max(stop - start, 0))
+    if step > 1:
+        length = floordiv(add(length, constant(step - 1)), step)
+    return dim_from_poly(length)
+
+def index(x: Dims, items: Sequence[Any]) -> Dims:
+    """x[items], with items ints (or DYNAMIC), slices, None, Ellipsis and TensorIndex. As in
+    torch, ints select first; then the dims of the tensor indices broadcast together, and
+    replace the dims they index if the tensors are next to each other, or go in front."""
+    if sum(item is Ellipsis for item in items) > 1:
+        raise Unknown()  # torch accepts it, with its own rules
+    if Ellipsis not in items:
+        items = [*items, Ellipsis]
+    e = items.index(Ellipsis)
+    head, tail = sum(map(_consumed, items[:e])), sum(map(_consumed, items[e + 1:]))
+    variadic = [i for i, d in enumerate(x) if isinstance(d, _variadic)]
+    if variadic and (head > variadic[0] or tail > len(x) - variadic[-1] - 1):
+        raise Unknown()
+    if not variadic and head + tail > len(x):
+        raise ShapeError(f"too many indices for tensor of dimension {len(x)}")
+    result: List[AbstractDimOrVariadicDim] = []
+    tensors: List[Dims] = []
+    positions: List[int] = []  # where the dims of each tensor index would go
+    axis = 0
+    for item in items:
+        if item is Ellipsis:
+            result.extend(x[axis:len(x) - tail])
+            axis = len(x) - tail
+        elif item is None:
+            result.append(FixedDim(1))
+        elif isinstance(item, TensorIndex):
+            if item.mask and not item.dims:
+                raise Unknown()
+            tensors.append((AnonymousDim(),) if item.mask else item.dims)
+            positions.append(len(result))
+            axis += _consumed(item)
+        elif isinstance(item, slice):
+            result.append(_slice(x[axis], item))
+            axis += 1
+        else:
+            dim = x[axis]
+            if isinstance(item, int) and isinstance(dim, FixedDim) and not -dim.size <= item < dim.size:
+                raise ShapeError(f"index {item} is out of bounds for dimension {axis} with size {dim.size}")
+            axis += 1
+    if not tensors:
+        return tuple(result)
+    indexed: Optional[List[AbstractDimOrVariadicDim]] = list(tensors[0])
+    for dims in tensors[1:]:
+        indexed = check_shape_compatibility(indexed, dims, allow_broadcast=True)
+        if indexed is None:
+            raise ShapeError("shape mismatch: indexing tensors could not be broadcast together")
+    at = positions[0] if len(set(positions)) == 1 else 0
+    return (*result[:at], *indexed, *result[at:])
+
+def like(x: Dims, other: Dims) -> Dims:
+    """view_as and reshape_as: the shape of other, if it has as many elements as x."""
+    nx, no = _numel(x), _numel(other)
+    if nx is not None and no is not None and nx.constant is not None and no.constant is not None and nx.constant != no.constant:
+        raise ShapeError(f"shape '{dump_dims(other)}' is invalid for input of size {nx.constant}")
+    return other
+
+
+SHAPE_FUNCTIONS: Dict[str, Callable[..., Dims]] = {
+    f.__name__: f for f in [
+        same, broadcast, broadcast_to, sizes, transpose, t, adjoint, permute, movedim, reshape, flatten, unflatten,
+        unsqueeze, squeeze, reduce, matmul, mm, bmm, mv, dot, outer, addmm, cat, stack, expand, expand_as,
+        repeat, tile, narrow, select, index_select, gather, nonzero, eye, arange, linspace, like, index,
+    ]
+}
+
+
+"""Dtype rules. A dtype is a set of dtypes (see type_translator.dtype_masks); a Python scalar operand is its kind."""
+_integral = dtype_masks["Integer"] | dtype_masks["Bool"]
+_float32, _int64 = dtype_masks["Float32"], dtype_masks["Int64"]
+
+def _map(mask: int, integral: int) -> int:
+    """Replace the integral members of mask with the integral dtype."""
+    return (mask & ~_integral) | (integral if mask & _integral else 0)
+
+def float_dtype(x: int) -> int:
+    """Integral inputs are computed in float32, e.g. torch.exp."""
+    return _map(x, _float32)
+
+def acc_dtype(x: int) -> int:
+    """Integral inputs accumulate in int64, e.g. torch.sum."""
+    return _map(x, _int64)
+
+def promote(*xs: Union[int, str]) -> int:
+    result = xs[0]
+    for x in xs[1:]:
+        if isinstance(result, str):
+            result, x = x, result
+        if isinstance(result, str):
+            raise Unknown()
+        promotion = promote_dtype_sets(result, x)
+        if promotion is None:
+            raise ShapeError(f"dtypes can't be promoted")
+        result = promotion.dtype
+    if isinstance(result, str):
+        raise Unknown()
+    return result
+
+def div_dtype(*xs: Union[int, str]) -> int:
+    return float_dtype(promote(*xs))
+
+def same_dtype(x: int) -> int:
+    return x
+
+_numpy_scalars = {"bool": dtype_masks["Bool"], "int": _int64, "float": dtype_masks["Float64"], "complex": dtype_masks["Complex128"]}
+
+def numpy_dtype(x: Union[int, str]) -> int:
+    """The dtype numpy gives an array of x, e.g. np.full(n, 1.0) is float64."""
+    return _numpy_scalars[x] if isinstance(x, str) else x
+
+DTYPE_FUNCTIONS: Dict[str, Callable[..., int]] = {
+    "same": same_dtype,
+    "float": float_dtype,
+    "acc": acc_dtype,
+    "promote": promote,
+    "div": div_dtype,
+    "numpy": numpy_dtype,
+}
@@ -0,0 +1,115 @@
+"""Shape rules of torch functions, Tensor methods and numpy factories, compiled by torch_rule_hooks.
+
+One rule per line:
+
+    names (parameters) -> shape [@ layout] [: dtype]
+
+names        torch.f and/or Tensor.f; {a,b} expands, e.g. {torch,Tensor}.{exp,log}.
+             For Tensor.f, the first parameter is self. np.f is a numpy function (see
+             torch_rule_hooks.NUMPY_FULLNAMES), whose result is a numpy array.
+parameters   Python syntax, `name: kind = default`. Kinds:
+                 tensor    a jaxtyping array (the default kind)
+                 operand   a jaxtyping array or a Python scalar
+                 tensors   a tuple or list of arrays
+                 int, bool literals
+                 ints      a tuple or list of int literals; `*size: ints` also takes them unpacked
+                 dims      None, an int or a tuple of ints
+                 dtype     torch.float32, ...
+                 npdtype   np.float32, "float32", float, ...
+                 any       not used by the rule
+shape        a tensor parameter, or a function of shape_functions.SHAPE_FUNCTIONS
+             applied to parameters and int constants
+layout       for views, a function of layouts.LAYOUT_FUNCTIONS applied to parameters: the
+             layout of the result (see layouts.py). Other calls return a contiguous tensor
+             when their tensor operands are contiguous.
+dtype        `a | b` uses a if it is given (a dtype parameter) and b otherwise.
+             same (the dtype of the first tensor, the default), a torch dtype name,
+             or a function of shape_functions.DTYPE_FUNCTIONS applied to parameters.
+
+A call that a rule can't infer (non-literal sizes, "*b" where the rank matters, ...)
+keeps the type of the stubs.
+"""
+
+RULES = """
+# Elementwise
+{torch,Tensor}.{abs,neg,negative,sign,square,clone,detach,relu,floor,ceil,round,trunc,frac,tril,triu,flip,fliplr,flipud,roll} (input, *args: any) -> input
+Tensor.contiguous (self, *args: any) -> self @ contiguous()
+{torch,Tensor}.{exp,exp2,expm1,log,log2,log10,log1p,sqrt,rsqrt,sigmoid,tanh,sin,cos,tan,asin,acos,atan,sinh,cosh,erf,erfc,reciprocal} (input) -> input : float(input)
+{torch,Tensor}.{clamp,clip} (input, min: any = None, max: any = None) -> input
+{torch,Tensor}.{softmax,log_softmax} (input, dim: int, dtype: dtype = None) -> input : dtype | float(input)
+{torch,Tensor}.{cumsum,cumprod} (input, dim: int, *, dtype: dtype = None) -> input : dtype | acc(input)
+{torch,Tensor}.{isnan,isinf,isfinite,logical_not} (input) -> input : bool
+torch.{zeros_like,ones_like,empty_like,rand_like,randn_like} (input, *, dtype: dtype = None, device: any = None) -> input : dtype | same
+torch.full_like (input, fill_value: any, *, dtype: dtype = None, device: any = None) -> input : dtype | same
+Tensor.type_as (self, other) -> self : same(other)
+
+# Broadcasting
+{torch,Tensor}.{add,sub,subtract,mul,multiply,maximum,minimum,fmod,remainder,atan2,pow} (input, other: operand, *, alpha: any = None) -> broadcast(input, other) : promote(input, other)
+{torch,Tensor}.{div,true_divide} (input, other: operand, *, rounding_mode: any = None) -> broadcast(input, other) : div(input, other)
+{torch,Tensor}.{eq,ne,lt,le,gt,ge,logical_and,logical_or,logical_xor} (input, other: operand) -> broadcast(input, other) : bool
+torch.where (condition, input: operand, other: operand) -> broadcast(condition, input, other) : promote(input, other)
+{torch,Tensor}.masked_fill (input, mask, value: any) -> broadcast_to(input, mask)
+
+# Reductions
+{torch,Tensor}.{sum,nansum} (input, dim: dims = None, keepdim: bool = False, *, dtype: dtype = None) -> reduce(input, dim, keepdim) : dtype | acc(input)
+{torch,Tensor}.{mean,nanmean} (input, dim: dims = None, keepdim: bool = False, *, dtype: dtype = None) -> reduce(input, dim, keepdim) : dtype | same
+{torch,Tensor}.prod (input, dim: int = None, keepdim: bool = False, *, dtype: dtype = None) -> reduce(input, dim, keepdim) : dtype | acc(input)
+{torch,Tensor}.{amax,amin} (input, dim: dims = (), keepdim: bool = False) -> reduce(input, dim, keepdim)
+{torch,Tensor}.{std,var} (input, dim: dims = None, *, correction: any = 1, keepdim: bool = False) -> reduce(input, dim, keepdim)
+{torch,Tensor}.logsumexp (input, dim: dims, keepdim: bool = False) -> reduce(input, dim, keepdim) : float(input)
+{torch,Tensor}.{argmax,argmin} (input, dim: int = None, keepdim: bool = False) -> reduce(input, dim, keepdim) : int64
+{torch,Tensor}.{all,any} (input, dim: dims = None, keepdim: bool = False) -> reduce(input, dim, keepdim) : bool
+{torch,Tensor}.count_nonzero (input, dim: dims = None) -> reduce(input, dim) : int64
+
+# Shape manipulation
+{torch,Tensor}.{transpose,swapaxes,swapdims} (input, dim0: int, dim1: int) -> transpose(input, dim0, dim1) @ transpose(input, dim0, dim1)
+{torch,Tensor}.t (input) -> t(input) @ t(input)
+{torch,Tensor}.adjoint (input) -> adjoint(input) @ adjoint(input)
+torch.permute (input, dims: ints) -> permute(input, dims) @ permute(input, dims)
+Tensor.permute (self, *dims: ints) -> permute(self, dims) @ permute(self, dims)
+{torch,Tensor}.{movedim,moveaxis} (input, source: int, destination: int) -> movedim(input, source, destination) @ movedim(input, source, destination)
+torch.reshape (input, shape: ints) -> reshape(input, shape) @ reshape(input)
+Tensor.view (self, *shape: ints) -> reshape(self, shape) @ view(self)
+Tensor.reshape (self, *shape: ints) -> reshape(self, shape) @ reshape(self)
+Tensor.view_as (self, other) -> like(self, other) @ view(self)
+Tensor.reshape_as (self, other) -> like(self, other) @ reshape(self)
+{torch,Tensor}.flatten (input, start_dim: int = 0, end_dim: int = -1) -> flatten(input, start_dim, end_dim) @ reshape(input)
+{torch,Tensor}.ravel (input) -> flatten(input) @ contiguous()
+{torch,Tensor}.unflatten (input, dim: int, sizes: ints) -> unflatten(input, dim, sizes) @ view(input)
+{torch,Tensor}.unsqueeze (input, dim: int) -> unsqueeze(input, dim) @ unsqueeze(input, dim)
+{torch,Tensor}.squeeze (input, dim: dims = None) -> squeeze(input, dim) @ squeeze(input, dim)
+Tensor.expand (self, *size: ints) -> expand(self, size) @ expand(self)
+Tensor.expand_as (self, other) -> expand_as(self, other) @ expand(self)
+Tensor.repeat (self, *repeats: ints) -> repeat(self, repeats)
+torch.tile (input, dims: ints) -> tile(input, dims)
+Tensor.tile (self, *dims: ints) -> tile(self, dims)
+{torch,Tensor}.narrow (input, dim: int, start: int, length: int) -> narrow(input, dim, start, length) @ narrow(input)
+{torch,Tensor}.select (input, dim: int, index: int) -> select(input, dim, index) @ select(input, dim, index)
+{torch,Tensor}.index_select (input, dim: int, index) -> index_select(input, dim, index)
+{torch,Tensor}.gather (input, dim: int, index, *, sparse_grad: bool = False) -> gather(input, dim, index)
+{torch,Tensor}.nonzero (input) -> nonzero(input) : int64
+torch.{cat,concat,concatenate} (tensors: tensors, dim: int = 0) -> cat(tensors, dim) : promote(tensors)
+torch.stack (tensors: tensors, dim: int = 0) -> stack(tensors, dim) : promote(tensors)
+
+# Linear algebra
+{torch,Tensor}.matmul Tensor.__matmul__ (input, other) -> matmul(input, other) : promote(input, other)
+{torch,Tensor}.mm (input, mat2) -> mm(input, mat2) : promote(input, mat2)
+{torch,Tensor}.bmm (input, mat2) -> bmm(input, mat2) : promote(input, mat2)
+{torch,Tensor}.mv (input, vec) -> mv(input, vec) : promote(input, vec)
+{torch,Tensor}.{dot,vdot} (input, other) -> dot(input, other) : promote(input, other)
+{torch,Tensor}.{outer,ger} (input, vec2) -> outer(input, vec2) : promote(input, vec2)
+{torch,Tensor}.addmm (input, mat1, mat2, *, beta: any = 1, alpha: any = 1) -> addmm(input, mat1, mat2) : promote(input, mat1, mat2)
+
+# Factories
+torch.eye (n: int, m: int = None, *, dtype: dtype = None, device: any = None) -> eye(n, m) : dtype | float32
+torch.arange (start: int, end: int = None, step: int = 1, *, dtype: dtype = None, device: any = None) -> arange(start, end, step) : dtype | int64
+torch.linspace (start: any, end: any, steps: int, *, dtype: dtype = None, device: any = None) -> linspace(start, end, steps) : dtype | float32
+
+# NumPy factories
+np.{zeros,ones,empty} (shape: dims, dtype: npdtype = None, order: any = None, *, device: any = None, like: any = None) -> sizes(shape) : dtype | float64
+np.full (shape: dims, fill_value: operand, dtype: npdtype = None, order: any = None, *, device: any = None, like: any = None) -> sizes(shape) : dtype | numpy(fill_value)
+np.{zeros_like,ones_like,empty_like} (a, dtype: npdtype = None, order: any = None, subok: any = None, *, device: any = None) -> a : dtype | same
+np.full_like (a, fill_value: any, dtype: npdtype = None, order: any = None, subok: any = None, *, device: any = None) -> a : dtype | same
+np.eye (N: int, M: int = None, k: int = 0, dtype: npdtype = None, order: any = None, *, device: any = None, like: any = None) -> eye(N, M) : dtype | float64
+np.arange (start: int, stop: int = None, step: int = 1, dtype: npdtype = None, *, device: any = None, like: any = None) -> arange(start, stop, step) : dtype | int64
+"""
@@ -0,0 +1,27 @@
+"""Counters for the plugin internals.
+
+Set MYSHAPING_STATS=1 to print them to stderr when mypy exits.
+"""
+
+import atexit
+import os
+import sys
+from collections import Counter
+
+STATS: Counter = Counter()
+
+def stats_enabled() -> bool:
+    return bool(os.environ.get("MYSHAPING_STATS"))
+
+def dump_stats(file=None):
+    file = file or sys.stderr
+    for key in sorted(STATS):
+        print(f"myshaping: {key} = {STATS[key]}", file=file)
+    for key in sorted(STATS):
+        name, _, kind = key.rpartition(".")
+        lookups = STATS[key] + STATS[f"{name}.miss"]
+        if kind == "hit" and lookups:
+            print(f"myshaping: {name}.hit_rate = {STATS[key] / lookups:.1%}", file=file)
+
+if stats_enabled():
+    atexit.register(dump_stats)
@@ -0,0 +1,229 @@
+"""Generate pruned stubs of the installed torch, cached per torch version.
+
+    python -m myshaping.stubgen [--cache-dir DIR] [--force]
+
+prints a directory to put in front of mypy_path:
+
+    mypy_path = <printed directory>:<myshaping>/stubs
+
+It holds torch/__init__.pyi and torch/_tensor.pyi:
+
+- the hand-written myshaping/stubs/torch/__init__.pyi (dtype aliases and the factories whose
+  hooks read their parameter names), followed by every other public function, dtype and
+  constant of the torch namespace;
+- class Tensor with every public method, attribute and operator of torch.Tensor.
+
+torch names the dtypes bool, int and float, so builtin types are spelled builtins.int.
+Functions and methods with a rule in shape_rules.py or harvested_rules.py return Tensor,
+and their hooks infer the jaxtyping type. Other functions keep their Python signatures
+where inspect can read them, with Any for every type. Submodules (torch.nn, ...) are not generated. Importing one
+uses the installed package.
+
+The directory is named after the torch version and a hash of this generator, the
+hand-written stub and the rules. So upgrading torch or myshaping generates a new one, and
+mypy, which sees different stub files, rechecks everything.
+"""
+
+import argparse
+import hashlib
+import inspect
+import keyword
+import os
+import sys
+import types
+from typing import Dict, List, Optional, Set
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_STUB = os.path.join(PACKAGE_DIR, "stubs", "torch", "__init__.pyi")
+RULES = os.path.join(PACKAGE_DIR, "shape_rules.py")
+HARVESTED_RULES = os.path.join(PACKAGE_DIR, "harvested_rules.py")
+
+# Classes of the torch namespace that are declared, and their instances as constants.
+CLASSES = {
+    "Size": "class Size(Tuple[builtins.int, ...]):\n    def numel(self) -> builtins.int: ...\n",
+    "device": "class device:\n    type: str\n    index: Optional[builtins.int]\n    def __init__(self, *args: Any, **kwargs: Any) -> None: ...\n",
+    "layout": "class layout: ...\n",
+    "memory_format": "class memory_format: ...\n",
+    "Generator": "class Generator:\n    def __init__(self, *args: Any, **kwargs: Any) -> None: ...\n    def __getattr__(self, name: str) -> Any: ...\n",
+}
+
+TENSOR_ATTRIBUTES = {
+    "shape": "Size", "dtype": "dtype", "device": "device", "layout": "layout",
+    "ndim": "builtins.int", "itemsize": "builtins.int", "nbytes": "builtins.int", "output_nr": "builtins.int",
+    "T": "Tensor", "mT": "Tensor", "H": "Tensor", "mH": "Tensor", "real": "Tensor", "imag": "Tensor",
+    "data": "Tensor", "grad": "Optional[Tensor]",
+}
+
+TENSOR_METHOD_RETURNS = {
+    **dict.fromkeys(["dim", "ndimension", "numel", "nelement", "element_size", "get_device", "data_ptr", "storage_offset"], "builtins.int"),
+    **dict.fromkeys(["is_contiguous", "is_floating_point", "is_complex", "is_signed", "equal", "allclose", "is_pinned", "is_shared", "is_inference"], "builtins.bool"),
+    "tolist": "Any",
+    "item": "Any",
+}
+
+TENSOR_DUNDERS = {
+    **dict.fromkeys(["__bool__", "__contains__"], "builtins.bool"),
+    **dict.fromkeys(["__int__", "__index__", "__len__", "__hash__", "__long__"], "builtins.int"),
+    "__float__": "builtins.float",
+    "__complex__": "builtins.complex",
+    "__iter__": "Iterator[Tensor]",
+    "__setitem__": "None",
+    "__delitem__": "None",
+    **dict.fromkeys([
+        "__abs__", "__neg__", "__pos__", "__invert__", "__getitem__", "__reversed__",
+        *(f"__{op}__" for op in ["add", "sub", "mul", "div", "truediv", "floordiv", "mod", "pow", "matmul",
+                                  "and", "or", "xor", "lshift", "rshift"]),
+        *(f"__r{op}__" for op in ["add", "sub", "mul", "div", "truediv", "floordiv", "mod", "pow", "matmul",
+                                   "and", "or", "xor", "lshift", "rshift"]),
+        *(f"__i{op}__" for op in ["add", "sub", "mul", "div", "truediv", "floordiv", "mod", "pow",
+                                   "and", "or", "xor", "lshift", "rshift"]),
+        "__eq__", "__ne__", "__lt__", "__le__", "__gt__", "__ge__",
+    ], "Tensor"),
+}
+
+def _rule_names() -> Set[str]:
+    from myshaping.torch_rule_hooks import FUNCTION_RULES, HARVESTED_FUNCTION_RULES, HARVESTED_METHOD_RULES, METHOD_RULES
+    methods = [*METHOD_RULES, *HARVESTED_METHOD_RULES]
+    return {*FUNCTION_RULES, *HARVESTED_FUNCTION_RULES, *(f"Tensor.{name.rsplit('.', 1)[1]}" for name in methods if name.startswith("jaxtyping."))}
+
+def _declared(text: str) -> Set[str]:
+    names = set()
+    for line in text.splitlines():
+        if line.startswith(("def ", "class ")):
+            names.add(line.split()[1].split("(")[0].split(":")[0])
+        elif ":" in line and not line.startswith((" ", "#", "from ", "import ")):
+            names.add(line.split(":")[0].strip())
+    return names
+
+def _parameters(obj, method: bool) -> str:
+    """The parameters of obj with Any types, or *args/**kwargs if inspect can't read them."""
+    try:
+        signature = inspect.signature(obj)
+    except (TypeError, ValueError):
+        return "self, *args: Any, **kwargs: Any" if method else "*args: Any, **kwargs: Any"
+    result = []
+    star = False
+    for i, p in enumerate(signature.parameters.values()):
+        if keyword.iskeyword(p.name):
+            return "self, *args: Any, **kwargs: Any" if method else "*args: Any, **kwargs: Any"
+        if method and i == 0:
+            result.append(p.name)
+            continue
+        if p.kind == p.VAR_POSITIONAL:
+            result.append(f"*{p.name}: Any")
+            star = True
+        elif p.kind == p.VAR_KEYWORD:
+            result.append(f"**{p.name}: Any")
+        else:
+            if p.kind == p.KEYWORD_ONLY and not star:
+                result.append("*")
+                star = True
+            default = "" if p.default is p.empty else " = ..."
+            result.append(f"{p.name}: Any{default}")
+        if p.kind == p.POSITIONAL_ONLY and (i + 1 == len(signature.parameters) or list(signature.parameters.values())[i + 1].kind != p.POSITIONAL_ONLY):
+            result.append("/")
+    if method and not result:
+        return "self, *args: Any, **kwargs: Any"
+    return ", ".join(result)
+
+def generate_init(torch, base: str, rules: Set[str]) -> str:
+    declared = _declared(base)
+    lines: List[str] = [base.rstrip("\n"), "", "# Generated by myshaping.stubgen from torch " + torch.__version__ + "."]
+    lines.append("import builtins")
+    lines.append("from typing import Optional, Tuple")
+    for name, text in CLASSES.items():
+        if name not in declared:
+            lines.append(text.rstrip("\n"))
+    classes = {getattr(torch, name): name for name in [*CLASSES, "dtype"]}
+    for name in sorted(dir(torch)):
+        if name.startswith("_") or keyword.iskeyword(name) or name in declared or name in CLASSES:
+            continue
+        obj = getattr(torch, name)
+        if isinstance(obj, types.ModuleType) or isinstance(obj, type):
+            continue
+        if type(obj) in classes:
+            lines.append(f"{name}: {classes[type(obj)]}")
+        elif type(obj) in (bool, int, float):
+            lines.append(f"{name}: builtins.{type(obj).__name__}")
+        elif isinstance(obj, (types.BuiltinFunctionType, types.FunctionType)):
+            if not (getattr(obj, "__module__", None) or "torch").startswith("torch"):
+                continue  # e.g. typing names imported by torch
+            returns = "Tensor" if f"torch.{name}" in rules else "Any"
+            lines.append(f"def {name}({_parameters(obj, method=False)}) -> {returns}: ...")
+    return "\n".join(lines) + "\n"
+
+def generate_tensor(torch, rules: Set[str]) -> str:
+    lines = [
+        f"# Generated by myshaping.stubgen from torch {torch.__version__}.",
+        "import builtins",
+        "from typing import Any, Iterator, Optional",
+        "from torch import Size, device, dtype, layout",
+        "",
+        "class Tensor:",
+        "    def __init__(self, *args: Any, **kwargs: Any) -> None: ...",
+    ]
+    tensor = torch.Tensor
+    for name in sorted(dir(tensor)):
+        attribute = inspect.getattr_static(tensor, name)
+        if name.startswith("__"):
+            returns = TENSOR_DUNDERS.get(name)
+            if returns is not None:
+                ignore = "  # type: ignore[override]" if name in ("__eq__", "__ne__", "__hash__") else ""
+                lines.append(f"    def {name}(self, *args: Any, **kwargs: Any) -> {returns}: ...{ignore}")
+        elif name.startswith("_") or keyword.iskeyword(name):
+            continue
+        elif isinstance(attribute, (property, types.GetSetDescriptorType, types.MemberDescriptorType)):
+            typ = TENSOR_ATTRIBUTES.get(name, "builtins.bool" if name.startswith(("is_", "requires_", "retains_")) else "Any")
+            lines.append(f"    {name}: {typ}")
+        elif callable(attribute) or isinstance(attribute, (classmethod, staticmethod)):
+            returns = "Tensor" if f"Tensor.{name}" in rules else TENSOR_METHOD_RETURNS.get(name, "Any")
+            if isinstance(attribute, (classmethod, staticmethod)):
+                lines.append(f"    @staticmethod\n    def {name}(*args: Any, **kwargs: Any) -> {returns}: ...")
+            else:
+                lines.append(f"    def {name}({_parameters(attribute, method=True)}) -> {returns}: ...")
+    return "\n".join(lines) + "\n"
+
+def cache_key(torch_version: str) -> str:
+    digest = hashlib.sha256(torch_version.encode())
+    for path in (__file__, BASE_STUB, RULES, HARVESTED_RULES):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return f"torch-{torch_version}-{digest.hexdigest()[:12]}"
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "myshaping", "stubs")
+
+def ensure_stubs(cache_dir: Optional[str] = None, force: bool = False) -> str:
+    """Generate the stubs of the installed torch unless they are cached, and return their directory."""
+    import torch
+
+    directory = os.path.join(cache_dir or default_cache_dir(), cache_key(torch.__version__))
+    package = os.path.join(directory, "torch")
+    if os.path.exists(os.path.join(package, "_tensor.pyi")) and not force:
+        return directory
+    with open(BASE_STUB) as f:
+        base = f.read()
+    rules = _rule_names()
+    files: Dict[str, str] = {
+        "__init__.pyi": generate_init(torch, base, rules),
+        "_tensor.pyi": generate_tensor(torch, rules),
+    }
+    os.makedirs(package, exist_ok=True)
+    # _tensor.pyi marks a complete cache, so it is written last.
+    for name in sorted(files, key=lambda n: n == "_tensor.pyi"):
+        tmp = os.path.join(package, f".{name}.{os.getpid()}")
+        with open(tmp, "w") as f:
+            f.write(files[name])
+        os.replace(tmp, os.path.join(package, name))
+    return directory
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m myshaping.stubgen")
+    parser.add_argument("--cache-dir", default=None, help=f"default: {default_cache_dir()}")
+    parser.add_argument("--force", action="store_true", help="regenerate even if cached")
+    args = parser.parse_args(argv)
+    print(ensure_stubs(args.cache_dir, args.force))
+
+if __name__ == "__main__":
+    main()
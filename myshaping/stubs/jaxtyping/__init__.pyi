@@ -1,6 +1,8 @@
 # generated by stubgen and modified by hand
 from _typeshed import Incomplete
 from typing import TypeAlias
+from ._decorator import jaxtyped as jaxtyped
+from ._errors import AnnotationError as AnnotationError, TypeCheckError as TypeCheckError
 from ._array_types import (
     AbstractArray as AbstractArray,
     UInt2 as UInt2, 
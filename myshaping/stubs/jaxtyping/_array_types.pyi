@@ -39,7 +39,7 @@ _AbstractDim = Union[_AnonymousDim, _NamedDim, _FixedDim, _SymbolicDim]
 _ArrayType = TypeVar("_ArrayType")
 _Shape = TypeVar("_Shape", bound=str)
 Self = TypeVar("Self", bound="AbstractArray[_ArrayType, _Shape]")
-Other = TypeVar("Other", bound="AbstractArray[_ArrayType, _Shape]")
+Other = TypeVar("Other", bound="AbstractArray[_ArrayType, _Shape] | bool | int | float | complex")
 Output = TypeVar("Output", bound="AbstractArray[_ArrayType, _Shape]")
 class AbstractArray(Generic[_ArrayType, _Shape]):
     def __add__(self: Self, other: Other) -> Output: ...
@@ -74,6 +74,7 @@ class AbstractArray(Generic[_ArrayType, _Shape]):
     def __le__(self: Self, other: Other) -> "Bool[_ArrayType, _Shape]": ...
     def __gt__(self: Self, other: Other) -> "Bool[_ArrayType, _Shape]": ...
     def __ge__(self: Self, other: Other) -> "Bool[_ArrayType, _Shape]": ...
+    def __getitem__(self, index: Any) -> Any: ...
 
     # FIXME: Mypy doesn't infer types correctly. (We hook them as a workaround)
     def half(self: Self) -> "Float16[_ArrayType, _Shape]": ...
@@ -84,9 +85,220 @@ class AbstractArray(Generic[_ArrayType, _Shape]):
     def int(self: Self) -> "Int32[_ArrayType, _Shape]": ...
     def long(self: Self) -> "Int64[_ArrayType, _Shape]": ...
 
-class UInt2(AbstractArray[_ArrayType, _Shape]): ...
-class UInt4(AbstractArray[_ArrayType, _Shape]): ...
-class UInt8(AbstractArray[_ArrayType, _Shape]):
+    # Results are inferred by the rules in myshaping/shape_rules.py.
+    def abs(self, *args: Any, **kwargs: Any) -> Any: ...
+    def acos(self, *args: Any, **kwargs: Any) -> Any: ...
+    def add(self, *args: Any, **kwargs: Any) -> Any: ...
+    def addmm(self, *args: Any, **kwargs: Any) -> Any: ...
+    def adjoint(self, *args: Any, **kwargs: Any) -> Any: ...
+    def all(self, *args: Any, **kwargs: Any) -> Any: ...
+    def amax(self, *args: Any, **kwargs: Any) -> Any: ...
+    def amin(self, *args: Any, **kwargs: Any) -> Any: ...
+    def any(self, *args: Any, **kwargs: Any) -> Any: ...
+    def argmax(self, *args: Any, **kwargs: Any) -> Any: ...
+    def argmin(self, *args: Any, **kwargs: Any) -> Any: ...
+    def asin(self, *args: Any, **kwargs: Any) -> Any: ...
+    def atan(self, *args: Any, **kwargs: Any) -> Any: ...
+    def atan2(self, *args: Any, **kwargs: Any) -> Any: ...
+    def bmm(self, *args: Any, **kwargs: Any) -> Any: ...
+    def ceil(self, *args: Any, **kwargs: Any) -> Any: ...
+    def clamp(self, *args: Any, **kwargs: Any) -> Any: ...
+    def clip(self, *args: Any, **kwargs: Any) -> Any: ...
+    def clone(self, *args: Any, **kwargs: Any) -> Any: ...
+    def contiguous(self, *args: Any, **kwargs: Any) -> Any: ...
+    def cos(self, *args: Any, **kwargs: Any) -> Any: ...
+    def cosh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def count_nonzero(self, *args: Any, **kwargs: Any) -> Any: ...
+    def cpu(self: Self, *args: Any, **kwargs: Any) -> Self: ...
+    def cuda(self: Self, *args: Any, **kwargs: Any) -> Self: ...
+    def cumprod(self, *args: Any, **kwargs: Any) -> Any: ...
+    def cumsum(self, *args: Any, **kwargs: Any) -> Any: ...
+    def detach(self, *args: Any, **kwargs: Any) -> Any: ...
+    def div(self, *args: Any, **kwargs: Any) -> Any: ...
+    def dot(self, *args: Any, **kwargs: Any) -> Any: ...
+    def eq(self, *args: Any, **kwargs: Any) -> Any: ...
+    def erf(self, *args: Any, **kwargs: Any) -> Any: ...
+    def erfc(self, *args: Any, **kwargs: Any) -> Any: ...
+    def exp(self, *args: Any, **kwargs: Any) -> Any: ...
+    def exp2(self, *args: Any, **kwargs: Any) -> Any: ...
+    def expand(self, *args: Any, **kwargs: Any) -> Any: ...
+    def expand_as(self, *args: Any, **kwargs: Any) -> Any: ...
+    def expm1(self, *args: Any, **kwargs: Any) -> Any: ...
+    def flatten(self, *args: Any, **kwargs: Any) -> Any: ...
+    def flip(self, *args: Any, **kwargs: Any) -> Any: ...
+    def fliplr(self, *args: Any, **kwargs: Any) -> Any: ...
+    def flipud(self, *args: Any, **kwargs: Any) -> Any: ...
+    def floor(self, *args: Any, **kwargs: Any) -> Any: ...
+    def fmod(self, *args: Any, **kwargs: Any) -> Any: ...
+    def frac(self, *args: Any, **kwargs: Any) -> Any: ...
+    def gather(self, *args: Any, **kwargs: Any) -> Any: ...
+    def ge(self, *args: Any, **kwargs: Any) -> Any: ...
+    def ger(self, *args: Any, **kwargs: Any) -> Any: ...
+    def gt(self, *args: Any, **kwargs: Any) -> Any: ...
+    def index_select(self, *args: Any, **kwargs: Any) -> Any: ...
+    def isfinite(self, *args: Any, **kwargs: Any) -> Any: ...
+    def isinf(self, *args: Any, **kwargs: Any) -> Any: ...
+    def isnan(self, *args: Any, **kwargs: Any) -> Any: ...
+    def item(self, *args: Any, **kwargs: Any) -> Any: ...
+    def le(self, *args: Any, **kwargs: Any) -> Any: ...
+    def log(self, *args: Any, **kwargs: Any) -> Any: ...
+    def log10(self, *args: Any, **kwargs: Any) -> Any: ...
+    def log1p(self, *args: Any, **kwargs: Any) -> Any: ...
+    def log2(self, *args: Any, **kwargs: Any) -> Any: ...
+    def log_softmax(self, *args: Any, **kwargs: Any) -> Any: ...
+    def logical_and(self, *args: Any, **kwargs: Any) -> Any: ...
+    def logical_not(self, *args: Any, **kwargs: Any) -> Any: ...
+    def logical_or(self, *args: Any, **kwargs: Any) -> Any: ...
+    def logical_xor(self, *args: Any, **kwargs: Any) -> Any: ...
+    def logsumexp(self, *args: Any, **kwargs: Any) -> Any: ...
+    def lt(self, *args: Any, **kwargs: Any) -> Any: ...
+    def masked_fill(self, *args: Any, **kwargs: Any) -> Any: ...
+    def matmul(self, *args: Any, **kwargs: Any) -> Any: ...
+    def maximum(self, *args: Any, **kwargs: Any) -> Any: ...
+    def mean(self, *args: Any, **kwargs: Any) -> Any: ...
+    def minimum(self, *args: Any, **kwargs: Any) -> Any: ...
+    def mm(self, *args: Any, **kwargs: Any) -> Any: ...
+    def moveaxis(self, *args: Any, **kwargs: Any) -> Any: ...
+    def movedim(self, *args: Any, **kwargs: Any) -> Any: ...
+    def mul(self, *args: Any, **kwargs: Any) -> Any: ...
+    def multiply(self, *args: Any, **kwargs: Any) -> Any: ...
+    def mv(self, *args: Any, **kwargs: Any) -> Any: ...
+    def nanmean(self, *args: Any, **kwargs: Any) -> Any: ...
+    def nansum(self, *args: Any, **kwargs: Any) -> Any: ...
+    def narrow(self, *args: Any, **kwargs: Any) -> Any: ...
+    def ne(self, *args: Any, **kwargs: Any) -> Any: ...
+    def neg(self, *args: Any, **kwargs: Any) -> Any: ...
+    def negative(self, *args: Any, **kwargs: Any) -> Any: ...
+    def nonzero(self, *args: Any, **kwargs: Any) -> Any: ...
+    def numpy(self, *, force: bool = False) -> Any: ...
+    def outer(self, *args: Any, **kwargs: Any) -> Any: ...
+    def permute(self, *args: Any, **kwargs: Any) -> Any: ...
+    def pow(self, *args: Any, **kwargs: Any) -> Any: ...
+    def prod(self, *args: Any, **kwargs: Any) -> Any: ...
+    def ravel(self, *args: Any, **kwargs: Any) -> Any: ...
+    def reciprocal(self, *args: Any, **kwargs: Any) -> Any: ...
+    def relu(self, *args: Any, **kwargs: Any) -> Any: ...
+    def remainder(self, *args: Any, **kwargs: Any) -> Any: ...
+    def repeat(self, *args: Any, **kwargs: Any) -> Any: ...
+    def reshape(self, *args: Any, **kwargs: Any) -> Any: ...
+    def reshape_as(self, *args: Any, **kwargs: Any) -> Any: ...
+    def roll(self, *args: Any, **kwargs: Any) -> Any: ...
+    def round(self, *args: Any, **kwargs: Any) -> Any: ...
+    def rsqrt(self, *args: Any, **kwargs: Any) -> Any: ...
+    def select(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sigmoid(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sign(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sin(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sinh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def softmax(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sqrt(self, *args: Any, **kwargs: Any) -> Any: ...
+    def square(self, *args: Any, **kwargs: Any) -> Any: ...
+    def squeeze(self, *args: Any, **kwargs: Any) -> Any: ...
+    def std(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sub(self, *args: Any, **kwargs: Any) -> Any: ...
+    def subtract(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sum(self, *args: Any, **kwargs: Any) -> Any: ...
+    def swapaxes(self, *args: Any, **kwargs: Any) -> Any: ...
+    def swapdims(self, *args: Any, **kwargs: Any) -> Any: ...
+    def t(self, *args: Any, **kwargs: Any) -> Any: ...
+    def tan(self, *args: Any, **kwargs: Any) -> Any: ...
+    def tanh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def tile(self, *args: Any, **kwargs: Any) -> Any: ...
+    def to(self, *args: Any, **kwargs: Any) -> Any: ...
+    def tolist(self, *args: Any, **kwargs: Any) -> Any: ...
+    def transpose(self, *args: Any, **kwargs: Any) -> Any: ...
+    def tril(self, *args: Any, **kwargs: Any) -> Any: ...
+    def triu(self, *args: Any, **kwargs: Any) -> Any: ...
+    def true_divide(self, *args: Any, **kwargs: Any) -> Any: ...
+    def trunc(self, *args: Any, **kwargs: Any) -> Any: ...
+    def type_as(self, *args: Any, **kwargs: Any) -> Any: ...
+    def unflatten(self, *args: Any, **kwargs: Any) -> Any: ...
+    def unsqueeze(self, *args: Any, **kwargs: Any) -> Any: ...
+    def var(self, *args: Any, **kwargs: Any) -> Any: ...
+    def vdot(self, *args: Any, **kwargs: Any) -> Any: ...
+    def view(self, *args: Any, **kwargs: Any) -> Any: ...
+    def view_as(self, *args: Any, **kwargs: Any) -> Any: ...
+
+    # Results are inferred by the rules in myshaping/harvested_rules.py.
+    def absolute(self, *args: Any, **kwargs: Any) -> Any: ...
+    def acosh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def angle(self, *args: Any, **kwargs: Any) -> Any: ...
+    def arccos(self, *args: Any, **kwargs: Any) -> Any: ...
+    def arccosh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def arcsin(self, *args: Any, **kwargs: Any) -> Any: ...
+    def arcsinh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def arctan(self, *args: Any, **kwargs: Any) -> Any: ...
+    def arctan2(self, *args: Any, **kwargs: Any) -> Any: ...
+    def arctanh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def asinh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def atanh(self, *args: Any, **kwargs: Any) -> Any: ...
+    def bernoulli(self, *args: Any, **kwargs: Any) -> Any: ...
+    def bitwise_and(self, *args: Any, **kwargs: Any) -> Any: ...
+    def bitwise_left_shift(self, *args: Any, **kwargs: Any) -> Any: ...
+    def bitwise_not(self, *args: Any, **kwargs: Any) -> Any: ...
+    def bitwise_or(self, *args: Any, **kwargs: Any) -> Any: ...
+    def bitwise_right_shift(self, *args: Any, **kwargs: Any) -> Any: ...
+    def bitwise_xor(self, *args: Any, **kwargs: Any) -> Any: ...
+    def clamp_max(self, *args: Any, **kwargs: Any) -> Any: ...
+    def clamp_min(self, *args: Any, **kwargs: Any) -> Any: ...
+    def conj(self, *args: Any, **kwargs: Any) -> Any: ...
+    def conj_physical(self, *args: Any, **kwargs: Any) -> Any: ...
+    def copysign(self, *args: Any, **kwargs: Any) -> Any: ...
+    def deg2rad(self, *args: Any, **kwargs: Any) -> Any: ...
+    def digamma(self, *args: Any, **kwargs: Any) -> Any: ...
+    def divide(self, *args: Any, **kwargs: Any) -> Any: ...
+    def erfinv(self, *args: Any, **kwargs: Any) -> Any: ...
+    def fix(self, *args: Any, **kwargs: Any) -> Any: ...
+    def floor_divide(self, *args: Any, **kwargs: Any) -> Any: ...
+    def fmax(self, *args: Any, **kwargs: Any) -> Any: ...
+    def fmin(self, *args: Any, **kwargs: Any) -> Any: ...
+    def gcd(self, *args: Any, **kwargs: Any) -> Any: ...
+    def greater(self, *args: Any, **kwargs: Any) -> Any: ...
+    def greater_equal(self, *args: Any, **kwargs: Any) -> Any: ...
+    def heaviside(self, *args: Any, **kwargs: Any) -> Any: ...
+    def hypot(self, *args: Any, **kwargs: Any) -> Any: ...
+    def i0(self, *args: Any, **kwargs: Any) -> Any: ...
+    def igamma(self, *args: Any, **kwargs: Any) -> Any: ...
+    def igammac(self, *args: Any, **kwargs: Any) -> Any: ...
+    def isclose(self, *args: Any, **kwargs: Any) -> Any: ...
+    def isneginf(self, *args: Any, **kwargs: Any) -> Any: ...
+    def isposinf(self, *args: Any, **kwargs: Any) -> Any: ...
+    def isreal(self, *args: Any, **kwargs: Any) -> Any: ...
+    def lcm(self, *args: Any, **kwargs: Any) -> Any: ...
+    def ldexp(self, *args: Any, **kwargs: Any) -> Any: ...
+    def less(self, *args: Any, **kwargs: Any) -> Any: ...
+    def less_equal(self, *args: Any, **kwargs: Any) -> Any: ...
+    def lgamma(self, *args: Any, **kwargs: Any) -> Any: ...
+    def logaddexp(self, *args: Any, **kwargs: Any) -> Any: ...
+    def logaddexp2(self, *args: Any, **kwargs: Any) -> Any: ...
+    def logit(self, *args: Any, **kwargs: Any) -> Any: ...
+    def msort(self, *args: Any, **kwargs: Any) -> Any: ...
+    def nan_to_num(self, *args: Any, **kwargs: Any) -> Any: ...
+    def nextafter(self, *args: Any, **kwargs: Any) -> Any: ...
+    def not_equal(self, *args: Any, **kwargs: Any) -> Any: ...
+    def positive(self, *args: Any, **kwargs: Any) -> Any: ...
+    def rad2deg(self, *args: Any, **kwargs: Any) -> Any: ...
+    def resolve_conj(self, *args: Any, **kwargs: Any) -> Any: ...
+    def resolve_neg(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sgn(self, *args: Any, **kwargs: Any) -> Any: ...
+    def signbit(self, *args: Any, **kwargs: Any) -> Any: ...
+    def sinc(self, *args: Any, **kwargs: Any) -> Any: ...
+    def to_dense(self, *args: Any, **kwargs: Any) -> Any: ...
+    def xlogy(self, *args: Any, **kwargs: Any) -> Any: ...
+
+# Dtype categories are classes rather than Unions, so that Float[...] stays a single type.
+class Num(AbstractArray[_ArrayType, _Shape]): ...
+class Inexact(Num[_ArrayType, _Shape]): ...
+class Real(Num[_ArrayType, _Shape]): ...
+class Integer(Real[_ArrayType, _Shape]): ...
+class UInt(Integer[_ArrayType, _Shape]): ...
+class Int(Integer[_ArrayType, _Shape]): ...
+class Float(Inexact[_ArrayType, _Shape], Real[_ArrayType, _Shape]): ...
+class Complex(Inexact[_ArrayType, _Shape]): ...
+
+class UInt2(UInt[_ArrayType, _Shape]): ...
+class UInt4(UInt[_ArrayType, _Shape]): ...
+class UInt8(UInt[_ArrayType, _Shape]):
     def __and__(self, other: "UInt8[_ArrayType, _Shape]") -> "UInt8[_ArrayType, _Shape]": ...
     def __or__(self, other: "UInt8[_ArrayType, _Shape]") -> "UInt8[_ArrayType, _Shape]": ...
     def __xor__(self, other: "UInt8[_ArrayType, _Shape]") -> "UInt8[_ArrayType, _Shape]": ...
@@ -95,37 +307,28 @@ class UInt8(AbstractArray[_ArrayType, _Shape]):
     def __ixor__(self, other: "UInt8[_ArrayType, _Shape]") -> "UInt8[_ArrayType, _Shape]": ...
     def __invert__(self) -> "UInt8[_ArrayType, _Shape]": ...
 
-class UInt16(AbstractArray[_ArrayType, _Shape]): ...
-class UInt32(AbstractArray[_ArrayType, _Shape]): ...
-class UInt64(AbstractArray[_ArrayType, _Shape]): ...
-class Int2(AbstractArray[_ArrayType, _Shape]): ...
-class Int4(AbstractArray[_ArrayType, _Shape]): ...
-class Int8(AbstractArray[_ArrayType, _Shape]): ...
-class Int16(AbstractArray[_ArrayType, _Shape]): ...
-class Int32(AbstractArray[_ArrayType, _Shape]): ...
-class Int64(AbstractArray[_ArrayType, _Shape]): ...
-class Float8e4m3b11fnuz(AbstractArray[_ArrayType, _Shape]): ...
-class Float8e4m3fn(AbstractArray[_ArrayType, _Shape]): ...
-class Float8e4m3fnuz(AbstractArray[_ArrayType, _Shape]): ...
-class Float8e5m2(AbstractArray[_ArrayType, _Shape]): ...
-class Float8e5m2fnuz(AbstractArray[_ArrayType, _Shape]): ...
-class BFloat16(AbstractArray[_ArrayType, _Shape]): ...
-class Float16(AbstractArray[_ArrayType, _Shape]): ...
-class Float32(AbstractArray[_ArrayType, _Shape]): ...
-class Float64(AbstractArray[_ArrayType, _Shape]): ...
-class Complex64(AbstractArray[_ArrayType, _Shape]): ...
-class Complex128(AbstractArray[_ArrayType, _Shape]): ...
+class UInt16(UInt[_ArrayType, _Shape]): ...
+class UInt32(UInt[_ArrayType, _Shape]): ...
+class UInt64(UInt[_ArrayType, _Shape]): ...
+class Int2(Int[_ArrayType, _Shape]): ...
+class Int4(Int[_ArrayType, _Shape]): ...
+class Int8(Int[_ArrayType, _Shape]): ...
+class Int16(Int[_ArrayType, _Shape]): ...
+class Int32(Int[_ArrayType, _Shape]): ...
+class Int64(Int[_ArrayType, _Shape]): ...
+class Float8e4m3b11fnuz(Float[_ArrayType, _Shape]): ...
+class Float8e4m3fn(Float[_ArrayType, _Shape]): ...
+class Float8e4m3fnuz(Float[_ArrayType, _Shape]): ...
+class Float8e5m2(Float[_ArrayType, _Shape]): ...
+class Float8e5m2fnuz(Float[_ArrayType, _Shape]): ...
+class BFloat16(Float[_ArrayType, _Shape]): ...
+class Float16(Float[_ArrayType, _Shape]): ...
+class Float32(Float[_ArrayType, _Shape]): ...
+class Float64(Float[_ArrayType, _Shape]): ...
+class Complex64(Complex[_ArrayType, _Shape]): ...
+class Complex128(Complex[_ArrayType, _Shape]): ...
 class Bool(AbstractArray[_ArrayType, _Shape]): ...
 
-UInt = Union[UInt2[_ArrayType, _Shape], UInt4[_ArrayType, _Shape], UInt8[_ArrayType, _Shape], UInt16[_ArrayType, _Shape], UInt32[_ArrayType, _Shape], UInt64[_ArrayType, _Shape]]
-Int = Union[Int2[_ArrayType, _Shape], Int4[_ArrayType, _Shape], Int8[_ArrayType, _Shape], Int16[_ArrayType, _Shape], Int32[_ArrayType, _Shape], Int64[_ArrayType, _Shape]]
-Integer = Union[Int[_ArrayType, _Shape], UInt[_ArrayType, _Shape]]
-Float = Union[Float8e4m3b11fnuz[_ArrayType, _Shape], Float8e4m3fn[_ArrayType, _Shape], Float8e4m3fnuz[_ArrayType, _Shape], Float8e5m2[_ArrayType, _Shape], Float8e5m2fnuz[_ArrayType, _Shape], BFloat16[_ArrayType, _Shape], Float16[_ArrayType, _Shape], Float32[_ArrayType, _Shape], Float64[_ArrayType, _Shape]]
-Complex = Union[Complex64[_ArrayType, _Shape], Complex128[_ArrayType, _Shape]]
-Inexact = Union[Float[_ArrayType, _Shape], Complex[_ArrayType, _Shape]]
-Real = Union[Float[_ArrayType, _Shape], UInt[_ArrayType, _Shape], Int[_ArrayType, _Shape]]
-Num = Union[Float[_ArrayType, _Shape], Complex[_ArrayType, _Shape], UInt[_ArrayType, _Shape], Int[_ArrayType, _Shape]]
-
 # Note: not supported
 # class Shaped(Generic[_ArrayType, _Shape]): ...
 # class Key(Generic[_ArrayType, _Shape]): ...
@@ -4,7 +4,13 @@ from ._storage import pop_shape_memo as pop_shape_memo, push_shape_memo as push_
 from collections.abc import Callable
 from contextlib import AbstractContextManager
 from jaxtyping import AbstractArray as AbstractArray
-from typing import Literal, overload
+from typing import Any, Literal, ParamSpec, TypeVar, overload
+import types
+
+_T = TypeVar("_T")
+_Params = ParamSpec("_Params")
+_Return = TypeVar("_Return")
+_TypeOrCallable = TypeVar("_TypeOrCallable", bound=Callable[..., Any])  # classes are callables too
 
 class _Sentinel: ...
 
@@ -1,5 +1,6 @@
 from torch._tensor import Tensor as Tensor
-from typing import TypeAlias, Any
+import builtins
+from typing import TypeAlias, Any, Tuple, Union
 
 class dtype: ...
 _Float32: TypeAlias = dtype
@@ -37,10 +38,233 @@ int64: _Int64
 long: _Int64
 bool: _Bool
 
-def randn(*size: int, out=None, dtype=None, **kwargs) -> Tensor: ...
-def rand(*size: int, out=None, dtype=None, **kwargs) -> Tensor: ...
-def zeros(*size: int, out=None, dtype=None, **kwargs) -> Tensor: ...
-def ones(*size: int, out=None, dtype=None, **kwargs) -> Tensor: ...
-def empty(*size: int, out=None, dtype=None, **kwargs) -> Tensor: ...
-def full(*size: int, fill_value: Any, out=None, dtype=None, **kwargs) -> Tensor: ...
-def randint(low: int, high: int, *size: int, out=None, dtype=None, **kwargs) -> Tensor: ...
\ No newline at end of file
+class device:
+    type: str
+    index: builtins.int | None
+    def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+
+# int is torch.int here, and a size can be given as a tuple.
+_SizeArg: TypeAlias = Union[builtins.int, Tuple[builtins.int, ...]]
+
+def randn(*size: _SizeArg, out=None, dtype=None, **kwargs) -> Tensor: ...
+def rand(*size: _SizeArg, out=None, dtype=None, **kwargs) -> Tensor: ...
+def zeros(*size: _SizeArg, out=None, dtype=None, **kwargs) -> Tensor: ...
+def ones(*size: _SizeArg, out=None, dtype=None, **kwargs) -> Tensor: ...
+def empty(*size: _SizeArg, out=None, dtype=None, **kwargs) -> Tensor: ...
+def full(size: _SizeArg, fill_value: Any, *, out=None, dtype=None, **kwargs) -> Tensor: ...
+def randint(low: builtins.int, high: builtins.int, *size: _SizeArg, out=None, dtype=None, **kwargs) -> Tensor: ...
+def tensor(data: Any, *, dtype=None, device=None, requires_grad: builtins.bool = False, pin_memory: builtins.bool = False) -> Tensor: ...
+def as_tensor(data: Any, dtype=None, device=None) -> Tensor: ...
+def from_numpy(ndarray: Any) -> Tensor: ...
+
+# Results are inferred by the rules in myshaping/shape_rules.py.
+def abs(*args: Any, **kwargs: Any) -> Tensor: ...
+def acos(*args: Any, **kwargs: Any) -> Tensor: ...
+def add(*args: Any, **kwargs: Any) -> Tensor: ...
+def addmm(*args: Any, **kwargs: Any) -> Tensor: ...
+def adjoint(*args: Any, **kwargs: Any) -> Tensor: ...
+def all(*args: Any, **kwargs: Any) -> Tensor: ...
+def amax(*args: Any, **kwargs: Any) -> Tensor: ...
+def amin(*args: Any, **kwargs: Any) -> Tensor: ...
+def any(*args: Any, **kwargs: Any) -> Tensor: ...
+def arange(*args: Any, **kwargs: Any) -> Tensor: ...
+def argmax(*args: Any, **kwargs: Any) -> Tensor: ...
+def argmin(*args: Any, **kwargs: Any) -> Tensor: ...
+def asin(*args: Any, **kwargs: Any) -> Tensor: ...
+def atan(*args: Any, **kwargs: Any) -> Tensor: ...
+def atan2(*args: Any, **kwargs: Any) -> Tensor: ...
+def bmm(*args: Any, **kwargs: Any) -> Tensor: ...
+def cat(*args: Any, **kwargs: Any) -> Tensor: ...
+def ceil(*args: Any, **kwargs: Any) -> Tensor: ...
+def clamp(*args: Any, **kwargs: Any) -> Tensor: ...
+def clip(*args: Any, **kwargs: Any) -> Tensor: ...
+def clone(*args: Any, **kwargs: Any) -> Tensor: ...
+def concat(*args: Any, **kwargs: Any) -> Tensor: ...
+def concatenate(*args: Any, **kwargs: Any) -> Tensor: ...
+def cos(*args: Any, **kwargs: Any) -> Tensor: ...
+def cosh(*args: Any, **kwargs: Any) -> Tensor: ...
+def count_nonzero(*args: Any, **kwargs: Any) -> Tensor: ...
+def cumprod(*args: Any, **kwargs: Any) -> Tensor: ...
+def cumsum(*args: Any, **kwargs: Any) -> Tensor: ...
+def detach(*args: Any, **kwargs: Any) -> Tensor: ...
+def div(*args: Any, **kwargs: Any) -> Tensor: ...
+def dot(*args: Any, **kwargs: Any) -> Tensor: ...
+def empty_like(*args: Any, **kwargs: Any) -> Tensor: ...
+def eq(*args: Any, **kwargs: Any) -> Tensor: ...
+def erf(*args: Any, **kwargs: Any) -> Tensor: ...
+def erfc(*args: Any, **kwargs: Any) -> Tensor: ...
+def exp(*args: Any, **kwargs: Any) -> Tensor: ...
+def exp2(*args: Any, **kwargs: Any) -> Tensor: ...
+def expm1(*args: Any, **kwargs: Any) -> Tensor: ...
+def eye(*args: Any, **kwargs: Any) -> Tensor: ...
+def flatten(*args: Any, **kwargs: Any) -> Tensor: ...
+def flip(*args: Any, **kwargs: Any) -> Tensor: ...
+def fliplr(*args: Any, **kwargs: Any) -> Tensor: ...
+def flipud(*args: Any, **kwargs: Any) -> Tensor: ...
+def floor(*args: Any, **kwargs: Any) -> Tensor: ...
+def fmod(*args: Any, **kwargs: Any) -> Tensor: ...
+def frac(*args: Any, **kwargs: Any) -> Tensor: ...
+def full_like(*args: Any, **kwargs: Any) -> Tensor: ...
+def gather(*args: Any, **kwargs: Any) -> Tensor: ...
+def ge(*args: Any, **kwargs: Any) -> Tensor: ...
+def ger(*args: Any, **kwargs: Any) -> Tensor: ...
+def gt(*args: Any, **kwargs: Any) -> Tensor: ...
+def index_select(*args: Any, **kwargs: Any) -> Tensor: ...
+def isfinite(*args: Any, **kwargs: Any) -> Tensor: ...
+def isinf(*args: Any, **kwargs: Any) -> Tensor: ...
+def isnan(*args: Any, **kwargs: Any) -> Tensor: ...
+def le(*args: Any, **kwargs: Any) -> Tensor: ...
+def linspace(*args: Any, **kwargs: Any) -> Tensor: ...
+def log(*args: Any, **kwargs: Any) -> Tensor: ...
+def log10(*args: Any, **kwargs: Any) -> Tensor: ...
+def log1p(*args: Any, **kwargs: Any) -> Tensor: ...
+def log2(*args: Any, **kwargs: Any) -> Tensor: ...
+def log_softmax(*args: Any, **kwargs: Any) -> Tensor: ...
+def logical_and(*args: Any, **kwargs: Any) -> Tensor: ...
+def logical_not(*args: Any, **kwargs: Any) -> Tensor: ...
+def logical_or(*args: Any, **kwargs: Any) -> Tensor: ...
+def logical_xor(*args: Any, **kwargs: Any) -> Tensor: ...
+def logsumexp(*args: Any, **kwargs: Any) -> Tensor: ...
+def lt(*args: Any, **kwargs: Any) -> Tensor: ...
+def masked_fill(*args: Any, **kwargs: Any) -> Tensor: ...
+def matmul(*args: Any, **kwargs: Any) -> Tensor: ...
+def maximum(*args: Any, **kwargs: Any) -> Tensor: ...
+def mean(*args: Any, **kwargs: Any) -> Tensor: ...
+def minimum(*args: Any, **kwargs: Any) -> Tensor: ...
+def mm(*args: Any, **kwargs: Any) -> Tensor: ...
+def moveaxis(*args: Any, **kwargs: Any) -> Tensor: ...
+def movedim(*args: Any, **kwargs: Any) -> Tensor: ...
+def mul(*args: Any, **kwargs: Any) -> Tensor: ...
+def multiply(*args: Any, **kwargs: Any) -> Tensor: ...
+def mv(*args: Any, **kwargs: Any) -> Tensor: ...
+def nanmean(*args: Any, **kwargs: Any) -> Tensor: ...
+def nansum(*args: Any, **kwargs: Any) -> Tensor: ...
+def narrow(*args: Any, **kwargs: Any) -> Tensor: ...
+def ne(*args: Any, **kwargs: Any) -> Tensor: ...
+def neg(*args: Any, **kwargs: Any) -> Tensor: ...
+def negative(*args: Any, **kwargs: Any) -> Tensor: ...
+def nonzero(*args: Any, **kwargs: Any) -> Tensor: ...
+def ones_like(*args: Any, **kwargs: Any) -> Tensor: ...
+def outer(*args: Any, **kwargs: Any) -> Tensor: ...
+def permute(*args: Any, **kwargs: Any) -> Tensor: ...
+def pow(*args: Any, **kwargs: Any) -> Tensor: ...
+def prod(*args: Any, **kwargs: Any) -> Tensor: ...
+def rand_like(*args: Any, **kwargs: Any) -> Tensor: ...
+def randn_like(*args: Any, **kwargs: Any) -> Tensor: ...
+def ravel(*args: Any, **kwargs: Any) -> Tensor: ...
+def reciprocal(*args: Any, **kwargs: Any) -> Tensor: ...
+def relu(*args: Any, **kwargs: Any) -> Tensor: ...
+def remainder(*args: Any, **kwargs: Any) -> Tensor: ...
+def reshape(*args: Any, **kwargs: Any) -> Tensor: ...
+def roll(*args: Any, **kwargs: Any) -> Tensor: ...
+def round(*args: Any, **kwargs: Any) -> Tensor: ...
+def rsqrt(*args: Any, **kwargs: Any) -> Tensor: ...
+def select(*args: Any, **kwargs: Any) -> Tensor: ...
+def sigmoid(*args: Any, **kwargs: Any) -> Tensor: ...
+def sign(*args: Any, **kwargs: Any) -> Tensor: ...
+def sin(*args: Any, **kwargs: Any) -> Tensor: ...
+def sinh(*args: Any, **kwargs: Any) -> Tensor: ...
+def softmax(*args: Any, **kwargs: Any) -> Tensor: ...
+def sqrt(*args: Any, **kwargs: Any) -> Tensor: ...
+def square(*args: Any, **kwargs: Any) -> Tensor: ...
+def squeeze(*args: Any, **kwargs: Any) -> Tensor: ...
+def stack(*args: Any, **kwargs: Any) -> Tensor: ...
+def std(*args: Any, **kwargs: Any) -> Tensor: ...
+def sub(*args: Any, **kwargs: Any) -> Tensor: ...
+def subtract(*args: Any, **kwargs: Any) -> Tensor: ...
+def sum(*args: Any, **kwargs: Any) -> Tensor: ...
+def swapaxes(*args: Any, **kwargs: Any) -> Tensor: ...
+def swapdims(*args: Any, **kwargs: Any) -> Tensor: ...
+def t(*args: Any, **kwargs: Any) -> Tensor: ...
+def tan(*args: Any, **kwargs: Any) -> Tensor: ...
+def tanh(*args: Any, **kwargs: Any) -> Tensor: ...
+def tile(*args: Any, **kwargs: Any) -> Tensor: ...
+def transpose(*args: Any, **kwargs: Any) -> Tensor: ...
+def tril(*args: Any, **kwargs: Any) -> Tensor: ...
+def triu(*args: Any, **kwargs: Any) -> Tensor: ...
+def true_divide(*args: Any, **kwargs: Any) -> Tensor: ...
+def trunc(*args: Any, **kwargs: Any) -> Tensor: ...
+def unflatten(*args: Any, **kwargs: Any) -> Tensor: ...
+def unsqueeze(*args: Any, **kwargs: Any) -> Tensor: ...
+def var(*args: Any, **kwargs: Any) -> Tensor: ...
+def vdot(*args: Any, **kwargs: Any) -> Tensor: ...
+def where(*args: Any, **kwargs: Any) -> Tensor: ...
+def zeros_like(*args: Any, **kwargs: Any) -> Tensor: ...
+
+# Results are inferred by the rules in myshaping/harvested_rules.py.
+def absolute(*args: Any, **kwargs: Any) -> Tensor: ...
+def acosh(*args: Any, **kwargs: Any) -> Tensor: ...
+def alias_copy(*args: Any, **kwargs: Any) -> Tensor: ...
+def angle(*args: Any, **kwargs: Any) -> Tensor: ...
+def arccos(*args: Any, **kwargs: Any) -> Tensor: ...
+def arccosh(*args: Any, **kwargs: Any) -> Tensor: ...
+def arcsin(*args: Any, **kwargs: Any) -> Tensor: ...
+def arcsinh(*args: Any, **kwargs: Any) -> Tensor: ...
+def arctan(*args: Any, **kwargs: Any) -> Tensor: ...
+def arctan2(*args: Any, **kwargs: Any) -> Tensor: ...
+def arctanh(*args: Any, **kwargs: Any) -> Tensor: ...
+def asarray(*args: Any, **kwargs: Any) -> Tensor: ...
+def asinh(*args: Any, **kwargs: Any) -> Tensor: ...
+def atanh(*args: Any, **kwargs: Any) -> Tensor: ...
+def bernoulli(*args: Any, **kwargs: Any) -> Tensor: ...
+def binary_cross_entropy_with_logits(*args: Any, **kwargs: Any) -> Tensor: ...
+def bitwise_and(*args: Any, **kwargs: Any) -> Tensor: ...
+def bitwise_left_shift(*args: Any, **kwargs: Any) -> Tensor: ...
+def bitwise_not(*args: Any, **kwargs: Any) -> Tensor: ...
+def bitwise_or(*args: Any, **kwargs: Any) -> Tensor: ...
+def bitwise_right_shift(*args: Any, **kwargs: Any) -> Tensor: ...
+def bitwise_xor(*args: Any, **kwargs: Any) -> Tensor: ...
+def celu(*args: Any, **kwargs: Any) -> Tensor: ...
+def clamp_max(*args: Any, **kwargs: Any) -> Tensor: ...
+def clamp_min(*args: Any, **kwargs: Any) -> Tensor: ...
+def conj(*args: Any, **kwargs: Any) -> Tensor: ...
+def conj_physical(*args: Any, **kwargs: Any) -> Tensor: ...
+def copysign(*args: Any, **kwargs: Any) -> Tensor: ...
+def deg2rad(*args: Any, **kwargs: Any) -> Tensor: ...
+def detach_copy(*args: Any, **kwargs: Any) -> Tensor: ...
+def digamma(*args: Any, **kwargs: Any) -> Tensor: ...
+def divide(*args: Any, **kwargs: Any) -> Tensor: ...
+def erfinv(*args: Any, **kwargs: Any) -> Tensor: ...
+def fix(*args: Any, **kwargs: Any) -> Tensor: ...
+def floor_divide(*args: Any, **kwargs: Any) -> Tensor: ...
+def fmax(*args: Any, **kwargs: Any) -> Tensor: ...
+def fmin(*args: Any, **kwargs: Any) -> Tensor: ...
+def gcd(*args: Any, **kwargs: Any) -> Tensor: ...
+def greater(*args: Any, **kwargs: Any) -> Tensor: ...
+def greater_equal(*args: Any, **kwargs: Any) -> Tensor: ...
+def heaviside(*args: Any, **kwargs: Any) -> Tensor: ...
+def hypot(*args: Any, **kwargs: Any) -> Tensor: ...
+def i0(*args: Any, **kwargs: Any) -> Tensor: ...
+def igamma(*args: Any, **kwargs: Any) -> Tensor: ...
+def igammac(*args: Any, **kwargs: Any) -> Tensor: ...
+def isclose(*args: Any, **kwargs: Any) -> Tensor: ...
+def isneginf(*args: Any, **kwargs: Any) -> Tensor: ...
+def isposinf(*args: Any, **kwargs: Any) -> Tensor: ...
+def isreal(*args: Any, **kwargs: Any) -> Tensor: ...
+def kl_div(*args: Any, **kwargs: Any) -> Tensor: ...
+def lcm(*args: Any, **kwargs: Any) -> Tensor: ...
+def ldexp(*args: Any, **kwargs: Any) -> Tensor: ...
+def less(*args: Any, **kwargs: Any) -> Tensor: ...
+def less_equal(*args: Any, **kwargs: Any) -> Tensor: ...
+def lgamma(*args: Any, **kwargs: Any) -> Tensor: ...
+def logaddexp(*args: Any, **kwargs: Any) -> Tensor: ...
+def logaddexp2(*args: Any, **kwargs: Any) -> Tensor: ...
+def logit(*args: Any, **kwargs: Any) -> Tensor: ...
+def msort(*args: Any, **kwargs: Any) -> Tensor: ...
+def nan_to_num(*args: Any, **kwargs: Any) -> Tensor: ...
+def nextafter(*args: Any, **kwargs: Any) -> Tensor: ...
+def normal(*args: Any, **kwargs: Any) -> Tensor: ...
+def not_equal(*args: Any, **kwargs: Any) -> Tensor: ...
+def poisson(*args: Any, **kwargs: Any) -> Tensor: ...
+def positive(*args: Any, **kwargs: Any) -> Tensor: ...
+def rad2deg(*args: Any, **kwargs: Any) -> Tensor: ...
+def real(*args: Any, **kwargs: Any) -> Tensor: ...
+def resolve_conj(*args: Any, **kwargs: Any) -> Tensor: ...
+def resolve_neg(*args: Any, **kwargs: Any) -> Tensor: ...
+def rrelu(*args: Any, **kwargs: Any) -> Tensor: ...
+def rsub(*args: Any, **kwargs: Any) -> Tensor: ...
+def selu(*args: Any, **kwargs: Any) -> Tensor: ...
+def sgn(*args: Any, **kwargs: Any) -> Tensor: ...
+def signbit(*args: Any, **kwargs: Any) -> Tensor: ...
+def sinc(*args: Any, **kwargs: Any) -> Tensor: ...
+def xlogy(*args: Any, **kwargs: Any) -> Tensor: ...
@@ -0,0 +1,186 @@
+"""Symbolic axes, e.g. "n+1", "2*c" or "h//2".
+
+An axis expression is parsed with the ast module into a canonical polynomial over
+the named axes. Polynomials are interned, so equal expressions ("2*c", "c+c",
+"c*2") are the same object and comparing them is an identity/hash check.
+
+Floor division by a constant that does not divide the polynomial exactly
+("h//2"), and any other Python expression ("min(a,b)", "h%2"), becomes an opaque
+atom named by its canonical text, which is compared textually.
+"""
+
+import ast
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Set, Tuple
+
+# ((atom, power), ...) sorted by atom; () is the constant monomial.
+Monomial = Tuple[Tuple[str, int], ...]
+# ((monomial, coefficient), ...) sorted, without zero coefficients.
+Terms = Tuple[Tuple[Monomial, int], ...]
+
+
+# Interned, so equality and hashing are by identity.
+@dataclass(frozen=True, eq=False)
+class Poly:
+    terms: Terms
+
+    def __repr__(self):
+        return _format(self.terms)
+
+    @property
+    def constant(self) -> Optional[int]:
+        """The value of a constant polynomial, None otherwise."""
+        if not self.terms:
+            return 0
+        if len(self.terms) == 1 and self.terms[0][0] == ():
+            return self.terms[0][1]
+        return None
+
+    @property
+    def variable(self) -> Optional[str]:
+        """The name of a polynomial that is a single named axis, e.g. "n", None otherwise."""
+        if len(self.terms) == 1:
+            monomial, coefficient = self.terms[0]
+            if coefficient == 1 and len(monomial) == 1 and monomial[0][1] == 1 and monomial[0][0].isidentifier():
+                return monomial[0][0]
+        return None
+
+
+_polys: Dict[Terms, Poly] = {}
+
+def make_poly(terms: Dict[Monomial, int]) -> Poly:
+    key = tuple(sorted((m, c) for m, c in terms.items() if c != 0))
+    poly = _polys.get(key)
+    if poly is None:
+        poly = _polys[key] = Poly(key)
+    return poly
+
+def constant(value: int) -> Poly:
+    return make_poly({(): value})
+
+def atom(name: str) -> Poly:
+    return make_poly({((name, 1),): 1})
+
+
+@lru_cache(maxsize=None)
+def add(x: Poly, y: Poly) -> Poly:
+    terms = dict(x.terms)
+    for monomial, coefficient in y.terms:
+        terms[monomial] = terms.get(monomial, 0) + coefficient
+    return make_poly(terms)
+
+@lru_cache(maxsize=None)
+def neg(x: Poly) -> Poly:
+    return make_poly({m: -c for m, c in x.terms})
+
+def sub(x: Poly, y: Poly) -> Poly:
+    return add(x, neg(y))
+
+def _mul_monomials(m1: Monomial, m2: Monomial) -> Monomial:
+    powers = dict(m1)
+    for name, power in m2:
+        powers[name] = powers.get(name, 0) + power
+    return tuple(sorted(powers.items()))
+
+@lru_cache(maxsize=None)
+def mul(x: Poly, y: Poly) -> Poly:
+    terms: Dict[Monomial, int] = {}
+    for m1, c1 in x.terms:
+        for m2, c2 in y.terms:
+            m = _mul_monomials(m1, m2)
+            terms[m] = terms.get(m, 0) + c1 * c2
+    return make_poly(terms)
+
+@lru_cache(maxsize=None)
+def floordiv(x: Poly, divisor: int) -> Poly:
+    """x // divisor. Exact when divisor divides every coefficient, an opaque atom otherwise."""
+    if divisor == 0:
+        raise ValueError("Symbolic axis divides by zero")
+    if all(c % divisor == 0 for _, c in x.terms):
+        return make_poly({m: c // divisor for m, c in x.terms})
+    numerator = repr(x)
+    if x.variable is None:
+        numerator = f"({numerator})"
+    return atom(f"{numerator}//{divisor}")
+
+@lru_cache(maxsize=None)
+def power(x: Poly, exponent: int) -> Poly:
+    result = constant(1)
+    for _ in range(exponent):
+        result = mul(result, x)
+    return result
+
+
+def _format_monomial(monomial: Monomial, coefficient: int) -> str:
+    factors = []
+    for name, p in monomial:
+        if not name.isidentifier():
+            name = f"({name})" if len(monomial) > 1 or coefficient != 1 or p != 1 else name
+        factors.append(name if p == 1 else f"{name}**{p}")
+    if coefficient != 1 or not factors:
+        factors.insert(0, str(coefficient))
+    return "*".join(factors)
+
+def _format(terms: Terms) -> str:
+    if not terms:
+        return "0"
+    # Highest degree first, constant last: "2*c+1", "n-1".
+    ordered = sorted(terms, key=lambda t: (-sum(p for _, p in t[0]), t[0]))
+    result = ""
+    for monomial, coefficient in ordered:
+        if not result:
+            result = "-" + _format_monomial(monomial, -coefficient) if coefficient < 0 else _format_monomial(monomial, coefficient)
+        elif coefficient < 0:
+            result += "-" + _format_monomial(monomial, -coefficient)
+        else:
+            result += "+" + _format_monomial(monomial, coefficient)
+    return result
+
+
+def _to_poly(node: ast.AST) -> Poly:
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return constant(node.value)
+    if isinstance(node, ast.Name):
+        return atom(node.id)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _to_poly(node.operand)
+        return neg(operand) if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.BinOp):
+        left, right = _to_poly(node.left), _to_poly(node.right)
+        if isinstance(node.op, ast.Add):
+            return add(left, right)
+        if isinstance(node.op, ast.Sub):
+            return sub(left, right)
+        if isinstance(node.op, ast.Mult):
+            return mul(left, right)
+        if isinstance(node.op, ast.FloorDiv) and right.constant is not None:
+            return floordiv(left, right.constant)
+        if isinstance(node.op, ast.Pow) and right.constant is not None and 0 <= right.constant <= 16:
+            return power(left, right.constant)
+    # Anything else is kept as an opaque atom, e.g. min(a,b) or h%2.
+    return atom(ast.unparse(node).replace(" ", ""))
+
+@lru_cache(maxsize=None)
+def parse_symbolic(expr: str) -> Poly:
+    """Parse a symbolic axis into its canonical (interned) polynomial."""
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError:
+        raise ValueError(f"Invalid symbolic axis: {expr}")
+    return _to_poly(tree.body)
+
+
+def atoms(x: Poly) -> Set[str]:
+    """The atoms x is a polynomial of."""
+    return {name for monomial, _ in x.terms for name, _ in monomial}
+
+def substitute(x: Poly, values: Dict[str, Poly]) -> Poly:
+    """Replace the atoms of x by the polynomials in values; other atoms are kept."""
+    result = constant(0)
+    for monomial, coefficient in x.terms:
+        term = constant(coefficient)
+        for name, p in monomial:
+            term = mul(term, power(values.get(name) or atom(name), p))
+        result = add(result, term)
+    return result
@@ -1,38 +1,19 @@
 from typing import Any, Optional, List, Tuple
 from mypy.plugin import MethodContext
 from mypy.checker import TypeChecker
+from mypy.nodes import RefExpr
 from mypy.types import Instance, TupleType, Type, UnboundType, LiteralType, EllipsisType, RawExpressionType
 
-from myshaping.type_translator import check_shape_compatibility, decompose_instance, parse_dimstr, repr_instance, construct_instance, compare_dtype, dump_dims
+from myshaping.type_translator import check_shape_compatibility, decompose_dtype_set, parse_dimstr, repr_operand, construct_instance, construct_instance_from_dims, construct_instance_from_mask, promote_dtype_sets, update_dtype_sets, repr_dtype_set, scalar_kind, dtype_masks, is_numpy
 from myshaping.function_helper import transpose_funcargs
+from myshaping.memo import memoized
+from myshaping.messages import report
 from myshaping.registry import register_method_hook
+from myshaping.torch_function_hooks import dtype_mapper
 
-base_array_types = [
-    "jaxtyping._array_types.UInt2",
-    "jaxtyping._array_types.UInt4",
-    "jaxtyping._array_types.UInt8",
-    "jaxtyping._array_types.UInt16",
-    "jaxtyping._array_types.UInt32",
-    "jaxtyping._array_types.UInt64",
-    "jaxtyping._array_types.Int2",
-    "jaxtyping._array_types.Int4",
-    "jaxtyping._array_types.Int8",
-    "jaxtyping._array_types.Int16",
-    "jaxtyping._array_types.Int32",
-    "jaxtyping._array_types.Int64",
-    "jaxtyping._array_types.Float8e4m3b11fnuz",
-    "jaxtyping._array_types.Float8e4m3fn",
-    "jaxtyping._array_types.Float8e4m3fnuz",
-    "jaxtyping._array_types.Float8e5m2",
-    "jaxtyping._array_types.Float8e5m2fnuz",
-    "jaxtyping._array_types.BFloat16",
-    "jaxtyping._array_types.Float16",
-    "jaxtyping._array_types.Float32",
-    "jaxtyping._array_types.Float64",
-    "jaxtyping._array_types.Complex64",
-    "jaxtyping._array_types.Complex128",
-    "jaxtyping._array_types.Bool",
-]
+# Hooks are registered once per operator for the whole family of jaxtyping array classes
+# (Float32, Float, ...); each hook bails out on types it can't decompose.
+array_family = "jaxtyping._array_types.*"
 
 cast_mapper = {
     "half": "Float16",
@@ -45,11 +26,13 @@ cast_mapper = {
 }
 
 for op, dtype in cast_mapper.items():
-    def handle_cast(ctx: MethodContext) -> Type:
-        xtype = ctx.type  # Self
-        _, x_backend, x_dimstr = decompose_instance(xtype)
+    def handle_cast(ctx: MethodContext, dtype: str = dtype) -> Type:
+        x = decompose_dtype_set(ctx.type)  # Self
+        if x is None:
+            return ctx.default_return_type
+        _, x_backend, x_dimstr = x
         return construct_instance(ctx.api, dtype, x_backend, x_dimstr)
-    register_method_hook(*[f"{arr}.{op}" for arr in base_array_types])(handle_cast)
+    register_method_hook(f"{array_family}.{op}")(handle_cast)
 
 # Possibly implicit type promotions
 binary_promotable = set([
@@ -72,105 +55,190 @@ inplace_operators = set([
     "__iadd__", "__isub__", "__imul__", "__ipow__", "__idiv__",
 ])
 
+def interop(x_backend: Instance, y_backend: Instance) -> Optional[bool]:
+    """Whether `x <op> y` follows numpy's promotion rules, or None if the backends can't mix.
+    A numpy array operand of a tensor is converted to a tensor, so torch's rules apply and
+    the result is a tensor; a numpy array fails with a tensor operand."""
+    if x_backend.type.fullname == y_backend.type.fullname:
+        return is_numpy(x_backend)
+    if is_numpy(y_backend):
+        return False
+    return None
+
 @register_method_hook(
-    *[f"{arr}.{binop}" for arr in base_array_types for binop in binary_promotable]
+    *[f"{array_family}.{binop}" for binop in binary_promotable]
 )
+@memoized
 def handle_binary_promotable(ctx: MethodContext) -> Type:
     xtype = ctx.type  # Self
     ytype = ctx.arg_types[0][0]  # Other
-    x_dtype, x_backend, x_dimstr = decompose_instance(xtype)
-    y_dtype, y_backend, y_dimstr = decompose_instance(ytype)
+    x = decompose_dtype_set(xtype)
+    if x is None:
+        return ctx.default_return_type
+    x_dtype, x_backend, x_dimstr = x
     x_shape = parse_dimstr(ctx.api, x_dimstr)
-    y_shape = parse_dimstr(ctx.api, y_dimstr)
+    y_scalar = scalar_kind(ytype)
+    if y_scalar is not None:
+        # Python scalars broadcast to any shape
+        y_dtype, y_backend, y_shape = y_scalar, x_backend, None
+    else:
+        y = decompose_dtype_set(ytype)
+        if y is None:
+            return ctx.default_return_type
+        y_dtype, y_backend, y_dimstr = y
+        y_shape = parse_dimstr(ctx.api, y_dimstr)
 
     # backend check
-    if x_backend.type.fullname != y_backend.type.fullname:
-        ctx.api.fail(f"Backend mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
-        # TODO: torch vs numpy is sometimes allowed
+    numpy = interop(x_backend, y_backend)
+    if numpy is None:
+        ctx.api.fail(f"Backend mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
     z_backend = x_backend
     
     # type check
-    promotion = compare_dtype(x_dtype, y_dtype)
+    promotion = promote_dtype_sets(x_dtype, y_dtype, numpy)
     if promotion is None:
-        ctx.api.fail(f"Type mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
+        ctx.api.fail(f"Type mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
-    z_dtype = y_dtype if promotion == 1 else x_dtype
-    if x_dtype != z_dtype:
-        ctx.api.msg.note(f"Implicit dtype conversion of self: {x_dtype} -> {z_dtype}", ctx.context)
-    if y_dtype != z_dtype:
-        ctx.api.msg.note(f"Implicit dtype conversion of other: {y_dtype} -> {z_dtype}", ctx.context)
+    z_dtype = promotion.dtype
+    lossy = " (may lose precision)" if promotion.lossy else ""
+    if promotion.self_converted:
+        report(ctx.api, f"Implicit dtype conversion of self: {repr_dtype_set(x_dtype)} -> {repr_dtype_set(z_dtype)}{lossy}", ctx.context)
+    if promotion.other_converted and y_scalar is None:
+        report(ctx.api, f"Implicit dtype conversion of other: {repr_dtype_set(y_dtype)} -> {repr_dtype_set(z_dtype)}{lossy}", ctx.context)
 
     # shape check
-    z_shape = check_shape_compatibility(x_shape, y_shape, allow_broadcast=True)
+    z_shape = x_shape if y_shape is None else check_shape_compatibility(x_shape, y_shape, allow_broadcast=True)
     if z_shape is None:
-        ctx.api.fail(f"Shape mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
+        ctx.api.fail(f"Shape mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
     
-    return construct_instance(ctx.api, z_dtype, z_backend, dump_dims(z_shape))
+    return construct_instance_from_mask(ctx.api, z_dtype, z_backend, z_shape)
 
 
-@register_method_hook(
-    *[f"{arr}.{binop}" for arr in base_array_types for binop in binary_comparison]
-)
-def handle_comparison(ctx: MethodContext) -> Type:
+def handle_comparison(ctx: MethodContext, binop: str) -> Type:
     xtype = ctx.type  # Self
     ytype = ctx.arg_types[0][0]  # Other
-    x_dtype, x_backend, x_dimstr = decompose_instance(xtype)
-    y_dtype, y_backend, y_dimstr = decompose_instance(ytype)
+    x = decompose_dtype_set(xtype)
+    if x is None:
+        return ctx.default_return_type
+    x_dtype, x_backend, x_dimstr = x
     x_shape = parse_dimstr(ctx.api, x_dimstr)
-    y_shape = parse_dimstr(ctx.api, y_dimstr)
-
-    # backend check
-    if x_backend.type.fullname != y_backend.type.fullname:
-        ctx.api.fail(f"Backend mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
-        # TODO: torch vs numpy is sometimes allowed
+    y_scalar = scalar_kind(ytype)
+    if y_scalar is not None:
+        # Python scalars broadcast to any shape
+        y_dtype, y_backend, y_shape = y_scalar, x_backend, None
+    else:
+        y = decompose_dtype_set(ytype)
+        if y is None:
+            return ctx.default_return_type
+        y_dtype, y_backend, y_dimstr = y
+        y_shape = parse_dimstr(ctx.api, y_dimstr)
+
+    # backend check: a tensor and a numpy array only compare with ==, which gives a tensor
+    numpy, z_backend = interop(x_backend, y_backend), x_backend
+    if binop != "__eq__" and x_backend.type.fullname != y_backend.type.fullname:
+        numpy = None
+    elif numpy is None and is_numpy(x_backend):
+        numpy, z_backend = interop(y_backend, x_backend), y_backend
+    if numpy is None:
+        ctx.api.fail(f"Backend mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
     
     # type check
-    promotion = compare_dtype(x_dtype, y_dtype)
+    promotion = promote_dtype_sets(x_dtype, y_dtype, numpy)
     if promotion is None:
-        ctx.api.fail(f"Type mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
+        ctx.api.fail(f"Type mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
 
     # shape check
-    z_shape = check_shape_compatibility(x_shape, y_shape, allow_broadcast=True)
+    z_shape = x_shape if y_shape is None else check_shape_compatibility(x_shape, y_shape, allow_broadcast=True)
     if z_shape is None:
-        ctx.api.fail(f"Shape mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
+        ctx.api.fail(f"Shape mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
     
-    return construct_instance(ctx.api, "Bool", x_backend, dump_dims(z_shape))
+    return construct_instance_from_dims(ctx.api, "Bool", z_backend, z_shape)
+
+for binop in binary_comparison:
+    def handle_comparison_op(ctx: MethodContext, binop: str = binop) -> Type:
+        return handle_comparison(ctx, binop)
+    register_method_hook(f"{array_family}.{binop}")(memoized(handle_comparison_op))
 
 
 @register_method_hook(
-    *[f"{arr}.{binop}" for arr in base_array_types for binop in inplace_operators]
+    *[f"{array_family}.{binop}" for binop in inplace_operators]
 )
+@memoized
 def handle_inplace(ctx: MethodContext) -> Type:
     xtype = ctx.type  # Self
     ytype = ctx.arg_types[0][0]  # Other
-    x_dtype, x_backend, x_dimstr = decompose_instance(xtype)
-    y_dtype, y_backend, y_dimstr = decompose_instance(ytype)
+    x = decompose_dtype_set(xtype)
+    if x is None:
+        return ctx.default_return_type
+    x_dtype, x_backend, x_dimstr = x
     x_shape = parse_dimstr(ctx.api, x_dimstr)
-    y_shape = parse_dimstr(ctx.api, y_dimstr)
+    y_scalar = scalar_kind(ytype)
+    if y_scalar is not None:
+        # Python scalars broadcast to any shape
+        y_dtype, y_backend, y_shape = y_scalar, x_backend, None
+    else:
+        y = decompose_dtype_set(ytype)
+        if y is None:
+            return ctx.default_return_type
+        y_dtype, y_backend, y_dimstr = y
+        y_shape = parse_dimstr(ctx.api, y_dimstr)
 
     # backend check
-    if x_backend.type.fullname != y_backend.type.fullname:
-        ctx.api.fail(f"Backend mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
-        # TODO: torch vs numpy is sometimes allowed
+    numpy = interop(x_backend, y_backend)
+    if numpy is None:
+        ctx.api.fail(f"Backend mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
-    
+    if x_backend.type.fullname != y_backend.type.fullname:
+        # Tensor's in-place operators return NotImplemented for a numpy array, and Python falls back to x = x <op> y.
+        report(ctx.api, "Not in place: a numpy array operand makes a new tensor", ctx.context)
+        return handle_binary_promotable(ctx)
+
     # type check
-    promotion = compare_dtype(x_dtype, y_dtype)
-    if promotion is None:
-        ctx.api.fail(f"Type mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
+    update = update_dtype_sets(x_dtype, y_dtype, numpy)
+    if update is None:
+        ctx.api.fail(f"Type mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
-    if promotion == 1:
-        ctx.api.msg.note(f"Implicit dtype conversion in update: other: {y_dtype} -> self: {x_dtype}", ctx.context)
+    if update.self_converted:
+        lossy = " (may lose precision)" if update.lossy else ""
+        report(ctx.api, f"Implicit dtype conversion in update: other: {repr_dtype_set(y_dtype) if y_scalar is None else y_scalar} -> self: {repr_dtype_set(x_dtype)}{lossy}", ctx.context)
 
     # shape check
-    z_shape = check_shape_compatibility(x_shape, y_shape, allow_broadcast=True)
-    if z_shape is None or dump_dims(x_shape) != dump_dims(z_shape):
-        ctx.api.fail(f"Shape mismatch. self: {repr_instance(xtype, ctx.api.msg.options)} vs other: {repr_instance(ytype, ctx.api.msg.options)}", ctx.context)
+    z_shape = x_shape if y_shape is None else check_shape_compatibility(x_shape, y_shape, allow_broadcast=True)
+    if z_shape is None or tuple(z_shape) != x_shape:
+        ctx.api.fail(f"Shape mismatch. self: {repr_operand(xtype, ctx.api)} vs other: {repr_operand(ytype, ctx.api)}", ctx.context)
         return ctx.default_return_type
     
-    return construct_instance(ctx.api, x_dtype, x_backend, x_dimstr)
+    return xtype
+
+
+@register_method_hook(f"{array_family}.to")
+def handle_to(ctx: MethodContext) -> Type:
+    """x.to(dtype), x.to(other) and x.to(device, dtype): the dtype of the result.
+    Its device is tracked by devices.DeviceTracker."""
+    x = decompose_dtype_set(ctx.type)  # Self
+    if x is None:
+        return ctx.default_return_type
+    z_dtype, x_backend, x_dimstr = x
+    for names, args, types in zip(ctx.arg_names, ctx.args, ctx.arg_types):
+        for name, arg, typ in zip(names, args, types):
+            other = decompose_dtype_set(typ) if name is None else None
+            if other is not None:
+                z_dtype = other[0]
+            elif isinstance(typ, Instance) and typ.type.fullname == "torch.dtype" and name in (None, "dtype"):
+                dtype = dtype_mapper.get(arg.name) if isinstance(arg, RefExpr) else None
+                if dtype is None:
+                    return ctx.default_return_type
+                z_dtype = dtype_masks[dtype]
+    return construct_instance_from_mask(ctx.api, z_dtype, x_backend, parse_dimstr(ctx.api, x_dimstr))
+
+
+@register_method_hook(*[f"{array_family}.{op}" for op in ["cpu", "cuda", "item", "tolist"]])
+def handle_transfer(ctx: MethodContext) -> Type:
+    """Nothing to infer from the stubs' types; the hook lets devices.DeviceTracker and the
+    perf lint see the call."""
+    return ctx.default_return_type
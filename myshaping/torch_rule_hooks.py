@@ -0,0 +1,524 @@
+"""Compile the rules of shape_rules.py, and those harvested from torch, into hooks, once at import.
+
+Each rule is parsed into a specialized closure: a binder mapping the call's actual
+arguments to the rule's parameters, an extractor per parameter kind, and the shape
+and dtype functions with their arguments resolved to parameter positions.
+"""
+
+import ast
+import itertools
+import re
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from mypy.checker import TypeChecker
+from mypy.nodes import (
+    ARG_NAMED, ARG_POS, EllipsisExpr, Expression, IntExpr, ListExpr, MemberExpr, NameExpr, SliceExpr, TupleExpr, UnaryExpr,
+)
+from mypy.plugin import FunctionContext, MethodContext
+from mypy.types import Instance, LiteralType, ProperType, TupleType, Type, get_proper_type
+
+from myshaping.layouts import LAYOUT_FUNCTIONS, Layout, layout_of, with_layout
+from myshaping.numpy_hooks import numpy_dtype
+from myshaping.harvested_rules import RULES as HARVESTED_RULES
+from myshaping.registry import FUNCTION_HOOKS, METHOD_HOOKS, register_function_hook, register_method_hook
+from myshaping.shape_functions import DTYPE_FUNCTIONS, DYNAMIC, SHAPE_FUNCTIONS, ShapeError, TensorIndex, Unknown
+from myshaping.shape_rules import RULES
+from myshaping.tensor_method_hooks import array_family
+from myshaping.torch_function_hooks import dtype_mapper
+from myshaping.type_translator import (
+    NDARRAY, Dims, FixedDim, construct_instance_from_mask, decompose_dtype_set, dtype_masks, parse_dimstr, scalar_kind,
+)
+
+
+class Operand(NamedTuple):
+    dtype: Union[int, str]  # set of dtypes, or the kind of a Python scalar
+    backend: Optional[Instance]
+    dims: Dims
+    layout: Layout = None
+
+
+class Param(NamedTuple):
+    name: str
+    kind: str
+    default: Any
+    required: bool
+    keyword_only: bool
+    star: bool  # *name
+
+
+class Rule(NamedTuple):
+    names: List[str]
+    params: List[Param]
+    kwargs: bool  # accepts any other keyword argument
+    shape: Callable[..., Dims]
+    shape_args: List[Tuple[Optional[int], Any]]  # (parameter index, None) or (None, int constant)
+    dtype: List[Tuple[Callable[..., Any], List[int]]]  # alternatives: (function, parameter indices)
+    layout: Optional[Callable[..., Layout]]
+    layout_args: List[Tuple[Optional[int], Any]]  # like shape_args
+    text: str
+
+
+class _Missing:
+    pass
+
+_missing = _Missing()  # a value that can't be extracted statically
+
+
+"""Extractors, from an actual argument (type, expression) to the value of a parameter kind."""
+
+def _literal(typ: ProperType, expr: Optional[Expression], kind: type) -> Any:
+    if isinstance(typ, LiteralType) and type(typ.value) is kind:
+        return typ.value
+    if isinstance(typ, Instance) and typ.last_known_value is not None and type(typ.last_known_value.value) is kind:
+        return typ.last_known_value.value
+    if kind is int:
+        if isinstance(expr, IntExpr):
+            return expr.value
+        if isinstance(expr, UnaryExpr) and expr.op == "-" and isinstance(expr.expr, IntExpr):
+            return -expr.expr.value
+    if kind is bool and isinstance(expr, NameExpr) and expr.fullname in ("builtins.True", "builtins.False"):
+        return expr.fullname == "builtins.True"
+    return _missing
+
+def _is_none(expr: Optional[Expression]) -> bool:
+    return isinstance(expr, NameExpr) and expr.fullname == "builtins.None"
+
+def _items(api, typ: ProperType, expr: Optional[Expression]) -> Optional[List[Tuple[ProperType, Optional[Expression]]]]:
+    """The items of a tuple or list argument."""
+    if isinstance(expr, (TupleExpr, ListExpr)) and isinstance(api, TypeChecker):
+        result = []
+        for item in expr.items:
+            item_type = api.lookup_type_or_none(item)
+            if item_type is None:
+                return None
+            result.append((get_proper_type(item_type), item))
+        return result
+    if isinstance(typ, TupleType):
+        return [(get_proper_type(item), None) for item in typ.items]
+    return None
+
+def extract_int(api, typ, expr):
+    return _literal(typ, expr, int)
+
+def extract_bool(api, typ, expr):
+    return _literal(typ, expr, bool)
+
+def extract_ints(api, typ, expr):
+    items = _items(api, typ, expr)
+    if items is None:
+        return _missing
+    values = [_literal(item_type, item, int) for item_type, item in items]
+    return _missing if _missing in values else values
+
+def extract_dims(api, typ, expr):
+    if _is_none(expr):
+        return None
+    value = _literal(typ, expr, int)
+    return extract_ints(api, typ, expr) if value is _missing else value
+
+def extract_dtype(api, typ, expr):
+    if _is_none(expr):
+        return None
+    if isinstance(expr, MemberExpr) and isinstance(typ, Instance) and typ.type.fullname == "torch.dtype":
+        dtype = dtype_mapper.get(expr.name)
+        if dtype is not None:
+            return dtype_masks[dtype]
+    return _missing
+
+def extract_npdtype(api, typ, expr):
+    if _is_none(expr):
+        return None
+    dtype = numpy_dtype(expr) if expr is not None else None
+    return _missing if dtype is None else dtype_masks[dtype]
+
+def extract_tensor(api, typ, expr):
+    x = decompose_dtype_set(typ)
+    if x is None:
+        return _missing
+    mask, backend, dim_str = x
+    return Operand(mask, backend, parse_dimstr(api, dim_str), layout_of(typ))
+
+def extract_operand(api, typ, expr):
+    kind = scalar_kind(typ)
+    if kind is not None:
+        return Operand(kind, None, ())
+    return extract_tensor(api, typ, expr)
+
+def extract_tensors(api, typ, expr):
+    items = _items(api, typ, expr)
+    if items is None:
+        return _missing
+    values = [extract_tensor(api, item_type, item) for item_type, item in items]
+    return _missing if _missing in values else tuple(values)
+
+def extract_any(api, typ, expr):
+    return None
+
+EXTRACTORS: Dict[str, Callable[[Any, ProperType, Optional[Expression]], Any]] = {
+    "tensor": extract_tensor,
+    "operand": extract_operand,
+    "tensors": extract_tensors,
+    "int": extract_int,
+    "bool": extract_bool,
+    "ints": extract_ints,
+    "dims": extract_dims,
+    "dtype": extract_dtype,
+    "npdtype": extract_npdtype,
+    "any": extract_any,
+}
+
+
+"""Parsing."""
+
+def _expand(name: str) -> List[str]:
+    """Expand {a,b} alternatives, e.g. "{torch,Tensor}.exp" -> ["torch.exp", "Tensor.exp"]."""
+    parts = re.split(r"\{([^}]*)\}", name)
+    choices = [part.split(",") if i % 2 else [part] for i, part in enumerate(parts)]
+    return ["".join(p) for p in itertools.product(*choices)]
+
+def _parse_params(text: str) -> Tuple[List[Param], bool]:
+    args = ast.parse(f"def _({text}): pass").body[0].args  # type: ignore[attr-defined]
+    params: List[Param] = []
+
+    def add(arg: ast.arg, default: Optional[ast.expr], keyword_only: bool, star: bool = False):
+        kind = arg.annotation.id if isinstance(arg.annotation, ast.Name) else "tensor"
+        if kind not in EXTRACTORS:
+            raise ValueError(f"unknown parameter kind {kind}")
+        value = None if default is None else ast.literal_eval(default)
+        params.append(Param(arg.arg, kind, value, default is None and not star, keyword_only, star))
+
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + args.defaults
+    for arg, default in zip(positional, defaults):
+        add(arg, default, keyword_only=False)
+    if args.vararg is not None:
+        add(args.vararg, None, keyword_only=False, star=True)
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        add(arg, default, keyword_only=True)
+    return params, args.kwarg is not None
+
+def _call(expr: ast.expr, functions: Dict[str, Callable]) -> Tuple[Callable, List[Union[str, int]]]:
+    if isinstance(expr, ast.Call) and isinstance(expr.func, ast.Name) and expr.func.id in functions:
+        return functions[expr.func.id], [arg.id if isinstance(arg, ast.Name) else ast.literal_eval(arg) for arg in expr.args]
+    raise ValueError(f"unknown function {ast.unparse(expr)}")
+
+def _parse_dtype(expr: ast.expr, params: Dict[str, Param], first: Optional[str]) -> List[Tuple[Callable, List[str]]]:
+    if isinstance(expr, ast.BinOp) and isinstance(expr.op, ast.BitOr):
+        return _parse_dtype(expr.left, params, first) + _parse_dtype(expr.right, params, first)
+    if isinstance(expr, ast.Name):
+        if expr.id == "same" and first is not None:
+            return [(DTYPE_FUNCTIONS["same"], [first])]
+        if expr.id in params and params[expr.id].kind in ("dtype", "npdtype"):
+            return [(_given, [expr.id])]
+        if expr.id in dtype_mapper:
+            mask = dtype_masks[dtype_mapper[expr.id]]
+            return [(lambda: mask, [])]
+    function, args = _call(expr, DTYPE_FUNCTIONS)
+    return [(function, [str(arg) for arg in args])]
+
+def _given(value):
+    if value is None:
+        raise LookupError()  # fall back to the next alternative
+    return value
+
+def parse_rule(line: str) -> Rule:
+    match = re.fullmatch(r"(?P<names>[^(]+)\((?P<params>.*)\)\s*->\s*(?P<shape>[^:@]+?)\s*(?:@\s*(?P<layout>[^:]+?)\s*)?(?::\s*(?P<dtype>.+))?", line)
+    if match is None:
+        raise ValueError(f"can't parse rule: {line}")
+    names = [name for group in match["names"].split() for name in _expand(group)]
+    params, kwargs = _parse_params(match["params"])
+    by_name = {p.name: p for p in params}
+    first = next((p.name for p in params if p.kind in ("tensor", "tensors")), None)
+
+    shape_expr = ast.parse(match["shape"], mode="eval").body
+    if isinstance(shape_expr, ast.Name):
+        shape, shape_args = SHAPE_FUNCTIONS["same"], [shape_expr.id]
+    else:
+        shape, shape_args = _call(shape_expr, SHAPE_FUNCTIONS)
+    dtype = _parse_dtype(ast.parse(match["dtype"] or "same", mode="eval").body, by_name, first)
+    layout, layout_args = _call(ast.parse(match["layout"], mode="eval").body, LAYOUT_FUNCTIONS) if match["layout"] else (None, [])
+    index = {p.name: i for i, p in enumerate(params)}
+    for arg in [*shape_args, *layout_args, *(a for _, args in dtype for a in args)]:
+        if isinstance(arg, str) and arg not in index:
+            raise ValueError(f"unknown parameter {arg} in rule: {line}")
+    return Rule(
+        names, params, kwargs, shape,
+        [(index[a], None) if isinstance(a, str) else (None, a) for a in shape_args],
+        [(fn, [index[a] for a in args]) for fn, args in dtype],
+        layout,
+        [(index[a], None) if isinstance(a, str) else (None, a) for a in layout_args],
+        line,
+    )
+
+def apply_rule(rule: Rule, values: List[Any]) -> Tuple[Dims, int]:
+    """The dims and dtype set of the result, from the values of the rule's parameters."""
+    dims = rule.shape(*[_shape_value(values[i]) if i is not None else c for i, c in rule.shape_args])
+    for fn, args in rule.dtype:
+        try:
+            return dims, fn(*[x for i in args for x in _dtype_value(values[i])])
+        except LookupError:
+            continue
+    raise Unknown()
+
+def apply_layout(rule: Rule, values: List[Any], dims: Dims) -> Layout:
+    """The layout of the result of a rule with a layout clause, None if unknown. Raises
+    ShapeError for a view torch would reject."""
+    args = []
+    for i, c in rule.layout_args:
+        value = values[i] if i is not None else c
+        args.extend([value.dims, value.layout] if isinstance(value, Operand) else [value])
+    try:
+        return rule.layout(dims, *args)  # type: ignore[misc]
+    except Unknown:
+        return None
+
+
+"""Compiling."""
+
+def _actuals(ctx: Union[FunctionContext, MethodContext]):
+    """(kind, name, type, expression) of every actual argument, in the order of the call."""
+    result = []
+    for kinds, names, types, args in zip(ctx.arg_kinds, ctx.arg_names, ctx.arg_types, ctx.args):
+        for kind, name, typ, arg in zip(kinds, names, types, args):
+            if kind not in (ARG_POS, ARG_NAMED):
+                return None  # *args, **kwargs
+            result.append((kind, name, typ, arg))
+    result.sort(key=lambda a: (a[3].line, a[3].column))
+    return result
+
+def compile_rule(rule: Rule, name: str, method: bool, display: Optional[str] = None) -> Callable:
+    params = rule.params
+    index = {p.name: i for i, p in enumerate(params)}
+    positional = [i for i, p in enumerate(params) if not p.keyword_only]
+    star = next((i for i, p in enumerate(params) if p.star), None)
+    extractors = [EXTRACTORS[p.kind] for p in params]
+    defaults = [p.default for p in params]
+    required = [p.required for p in params]
+    tensor_params = [i for i, p in enumerate(params) if p.kind in ("tensor", "operand", "tensors")]
+    display = display or name.replace(f"{array_family}.", "Tensor.")
+    numpy = display.startswith("np.")  # the result is a numpy array whatever the operands
+
+    def bind(ctx) -> Optional[List[Any]]:
+        actuals = _actuals(ctx)
+        if actuals is None:
+            return None
+        values: List[Any] = [_missing] * len(params)
+        given = [False] * len(params)
+        api = ctx.api
+        pos = iter(positional)
+        rest: List[Tuple[ProperType, Expression]] = []
+        in_star = False
+        if method:
+            i = next(pos)
+            values[i], given[i] = extractors[i](api, get_proper_type(ctx.type), None), True
+        for kind, arg_name, typ, expr in actuals:
+            typ = get_proper_type(typ)
+            if kind == ARG_POS:
+                if in_star:
+                    rest.append((typ, expr))
+                    continue
+                i = next(pos, -1)
+                if i < 0:
+                    return None
+                if i == star:
+                    in_star = True
+                    rest.append((typ, expr))
+                    continue
+            elif arg_name in index and not params[index[arg_name]].star:
+                i = index[arg_name]
+                if given[i]:
+                    return None
+            elif rule.kwargs:
+                continue
+            else:
+                return None
+            values[i], given[i] = extractors[i](api, typ, expr), True
+        if star is not None and params[star].kind != "ints":
+            values[star], given[star] = None, True
+        elif star is not None:
+            if len(rest) == 1 and (one := extract_ints(api, *rest[0])) is not _missing:
+                values[star] = one  # x.view((2, 3))
+            else:
+                ints = [_literal(typ, expr, int) for typ, expr in rest]
+                values[star] = _missing if _missing in ints else ints
+            given[star] = True
+        for i, p in enumerate(params):
+            if not given[i]:
+                if required[i]:
+                    return None
+                values[i] = defaults[i]
+        return values
+
+    def hook(ctx: Union[FunctionContext, MethodContext]) -> Type:
+        if not isinstance(ctx.api, TypeChecker):
+            return ctx.default_return_type
+        values = bind(ctx)
+        if values is None or _missing in values:
+            return ctx.default_return_type
+        backend = None
+        for i in tensor_params:
+            value = values[i]
+            for operand in (value if isinstance(value, tuple) else [value]):
+                if isinstance(operand, Operand) and operand.backend is not None:
+                    if backend is not None and operand.backend.type.fullname != backend.type.fullname:
+                        ctx.api.fail(f"Backend mismatch in {display}", ctx.context)
+                        return ctx.default_return_type
+                    backend = backend or operand.backend
+        try:
+            dims, mask = apply_rule(rule, values)
+        except Unknown:
+            return ctx.default_return_type
+        except ShapeError as e:
+            ctx.api.fail(f"Shape mismatch in {display}: {e}", ctx.context)
+            return ctx.default_return_type
+        if rule.layout is not None:
+            try:
+                layout = apply_layout(rule, values, dims)
+            except ShapeError as e:
+                ctx.api.fail(f"Invalid view in {display}: {e}", ctx.context)
+                return ctx.default_return_type
+        if numpy:
+            backend = ctx.api.named_type(NDARRAY)
+        elif backend is None:
+            backend = ctx.api.named_type("torch.Tensor")
+        result = construct_instance_from_mask(ctx.api, mask, backend, dims)
+        return with_layout(ctx.api, result, layout) if rule.layout is not None else result
+
+    hook.__name__ = hook.__qualname__ = f"rule[{display}]"
+    return hook
+
+def _shape_value(value):
+    if isinstance(value, Operand):
+        return value.dims
+    if isinstance(value, tuple) and value and isinstance(value[0], Operand):
+        return tuple(v.dims for v in value)
+    return value
+
+def _dtype_value(value):
+    if isinstance(value, Operand):
+        return [value.dtype]
+    if isinstance(value, tuple) and value and isinstance(value[0], Operand):
+        return [v.dtype for v in value]
+    return [value]
+
+
+# Where the stubs of numpy 2, and of numpy 1, define the functions of the np rules. In numpy 2,
+# np.zeros, np.ones and np.empty are instances of a callable class, whose __call__ is a method.
+NUMPY_FULLNAMES = {
+    "zeros": ["numpy._core.multiarray._ConstructorEmpty.__call__", "numpy.core.multiarray.zeros"],
+    "ones": ["numpy._core.multiarray._ConstructorEmpty.__call__", "numpy.core.numeric.ones"],
+    "empty": ["numpy._core.multiarray._ConstructorEmpty.__call__", "numpy.core.multiarray.empty"],
+    "full": ["numpy._core.numeric.full", "numpy.core.numeric.full"],
+    "zeros_like": ["numpy._core.numeric.zeros_like", "numpy.core.numeric.zeros_like"],
+    "ones_like": ["numpy._core.numeric.ones_like", "numpy.core.numeric.ones_like"],
+    "empty_like": ["numpy._core.multiarray.empty_like", "numpy.core.multiarray.empty_like"],
+    "full_like": ["numpy._core.numeric.full_like", "numpy.core.numeric.full_like"],
+    "eye": ["numpy.lib._twodim_base_impl.eye", "numpy.lib.twodim_base.eye"],
+    "arange": ["numpy._core.multiarray.arange", "numpy.core.multiarray.arange"],
+}
+
+def compile_rules(text: str = RULES) -> Tuple[Dict[str, Callable], Dict[str, Callable]]:
+    """Compile the rules into (function hooks, method hooks) by fullname."""
+    functions: Dict[str, Callable] = {}
+    methods: Dict[str, Callable] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        rule = parse_rule(line)
+        for name in rule.names:
+            owner, _, member = name.partition(".")
+            if owner == "torch":
+                functions[name] = compile_rule(rule, name, method=False)
+            elif owner == "Tensor":
+                fullname = f"{array_family}.{member}"
+                methods[fullname] = compile_rule(rule, fullname, method=True)
+            elif owner == "np":
+                for fullname in NUMPY_FULLNAMES[member]:
+                    hooks = methods if fullname.endswith(".__call__") else functions
+                    shared = [n for n, fullnames in NUMPY_FULLNAMES.items() if fullname in fullnames]
+                    display = f"np.{shared[0]}" if len(shared) == 1 else f"np.{{{','.join(shared)}}}"
+                    hooks[fullname] = compile_rule(rule, fullname, method=False, display=display)
+            else:
+                raise ValueError(f"rule for neither torch, Tensor nor np: {name}")
+    return functions, methods
+
+
+"""Indexing, x[...], with a hook of its own."""
+
+_MASKS = dtype_masks["Bool"] | dtype_masks["UInt8"]
+_INDICES = dtype_masks["Integer"] & ~_MASKS
+
+def _index_item(api, expr: Expression) -> Any:
+    """The item of shape_functions.index for an index expression, _missing if it can't be told."""
+    if isinstance(expr, EllipsisExpr):
+        return Ellipsis
+    if _is_none(expr):
+        return None
+    if isinstance(expr, SliceExpr):
+        bounds = [None if e is None else _index_item(api, e) for e in (expr.begin_index, expr.end_index, expr.stride)]
+        if any(not (b is None or b is DYNAMIC or isinstance(b, int)) for b in bounds):
+            return _missing
+        return slice(*bounds)
+    typ = api.lookup_type_or_none(expr)
+    if typ is None:
+        return _missing
+    typ = get_proper_type(typ)
+    value = extract_int(api, typ, expr)
+    if value is not _missing:
+        return value
+    if isinstance(typ, Instance) and typ.type.fullname == "builtins.int":
+        return DYNAMIC
+    if isinstance(expr, ListExpr):
+        values = extract_ints(api, typ, expr)
+        return _missing if values is _missing else TensorIndex((FixedDim(len(values)),), False)
+    x = extract_tensor(api, typ, expr)
+    if x is _missing:
+        return _missing
+    if not x.dtype & ~_MASKS:
+        return TensorIndex(x.dims, True)
+    if not x.dtype & ~_INDICES:
+        return TensorIndex(x.dims, False)
+    if not x.dtype & (_MASKS | _INDICES):
+        raise ShapeError("tensors used as indices must be long, int, byte or bool tensors")
+    return _missing
+
+@register_method_hook(f"{array_family}.__getitem__")
+def handle_getitem(ctx: MethodContext) -> Type:
+    x = extract_tensor(ctx.api, get_proper_type(ctx.type), None)
+    if x is _missing or not isinstance(ctx.api, TypeChecker) or not ctx.args or len(ctx.args[0]) != 1:
+        return ctx.default_return_type
+    expr = ctx.args[0][0]
+    try:
+        items = [_index_item(ctx.api, item) for item in (expr.items if isinstance(expr, TupleExpr) else [expr])]
+        if any(item is _missing for item in items):
+            return ctx.default_return_type
+        dims = SHAPE_FUNCTIONS["index"](x.dims, items)
+    except Unknown:
+        return ctx.default_return_type
+    except ShapeError as e:
+        ctx.api.fail(f"Shape mismatch in Tensor.__getitem__: {e}", ctx.context)
+        return ctx.default_return_type
+    try:
+        layout = LAYOUT_FUNCTIONS["index"](dims, x.dims, x.layout, items)
+    except Unknown:
+        layout = None
+    return with_layout(ctx.api, construct_instance_from_mask(ctx.api, x.dtype, x.backend, dims), layout)
+
+
+_start = time.perf_counter()
+FUNCTION_RULES, METHOD_RULES = compile_rules()
+for _name, _hook in FUNCTION_RULES.items():
+    register_function_hook(_name)(_hook)
+for _name, _hook in METHOD_RULES.items():
+    register_method_hook(_name)(_hook)
+# The rules harvested from torch (harvested_rules.py), for the ops without a hook of their own.
+_functions, _methods = compile_rules(HARVESTED_RULES)
+HARVESTED_FUNCTION_RULES = {name: hook for name, hook in _functions.items() if name not in FUNCTION_HOOKS}
+HARVESTED_METHOD_RULES = {name: hook for name, hook in _methods.items() if name not in METHOD_HOOKS}
+for _name, _hook in HARVESTED_FUNCTION_RULES.items():
+    register_function_hook(_name)(_hook)
+for _name, _hook in HARVESTED_METHOD_RULES.items():
+    register_method_hook(_name)(_hook)
+COMPILE_SECONDS = time.perf_counter() - _start
@@ -2,10 +2,14 @@
 
 from dataclasses import dataclass
 import enum
-from typing import List, Any, Union, Optional
-from mypy.types import Instance, TupleType, Type, UnboundType, LiteralType, EllipsisType, RawExpressionType, UnionType, TypeStrVisitor
+import functools
+from typing import List, Any, Union, Optional, Dict, Tuple, Sequence, NamedTuple
+from mypy.types import ExtraAttrs, Instance, TupleType, Type, UnboundType, LiteralType, EllipsisType, RawExpressionType, UnionType, TypeStrVisitor, get_proper_type
 from mypy.plugin import TypeAnalyzerPluginInterface
-from jaxtyping._array_types import _DimType
+
+from myshaping import promotion_table
+from myshaping.stats import STATS
+from myshaping.symbolic import Poly, parse_symbolic
 
 union_mapper = {
     "UInt": ["UInt2", "UInt4", "UInt8", "UInt16", "UInt32", "UInt64"],
@@ -18,22 +22,119 @@ union_mapper = {
     "Num": ["Float", "Complex", "UInt", "Int"],
 }
 
-"""Order of dtypes.
-1. Kind: {bool} < {integral dypes} < {floating point dtypes}
-2. Width
-3. Prefer Float16: BFloat16 < Float16
-4. Prefer Unsigned
+"""Dtype sets.
+A category dtype such as "Float" is carried as a single type, and expanded to a bitmask
+over concrete_dtypes only when two operands have to be promoted.
 """
-dtype_orders = [
-    "Bool",
-    "Int2", "UInt2",
-    "Int4", "UInt4",
-    "Int8", "UInt8",
-    "Int16", "UInt16",
-    "Int32", "UInt32",
-    "Int64", "UInt64",
-    "BFloat16", "Float16", "Float32", "Float64"
-]
+concrete_dtypes = promotion_table.DTYPES
+
+def _expand_mask(dtype: str) -> int:
+    if dtype in union_mapper:
+        return functools.reduce(lambda acc, member: acc | _expand_mask(member), union_mapper[dtype], 0)
+    return 1 << concrete_dtypes.index(dtype)
+
+dtype_masks = {dtype: _expand_mask(dtype) for dtype in [*concrete_dtypes, *union_mapper]}
+mask_to_dtype = {mask: dtype for dtype, mask in dtype_masks.items()}
+
+def dtype_set_names(mask: int) -> List[str]:
+    """Decompose a dtype set into as few dtype names as possible, e.g. Float|Int64."""
+    names = []
+    for dtype in sorted(union_mapper, key=lambda d: -bin(dtype_masks[d]).count("1")):
+        category = dtype_masks[dtype]
+        if mask & category == category:
+            names.append(dtype)
+            mask &= ~category
+    names.extend(d for d in concrete_dtypes if mask & dtype_masks[d])
+    return names
+
+def repr_dtype_set(mask: int) -> str:
+    return "|".join(dtype_set_names(mask))
+
+def _members(mask: int) -> List[str]:
+    return [d for d in concrete_dtypes if mask & dtype_masks[d]]
+
+"""Dtype promotion, looked up in the tables generated from torch and numpy (see promotion_table.py).
+`numpy=True` selects numpy's rules, for operations between numpy arrays."""
+_dtype_index = {dtype: i for i, dtype in enumerate(concrete_dtypes)}
+_decode = {c: concrete_dtypes[i] for i, c in enumerate(promotion_table.ALPHABET[:len(concrete_dtypes)])}
+_n_dtypes = len(concrete_dtypes)
+
+scalar_kinds = {
+    "builtins.bool": "bool",
+    "builtins.int": "int",
+    "builtins.float": "float",
+    "builtins.complex": "complex",
+}
+
+def promote_dtypes(x: str, y: str, numpy: bool = False) -> Optional[str]:
+    """Return the dtype of `x <op> y`, or None if torch refuses to promote them."""
+    table = promotion_table.NUMPY_PROMOTION if numpy else promotion_table.PROMOTION
+    return _decode.get(table[_dtype_index[x] * _n_dtypes + _dtype_index[y]])
+
+def promote_scalar(x: str, kind: str, numpy: bool = False) -> Optional[str]:
+    """Return the dtype of `x <op> scalar` for a Python scalar kind ("bool", "int", "float", "complex")."""
+    table = promotion_table.NUMPY_SCALAR_PROMOTION if numpy else promotion_table.SCALAR_PROMOTION
+    return _decode.get(table[kind][_dtype_index[x]])
+
+def safe_cast(x: str, z: str) -> bool:
+    """Whether every value of dtype x is exactly representable in dtype z."""
+    return promotion_table.SAFE_CAST[_dtype_index[x] * _n_dtypes + _dtype_index[z]] == "1"
+
+def can_cast(x: str, z: str, numpy: bool = False) -> bool:
+    """Whether a z result may be written into an x tensor in-place."""
+    table = promotion_table.NUMPY_CAN_CAST if numpy else promotion_table.CAN_CAST
+    return table[_dtype_index[z] * _n_dtypes + _dtype_index[x]] == "1"
+
+class Promotion(NamedTuple):
+    dtype: int  # set of result dtypes
+    self_converted: bool  # self is converted in every combination
+    other_converted: bool  # other is converted in every combination
+    lossy: bool  # some combination loses precision
+
+@functools.lru_cache(maxsize=None)
+def promote_dtype_sets(x_mask: int, y_mask: Union[int, str], numpy: bool = False) -> Optional[Promotion]:
+    """Promote every combination of dtypes in x_mask and y_mask (a scalar kind for y is accepted too).
+
+    Return None if no combination is compatible.
+    Incompatible combinations are skipped as long as another one is valid.
+    """
+    z_mask = 0
+    x_converted = y_converted = True
+    lossy = False
+    for x in _members(x_mask):
+        for y in ([y_mask] if isinstance(y_mask, str) else _members(y_mask)):
+            z = promote_scalar(x, y, numpy) if y in promotion_table.SCALAR_PROMOTION else promote_dtypes(x, y, numpy)
+            if z is None:
+                continue
+            z_mask |= dtype_masks[z]
+            x_converted = x_converted and z != x
+            y_converted = y_converted and z != y
+            lossy = lossy or not safe_cast(x, z) or (y in dtype_masks and not safe_cast(y, z))
+    if z_mask == 0:
+        return None
+    return Promotion(z_mask, x_converted, y_converted, lossy)
+
+@functools.lru_cache(maxsize=None)
+def update_dtype_sets(x_mask: int, y_mask: Union[int, str], numpy: bool = False) -> Optional[Promotion]:
+    """Check `x <op>= y`, where the promoted result is written back into x.
+
+    Return None if no combination can be written back.
+    """
+    x_converted = y_converted = True
+    lossy = False
+    valid = False
+    for x in _members(x_mask):
+        for y in ([y_mask] if isinstance(y_mask, str) else _members(y_mask)):
+            z = promote_scalar(x, y, numpy) if y in promotion_table.SCALAR_PROMOTION else promote_dtypes(x, y, numpy)
+            if z is None or not can_cast(x, z, numpy):
+                continue
+            valid = True
+            x_converted = x_converted and z != x
+            y_converted = y_converted and y != x
+            lossy = lossy or not safe_cast(z, x)
+    if not valid:
+        return None
+    return Promotion(x_mask, x_converted, y_converted, lossy)
 
 class _DimType(enum.Enum):
     named = enum.auto()
@@ -59,7 +160,7 @@ class NamedVariadicDim:
     name: str
     broadcastable: bool
     def __repr__(self):
-        return f"*{self.name}"
+        return ("#" if self.broadcastable else "") + f"*{self.name}"
 @dataclass(frozen=True)
 class FixedDim:
     size: int
@@ -67,10 +168,10 @@ class FixedDim:
         return str(self.size)
 @dataclass(frozen=True)
 class SymbolicDim:
-    elem: Any
+    elem: Poly
     broadcastable: bool
     def __repr__(self):
-        return str(self.elem)
+        return ("#" if self.broadcastable else "") + str(self.elem)
 
 AbstractDimOrVariadicDim = Union[
     AnonymousDim,
@@ -93,21 +194,147 @@ VariadicDim = Union[
     NamedVariadicDim,
 ]
 
+# (dtype, backend, canonical dim_str) -> interned jaxtyping type
+_instances: Dict[Tuple[str, Type, str], Type] = {}
+# module -> canonical dim_str -> the spelling it is written with there, e.g. "3 4" -> "rows=3 cols=4",
+# or the canonical form itself once two different spellings are seen ("2*c" and "c+c"),
+# so that messages never show a spelling the user didn't write in that module.
+_spellings: Dict[str, Dict[str, str]] = {}
+# module -> how many times its spellings changed, which keys the messages memoized there
+_spelling_versions: Dict[str, int] = {}
+
+def _current_module(api) -> str:
+    """The module that api (a TypeAnalyser or a TypeChecker) is working on."""
+    tree = getattr(api, "tree", None)
+    if tree is not None:
+        return tree.fullname
+    return getattr(getattr(api, "api", None), "cur_mod_id", "")
+
+def canonical_dimstr(dim_str: str) -> str:
+    """Return the canonical spelling of dim_str, e.g. "rows=3 cols=4" -> "3 4"."""
+    try:
+        return dump_dims(parse_dimstr(None, dim_str))
+    except (ValueError, NotImplementedError):
+        return dim_str
+
+def record_spelling(api: TypeAnalyzerPluginInterface, dim_str: str) -> None:
+    """Record that dim_str is written in an annotation of the module api is analyzing.
+
+    Only annotations are recorded: shapes that hooks build (e.g. the result of x.double())
+    are not spellings the user wrote.
+    """
+    canonical = canonical_dimstr(dim_str)
+    spellings = _spellings.setdefault(_current_module(api), {})
+    spelling = spellings.get(canonical)
+    if spelling is None:
+        spellings[canonical] = dim_str
+    elif spelling != dim_str and spelling != canonical:
+        spellings[canonical] = canonical
+    else:
+        return
+    module = _current_module(api)
+    _spelling_versions[module] = _spelling_versions.get(module, 0) + 1
+
+def spelling_version(module: str) -> int:
+    """A number that changes whenever the spellings recorded for module do."""
+    return _spelling_versions.get(module, 0)
+
 def construct_instance(api: TypeAnalyzerPluginInterface, dtype: str, backend: Type, dim_str: str) -> Type:
-    """Construct an Instance of a jaxtyping type with the given dtype, backend, and shape."""
-    if dtype in union_mapper:
-        items = [
-            Instance(
-                api.named_type(f"jaxtyping.{dtype}").type,
-                [backend, LiteralType(value=dim_str, fallback=api.named_type("builtins.str"))]
-            )
-            for dtype in union_mapper[dtype]
-        ]
-        return UnionType(items)
-    return Instance(
+    """Construct an Instance of a jaxtyping type with the given dtype, backend, and shape.
+
+    Equivalent shapes are canonicalized, and the resulting types are interned.
+    """
+    return _intern_instance(api, dtype, backend, canonical_dimstr(dim_str))
+
+def construct_instance_from_dims(api: TypeAnalyzerPluginInterface, dtype: str, backend: Type, dims: Sequence[AbstractDimOrVariadicDim]) -> Type:
+    """Same as construct_instance, but from already parsed dims."""
+    canonical = dump_dims(dims)
+    if canonical not in _parse_cache:
+        _parse_cache[canonical] = tuple(_interned_dims.setdefault(d, d) for d in dims)
+    return _intern_instance(api, dtype, backend, canonical)
+
+def construct_instance_from_mask(api: TypeAnalyzerPluginInterface, mask: int, backend: Type, dims: Sequence[AbstractDimOrVariadicDim]) -> Type:
+    """Construct a jaxtyping type for a set of dtypes.
+
+    A set matching a single dtype or a category is a single Instance, otherwise a Union.
+    """
+    if mask in mask_to_dtype:
+        return construct_instance_from_dims(api, mask_to_dtype[mask], backend, dims)
+    return UnionType([
+        construct_instance_from_dims(api, dtype, backend, dims)
+        for dtype in dtype_set_names(mask)
+    ])
+
+def _intern_instance(api: TypeAnalyzerPluginInterface, dtype: str, backend: Type, canonical: str) -> Type:
+    key = (dtype, backend, canonical)
+    typ = _instances.get(key)
+    if typ is not None:
+        STATS["construct_instance.hit"] += 1
+        return typ
+    STATS["construct_instance.miss"] += 1
+    typ = Instance(
         api.named_type(f"jaxtyping.{dtype}").type,
-        [backend, LiteralType(value=dim_str, fallback=api.named_type("builtins.str"))]
+        [backend, LiteralType(value=canonical, fallback=api.named_type("builtins.str"))]
     )
+    if isinstance(backend, Instance) and backend.type.fullname == "torch._tensor.Tensor":
+        typ.extra_attrs = _BUILT
+    _instances[key] = typ
+    return typ
+
+"""What the plugin tracks about a torch tensor beyond its type: its device (see devices.py)
+and its memory layout (see layouts.py). They are kept in the extra attributes of the backend
+Instance, which mypy ignores in subtype checks, so that `x = x.cuda()` is not an incompatible
+assignment. The jaxtyping Instances the plugin builds carry the (empty) _BUILT extra attributes: mypy narrows a variable to the
+type assigned to it when both have them, and types that mypy builds itself, such as joins,
+lack them, so what they track is unknown. The keys are not identifiers, so they can't
+shadow a real attribute.
+"""
+DEVICE = "myshaping.device"
+LAYOUT = "myshaping.layout"
+_BUILT = ExtraAttrs({}, set())
+
+def _tracked(typ: Type, key: str) -> Optional[str]:
+    if not isinstance(typ, Instance) or typ.extra_attrs != _BUILT or not typ.args:
+        return None
+    backend = typ.args[0]
+    value = backend.extra_attrs.attrs.get(key) if isinstance(backend, Instance) and backend.extra_attrs else None
+    return value.value if isinstance(value, LiteralType) and isinstance(value.value, str) else None
+
+def with_tracked(api, typ: Type, key: str, value: Optional[str]) -> Type:
+    """typ, a jaxtyping Instance or a Union of them, with value tracked under key (None: unknown)."""
+    if isinstance(typ, UnionType):
+        return UnionType([with_tracked(api, item, key, value) for item in typ.items])
+    if not isinstance(typ, Instance) or typ.extra_attrs != _BUILT:
+        return typ
+    dtype, backend, dim_str = decompose_instance(typ)
+    attrs = dict(backend.extra_attrs.attrs) if backend.extra_attrs else {}
+    if value is None:
+        attrs.pop(key, None)
+    else:
+        attrs[key] = LiteralType(value=value, fallback=api.named_type("builtins.str"))
+    backend = backend.copy_modified()
+    backend.extra_attrs = ExtraAttrs(attrs, set()) if attrs else None
+    return _intern_instance(api, dtype, backend, dim_str)
+
+def tracked(typ: Type, key: str) -> Optional[str]:
+    """What the plugin tracks under key about a jaxtyping type, if known (the same for every
+    member of a Union)."""
+    values = {_tracked(item, key) for item in (typ.items if isinstance(typ, UnionType) else [typ])}
+    return values.pop() if len(values) == 1 else None
+
+def device_of(typ: Type) -> Optional[str]:
+    """The device of a jaxtyping type, if known."""
+    return tracked(typ, DEVICE)
+
+def with_device(api, typ: Type, device: Optional[str]) -> Type:
+    """typ, a jaxtyping Instance or a Union of them, on device (None: any device)."""
+    return with_tracked(api, typ, DEVICE, device)
+
+NDARRAY = "numpy.ndarray"
+
+def is_numpy(backend: Instance) -> bool:
+    """Whether a backend is numpy's array, whose dtypes follow numpy's promotion rules."""
+    return backend.type.fullname == NDARRAY
 
 def decompose_instance(typ: Instance):
     assert typ.type.fullname.startswith("jaxtyping._array_types")
@@ -116,7 +343,62 @@ def decompose_instance(typ: Instance):
     shape: LiteralType = typ.args[1]
     return dtype, backend, shape.value
 
-def parse_dimstr(api: TypeAnalyzerPluginInterface, dim_str: str) -> List[AbstractDimOrVariadicDim]:
+def decompose_dtype_set(typ: Type) -> Optional[Tuple[int, Instance, str]]:
+    """Decompose a jaxtyping Instance, or a Union of them sharing backend and shape,
+    into (dtype set, backend, dim_str). Return None for anything else."""
+    typ = get_proper_type(typ)  # a shape alias, T = Float[Tensor, "n"]
+    items = typ.items if isinstance(typ, UnionType) else [typ]
+    mask = 0
+    backend = dim_str = None
+    for item in items:
+        if not (isinstance(item, Instance) and item.type.fullname.startswith("jaxtyping._array_types")
+                and len(item.args) == 2 and isinstance(item.args[1], LiteralType)):
+            return None
+        dtype, item_backend, item_dim_str = decompose_instance(item)
+        if dtype not in dtype_masks:
+            return None
+        if backend is not None and (item_backend != backend or item_dim_str != dim_str):
+            return None
+        mask |= dtype_masks[dtype]
+        backend, dim_str = item_backend, item_dim_str
+    if backend is None:
+        return None
+    return mask, backend, dim_str
+
+Dims = Tuple[AbstractDimOrVariadicDim, ...]
+
+_parse_cache: Dict[str, Dims] = {}
+_parse_errors: Dict[str, Tuple[type, str]] = {}  # dim_str -> (exception class, message)
+_interned_dims: Dict[AbstractDimOrVariadicDim, AbstractDimOrVariadicDim] = {}
+
+def parse_dimstr(api: Optional[TypeAnalyzerPluginInterface], dim_str: str) -> Dims:
+    """Parse dim_str into an immutable tuple of dims.
+
+    Results (and parse errors) are memoized per dim_str, and each dim is interned,
+    so that equal shapes share the same objects.
+    """
+    dims = _parse_cache.get(dim_str)
+    if dims is not None:
+        STATS["parse_dimstr.hit"] += 1
+        return dims
+    error = _parse_errors.get(dim_str)
+    if error is not None:
+        STATS["parse_dimstr.hit"] += 1
+        raise error[0](error[1])
+    STATS["parse_dimstr.miss"] += 1
+    try:
+        dims = tuple(_interned_dims.setdefault(d, d) for d in _parse_dimstr(dim_str))
+    except (ValueError, NotImplementedError) as e:
+        _parse_errors[dim_str] = (type(e), str(e))
+        raise
+    _parse_cache[dim_str] = dims
+    return dims
+
+def parse_cache_info() -> Tuple[int, int, int]:
+    """Return (hits, misses, currsize) of the parse_dimstr cache."""
+    return STATS["parse_dimstr.hit"], STATS["parse_dimstr.miss"], len(_parse_cache) + len(_parse_errors)
+
+def _parse_dimstr(dim_str: str) -> List[AbstractDimOrVariadicDim]:
     # Copied from jaxtyping/_array_types.py and modified to mypy languages.
     dims: List[AbstractDimOrVariadicDim] = []
     index_variadic = None
@@ -260,28 +542,59 @@ def parse_dimstr(api: TypeAnalyzerPluginInterface, dim_str: str) -> List[Abstrac
                     "Cannot have a symbolic axis with tree-path dependence, e.g. "
                     "`?foo+bar` is not allowed"
                 )
-            raise NotImplementedError("Symbolic axes are not supported yet")
-            # elem = SymbolicDim(elem, broadcastable)
+            poly = parse_symbolic(elem)
+            if poly.constant is not None and poly.constant < 0:
+                raise ValueError(f"Axis size can't be negative: {elem}")
+            parsed = dim_from_poly(poly, broadcastable)
         dims.append(parsed)
     return dims
 
-def dump_dims(dims: List[AbstractDimOrVariadicDim]) -> str:
+def dim_from_poly(poly: Poly, broadcastable: bool = False) -> AbstractDim:
+    """The simplest dim for a symbolic axis, e.g. "2*3" is FixedDim(6) and "n+0" is NamedDim("n")."""
+    if poly.constant is not None:
+        return FixedDim(poly.constant)
+    if poly.variable is not None:
+        return NamedDim(poly.variable, broadcastable=broadcastable)
+    return SymbolicDim(poly, broadcastable)
+
+def dump_dims(dims: Sequence[AbstractDimOrVariadicDim]) -> str:
     result = [str(d) for d in dims]
     return " ".join(result)
 
-def repr_instance(typ: Instance, options):
+def repr_instance(typ: Instance, module: str = ""):
+    """Format typ with the shape spelled as in module."""
     assert typ.type.fullname.startswith("jaxtyping._array_types")
-    visitor = TypeStrVisitor(options=options)
     dtype = typ.type.fullname.split(".")[-1]
     backend: Instance = typ.args[0]
     shape: LiteralType = typ.args[1]
-    result = f"{dtype}[{backend}, '{shape.value}']"
+    result = f"{dtype}[{backend}, '{_spellings.get(module, {}).get(shape.value, shape.value)}']"
+    device = _tracked(typ, DEVICE)
+    if device is not None:
+        result += f" on {device}"
+    layout = _tracked(typ, LAYOUT)
+    if layout is not None and layout != "contiguous":
+        result += f" strides {layout}"
     return result
 
 
+def repr_operand(typ: Type, api) -> str:
+    """repr_instance for jaxtyping types, in the module api is checking, and the usual mypy
+    formatting for anything else."""
+    typ = get_proper_type(typ)
+    if isinstance(typ, Instance) and typ.type.fullname.startswith("jaxtyping._array_types"):
+        return repr_instance(typ, _current_module(api))
+    return typ.accept(TypeStrVisitor(options=api.msg.options))
+
+def scalar_kind(typ: Type) -> Optional[str]:
+    """Return "bool", "int", "float" or "complex" for Python scalar types."""
+    if isinstance(typ, Instance):
+        return scalar_kinds.get(typ.type.fullname)
+    return None
+
+
 def check_shape_compatibility(
-    xs: List[AbstractDimOrVariadicDim],
-    ys: List[AbstractDimOrVariadicDim],
+    xs: Sequence[AbstractDimOrVariadicDim],
+    ys: Sequence[AbstractDimOrVariadicDim],
     allow_broadcast: bool,
 ) -> Optional[List[AbstractDimOrVariadicDim]]:
     """Check compatibility between xs and ys.
@@ -295,7 +608,7 @@ def check_shape_compatibility(
             return None
         # dim expansion
         assert len(xs) > len(ys)
-        ys = [FixedDim(1)] * (max(len(xs), len(ys)) - len(ys)) + ys
+        ys = [FixedDim(1)] * (max(len(xs), len(ys)) - len(ys)) + list(ys)
     
     assert len(xs) == len(ys)
     zs: List[AbstractDimOrVariadicDim] = []
@@ -353,25 +666,27 @@ def check_shape_compatibility(
                     return None
     return zs
 
-def compare_dtype(x: str, y: str) -> Optional[int]:
-    """Compare dtypes.
-    if x < y (x will be promoted to y), return 1
-    if x > y, return -1
-    if x == y, return 0
-    if x and y is incompatible, return None
+def broadcast_growth(
+    zs: Sequence[AbstractDimOrVariadicDim],
+    xs: Sequence[AbstractDimOrVariadicDim],
+) -> Optional[Tuple[int, List[AbstractDim]]]:
+    """How many times more elements zs, the broadcast of xs with other shapes, has than xs:
+    the product of the fixed dims xs broadcast along, and the other dims it broadcasts along.
+    None if a variadic or anonymous dim makes it unknown.
     """
-    if x in dtype_orders and y in dtype_orders:
-        # promotable
-        x_rank = dtype_orders.index(x)
-        y_rank = dtype_orders.index(y)
-        if x_rank < y_rank:
-            return 1
-        elif x_rank > y_rank:
-            return -1
-        else:
-            return 0
-    else:
-        if x == y:
-            return 0
-        else:
+    if len(xs) > len(zs):
+        return None
+    factor = 1
+    symbolic: List[AbstractDim] = []
+    for z, x in zip(zs, [FixedDim(1)] * (len(zs) - len(xs)) + list(xs)):
+        if isinstance(z, VariadicDim) or isinstance(x, VariadicDim) or isinstance(x, AnonymousDim):
             return None
+        if x != FixedDim(1) or z == FixedDim(1):
+            continue
+        if isinstance(z, FixedDim):
+            factor *= z.size
+        elif isinstance(z, AnonymousDim):
+            return None
+        else:
+            symbolic.append(z)
+    return factor, symbolic
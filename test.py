@@ -1,5 +1,5 @@
 from typing import Literal, Any
-from jaxtyping import Float, Float32
+from jaxtyping import Float, Float32, Int8, Int32, UInt8
 from torch import Tensor
 import torch
 
@@ -37,4 +37,22 @@ x32 += x64.float()  # safe
 f(torch.randn(3, 224, 224))  # Correct usage
 f(torch.randn(1, 224, 224))  # Incorrect usage, should be (3, 224, 224)
 
-g(torch.randn(3, 224, 224))  # Correct usage
\ No newline at end of file
+g(torch.randn(3, 224, 224))  # Correct usage
+
+def h(x: Float32[Tensor, "n 2*c"], y: Float32[Tensor, "n c+c"], z: Float32[Tensor, "n c+1"]):
+    x + y  # safe: symbolic axes are compared in canonical form
+    x + z  # fail: shape mismatch
+
+def matmul(x: Float32[Tensor, "b n"], y: Float32[Tensor, "n m"]) -> Float32[Tensor, "b m"]: ...  # type: ignore[empty-body]
+
+reveal_jaxtype(matmul(torch.randn(2, 3), torch.randn(3, 4)))  # Float32[Tensor, "2 4"]
+matmul(torch.randn(2, 3), torch.randn(4, 4))  # fail: n is bound to 3 by x
+
+reveal_jaxtype(torch.cat([x32, x32]).view(1, -1).transpose(0, 1))  # Float32[Tensor, "2 1"]
+torch.randn(2, 3) @ torch.randn(2, 3)  # fail: shapes cannot be multiplied
+
+def promote(u: UInt8[Tensor, "3"], i: Int8[Tensor, "3"], a: Float32[Tensor, "3"], b: Int32[Tensor, "3"], v: Float32[Tensor, "... n"]):
+    reveal_jaxtype(u + i)  # Int16[Tensor, "3"]
+    reveal_jaxtype(a + b)  # Float32[Tensor, "3"]
+    reveal_jaxtype(b + a)  # Float32[Tensor, "3"]
+    reveal_jaxtype(v * 2)  # Float32[Tensor, "... n"]: a scalar leaves the shape as is
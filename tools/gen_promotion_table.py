@@ -0,0 +1,218 @@
+"""Generate myshaping/promotion_table.py from torch's and numpy's dtype promotion rules.
+
+Usage: python tools/gen_promotion_table.py  (needs torch and numpy; run on CPU)
+"""
+
+import math
+import os
+import re
+import string
+
+import numpy as np
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT = os.path.join(ROOT, "myshaping", "promotion_table.py")
+
+ALPHABET = string.digits + string.ascii_letters
+
+# jaxtyping dtype -> torch dtype name (None: not available in torch)
+TORCH_DTYPES = {
+    "Bool": "bool",
+    "UInt2": "uint2", "UInt4": "uint4", "UInt8": "uint8", "UInt16": "uint16", "UInt32": "uint32", "UInt64": "uint64",
+    "Int2": "int2", "Int4": "int4", "Int8": "int8", "Int16": "int16", "Int32": "int32", "Int64": "int64",
+    "Float8e4m3b11fnuz": None,
+    "Float8e4m3fn": "float8_e4m3fn", "Float8e4m3fnuz": "float8_e4m3fnuz",
+    "Float8e5m2": "float8_e5m2", "Float8e5m2fnuz": "float8_e5m2fnuz",
+    "BFloat16": "bfloat16", "Float16": "float16", "Float32": "float32", "Float64": "float64",
+    "Complex64": "complex64", "Complex128": "complex128",
+}
+DTYPES = list(TORCH_DTYPES)
+# dtype torch lacks -> a torch dtype of the same kind, whose promotion with a Python scalar it
+# shares: a scalar doesn't change the dtype of a tensor of its kind or above.
+SCALAR_STAND_INS = {"Float8e4m3b11fnuz": "Float8e4m3fnuz"}
+# jaxtyping dtype -> numpy dtype name, for the dtypes numpy has
+NUMPY_DTYPES = {
+    "Bool": "bool", "UInt8": "uint8", "UInt16": "uint16", "UInt32": "uint32", "UInt64": "uint64",
+    "Int8": "int8", "Int16": "int16", "Int32": "int32", "Int64": "int64",
+    "Float16": "float16", "Float32": "float32", "Float64": "float64", "Complex64": "complex64", "Complex128": "complex128",
+}
+SCALARS = {"bool": True, "int": 1, "float": 1.0, "complex": 1j}
+
+
+def torch_dtype(name):
+    attr = TORCH_DTYPES[name]
+    return getattr(torch, attr, None) if attr else None
+
+def from_torch(dtype):
+    for name in DTYPES:
+        if torch_dtype(name) == dtype:
+            return name
+    return None
+
+def promote(x, y):
+    if x == y:
+        return x
+    tx, ty = torch_dtype(x), torch_dtype(y)
+    if tx is None or ty is None:
+        return None
+    try:
+        return from_torch(torch.promote_types(tx, ty))
+    except RuntimeError:
+        return None
+
+def int_range(name):
+    signed, bits = re.fullmatch(r"(U?)Int(\d+)", name).groups()
+    bits = int(bits)
+    if signed == "U":
+        return 0, 2 ** bits - 1
+    return -(2 ** (bits - 1)), 2 ** (bits - 1) - 1
+
+def float_info(name):
+    if name.startswith("Complex"):
+        name = {"Complex64": "Float32", "Complex128": "Float64"}[name]
+    info = torch.finfo(torch_dtype(name))
+    return round(-math.log2(info.eps)), info.max
+
+def representable(a, z):
+    """Whether every value of dtype a is representable in dtype z."""
+    if a == z or a == "Bool":
+        return True
+    if z == "Bool" or torch_dtype(a) is None or torch_dtype(z) is None:
+        return False
+    if "Int" in a and "Int" in z:
+        a_min, a_max = int_range(a)
+        z_min, z_max = int_range(z)
+        return z_min <= a_min and a_max <= z_max
+    if "Int" in z:
+        return False
+    if a.startswith("Complex") and not z.startswith("Complex"):
+        return False
+    z_nmant, z_max = float_info(z)
+    if "Int" in a:
+        a_min, a_max = int_range(a)
+        return max(abs(a_min), a_max).bit_length() <= z_nmant + 1
+    a_nmant, a_max = float_info(a)
+    return a_nmant <= z_nmant and a_max <= z_max
+
+def can_cast(a, z):
+    if a == z:
+        return True
+    ta, tz = torch_dtype(a), torch_dtype(z)
+    if ta is None or tz is None:
+        return False
+    return torch.can_cast(ta, tz)
+
+def scalar_promotion(scalar):
+    result = []
+    for x in DTYPES:
+        stand_in = SCALAR_STAND_INS.get(x, x)
+        if torch_dtype(stand_in) is None:
+            result.append("-")
+            continue
+        try:
+            z = from_torch(torch.result_type(torch.empty(0, dtype=torch_dtype(stand_in)), scalar))
+        except (RuntimeError, TypeError):
+            z = None
+        if z == stand_in:
+            z = x
+        result.append("-" if z is None else ALPHABET[DTYPES.index(z)])
+    return "".join(result)
+
+def numpy_dtype(name):
+    attr = NUMPY_DTYPES.get(name)
+    return np.dtype(attr) if attr else None
+
+def from_numpy(dtype):
+    for name in NUMPY_DTYPES:
+        if numpy_dtype(name) == dtype:
+            return name
+    return None
+
+def numpy_promote(x, y):
+    nx, ny = numpy_dtype(x), numpy_dtype(y)
+    if nx is None or ny is None:
+        return None
+    return from_numpy(np.promote_types(nx, ny))
+
+def numpy_can_cast(a, z):
+    """Whether a z result can be written into a numpy array of dtype a (`a += ...` casts same_kind)."""
+    na, nz = numpy_dtype(a), numpy_dtype(z)
+    return na is not None and nz is not None and bool(np.can_cast(nz, na, "same_kind"))
+
+def numpy_scalar_promotion(scalar):
+    result = []
+    for x in DTYPES:
+        nx = numpy_dtype(x)
+        z = from_numpy(np.result_type(np.empty(0, dtype=nx), scalar)) if nx is not None else None
+        result.append("-" if z is None else ALPHABET[DTYPES.index(z)])
+    return "".join(result)
+
+def main():
+    promotion, safe_cast, can_cast_, numpy_promotion, numpy_can_cast_ = [], [], [], [], []
+    for x in DTYPES:
+        for y in DTYPES:
+            z = promote(x, y)
+            promotion.append("-" if z is None else ALPHABET[DTYPES.index(z)])
+            safe_cast.append("1" if representable(x, y) else "0")
+            can_cast_.append("1" if can_cast(x, y) else "0")
+            z = numpy_promote(x, y)
+            numpy_promotion.append("-" if z is None else ALPHABET[DTYPES.index(z)])
+            numpy_can_cast_.append("1" if numpy_can_cast(y, x) else "0")
+    n = len(DTYPES)
+    def rows(table):
+        table = "".join(table)
+        return "\n".join(f'    "{table[i * n:(i + 1) * n]}"  # {DTYPES[i]}' for i in range(n))
+    version = torch.__version__.split("+")[0]
+    with open(OUTPUT, "w") as f:
+        f.write(f'''"""Dtype promotion rules of torch {version} and numpy {np.__version__}.
+
+Generated by tools/gen_promotion_table.py. Do not edit.
+Row i, column j of each table is for (DTYPES[i], DTYPES[j]).
+"""
+
+TORCH_VERSION = "{version}"
+NUMPY_VERSION = "{np.__version__}"
+
+DTYPES = {DTYPES!r}
+
+# Index of the promoted dtype in ALPHABET, or "-" if torch refuses to promote.
+ALPHABET = "{ALPHABET}"
+PROMOTION = (
+{rows(promotion)}
+)
+
+# "1" if every value of DTYPES[i] is exactly representable in DTYPES[j].
+SAFE_CAST = (
+{rows(safe_cast)}
+)
+
+# "1" if a DTYPES[i] result can be written into a DTYPES[j] tensor in-place.
+CAN_CAST = (
+{rows(can_cast_)}
+)
+
+# Python scalar kind -> dtype of `tensor <op> scalar` for each tensor dtype.
+SCALAR_PROMOTION = {{
+''')
+        for kind, scalar in SCALARS.items():
+            f.write(f'    "{kind}": "{scalar_promotion(scalar)}",\n')
+        f.write(f'''}}
+
+# The same for numpy arrays, "-" where numpy has no such dtype.
+NUMPY_PROMOTION = (
+{rows(numpy_promotion)}
+)
+
+NUMPY_CAN_CAST = (
+{rows(numpy_can_cast_)}
+)
+
+NUMPY_SCALAR_PROMOTION = {{
+''')
+        for kind, scalar in SCALARS.items():
+            f.write(f'    "{kind}": "{numpy_scalar_promotion(scalar)}",\n')
+        f.write("}\n")
+
+if __name__ == "__main__":
+    main()
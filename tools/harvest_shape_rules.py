@@ -0,0 +1,237 @@
+"""Harvest shape rules of torch ops from meta tensors into myshaping/harvested_rules.py.
+
+Every native op of the torch namespace and of Tensor (torch._C._VariableFunctions and
+torch._C.TensorBase) without a hook of its own is called on meta tensors, which have a
+shape and a dtype but no data, over a grid of shapes, dtypes and arguments. Each of
+TEMPLATES is tried in turn: the first whose rule infers the shape, the dtype and the
+contiguity of every call that torch accepts, where torch accepts every float32 call,
+becomes the rule of the op. The shape functions of the rules work on named dims as well.
+In-place ops (add_, ...) are left out.
+
+The rules are written to myshaping/harvested_rules.py with the torch version, and with the
+coverage of the native ops, which is kept for every torch version the tool has run with.
+torch_rule_hooks compiles them next to shape_rules.py, without importing torch. The bundled
+stubs of torch and of jaxtyping's arrays get a block declaring the harvested ops, after the
+ops of shape_rules.py.
+
+Usage: python tools/harvest_shape_rules.py [-v]  (needs torch; runs on CPU)
+"""
+
+import argparse
+import builtins
+import os
+import sys
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT = os.path.join(ROOT, "myshaping", "harvested_rules.py")
+TORCH_STUB = os.path.join(ROOT, "myshaping", "stubs", "torch", "__init__.pyi")
+ARRAY_STUB = os.path.join(ROOT, "myshaping", "stubs", "jaxtyping", "_array_types.pyi")
+RULES_MARKER = "# Results are inferred by the rules in myshaping/shape_rules.py."
+HARVESTED_MARKER = "# Results are inferred by the rules in myshaping/harvested_rules.py."
+sys.path.insert(0, ROOT)
+
+import torch
+
+from myshaping.harvested_rules import COVERAGE
+from myshaping.layouts import CONTIGUOUS
+from myshaping.registry import FUNCTION_HOOKS, METHOD_HOOKS
+from myshaping.shape_functions import ShapeError, Unknown
+from myshaping.tensor_method_hooks import array_family
+from myshaping.torch_function_hooks import dtype_mapper
+from myshaping.torch_rule_hooks import HARVESTED_FUNCTION_RULES, HARVESTED_METHOD_RULES, Operand, apply_rule, parse_rule
+from myshaping.type_translator import FixedDim, dtype_masks
+
+_reduce = "(input, dim: dims = None, keepdim: bool = False) -> reduce(input, dim, keepdim)"
+_reduce_int = "(input, dim: int = None, keepdim: bool = False) -> reduce(input, dim, keepdim)"
+_binary = "(input, other: operand) -> broadcast(input, other)"
+# (grid, parameters and result of the rule), in the order they are tried.
+TEMPLATES: List[Tuple[str, str]] = [
+    ("unary", "(input) -> input"),
+    ("unary", "(input) -> input : float(input)"),
+    ("unary", "(input) -> input : bool"),
+    ("binary", f"{_binary} : promote(input, other)"),
+    ("binary", f"{_binary} : div(input, other)"),
+    ("binary", f"{_binary} : bool"),
+    *(("reduce", f"{_reduce}{dtype}") for dtype in ["", " : acc(input)", " : float(input)", " : bool", " : int64"]),
+    *(("reduce_int", f"{_reduce_int}{dtype}") for dtype in ["", " : acc(input)", " : float(input)", " : bool", " : int64"]),
+]
+
+FLOAT32 = torch.float32
+DTYPES = [torch.float64, torch.float16, torch.bfloat16, torch.int64, torch.int32, torch.uint8, torch.bool]
+SHAPES = [(), (3,), (2, 3), (2, 1, 4)]
+PAIRS = [((2, 3), (2, 3)), ((2, 3), (3,)), ((2, 1, 4), (3, 1)), ((), (2, 3))]
+DTYPE_PAIRS = [(torch.int64, FLOAT32), (FLOAT32, torch.int64), (torch.int64, torch.int64), (torch.int32, torch.uint8),
+               (torch.float16, FLOAT32), (torch.bfloat16, torch.float16), (torch.bool, torch.bool), (torch.bool, torch.int64)]
+SCALARS = [0, 2, 2.5, True]
+REDUCED = (2, 3, 4)
+DIMS = [(), (1,), (-1,), (1, True), (-2, False)]
+TUPLE_DIMS = [((0, 2),), ((0, 1), True)]
+
+# A call of the grid: (arguments, whether torch must accept it).
+Sample = Tuple[Tuple[Any, ...], bool]
+
+def _meta(shape, dtype) -> torch.Tensor:
+    return torch.empty(shape, dtype=dtype, device="meta")
+
+def grid(kind: str) -> List[Sample]:
+    """The calls of a grid, those that torch must accept first."""
+    if kind == "unary":
+        return [((_meta(s, FLOAT32),), True) for s in SHAPES] + [((_meta(s, d),), False) for s in SHAPES for d in DTYPES]
+    if kind == "binary":
+        return ([((_meta(x, FLOAT32), _meta(y, FLOAT32)), True) for x, y in PAIRS]
+                # torch promotes a 0-dim tensor like a scalar, which the rules don't model
+                + [((_meta(x, dx), _meta(y, dy)), False) for x, y in PAIRS if x and y for dx, dy in DTYPE_PAIRS]
+                + [((_meta(s, d), c), False) for s in SHAPES[:3] for d in [FLOAT32, *DTYPES] for c in SCALARS])
+    dims = DIMS + TUPLE_DIMS if kind == "reduce" else DIMS
+    return ([((_meta(REDUCED, FLOAT32), *args), True) for args in dims]
+            + [((_meta(REDUCED, d), *args), False) for d in DTYPES for args in dims])
+
+def _mask(dtype: torch.dtype) -> Optional[int]:
+    name = dtype_mapper.get(str(dtype).split(".")[-1])
+    return dtype_masks[name] if name is not None else None
+
+def _value(kind: str, value):
+    """The value of a parameter of the given kind, as the hooks extract it from a mypy type."""
+    if isinstance(value, torch.Tensor):
+        return Operand(_mask(value.dtype), None, tuple(FixedDim(s) for s in value.shape), CONTIGUOUS)
+    if kind == "operand":
+        return Operand(type(value).__name__, None, ())
+    return list(value) if isinstance(value, tuple) else value
+
+def _call(owner: str, name: str, args):
+    if owner == "torch":
+        return getattr(torch, name)(*args)
+    return getattr(args[0], name)(*args[1:])
+
+def fits(owner: str, name: str, line: str, samples: List[Sample]) -> bool:
+    """Whether the rule infers what torch returns for every sample it accepts."""
+    rule = parse_rule(f"torch.{name} {line}")
+    for args, required in samples:
+        try:
+            result = _call(owner, name, args)
+        except Exception:
+            if required:
+                return False
+            continue
+        if not isinstance(result, torch.Tensor) or not result.is_meta or not result.is_contiguous():
+            return False
+        values = [_value(p.kind, args[i] if i < len(args) else p.default) for i, p in enumerate(rule.params)]
+        try:
+            dims, mask = apply_rule(rule, values)
+        except (ShapeError, Unknown, LookupError, TypeError):
+            return False
+        if dims != tuple(FixedDim(s) for s in result.shape) or mask != _mask(result.dtype):
+            return False
+    return True
+
+def native_ops() -> Dict[str, List[str]]:
+    """The public native ops of torch and Tensor, without in-place ops."""
+    functions = [n for n in dir(torch._C._VariableFunctions) if hasattr(torch, n)]
+    methods = [n for n in dir(torch._C.TensorBase) if callable(getattr(torch._C.TensorBase, n))]
+    return {owner: sorted(n for n in names if not n.startswith("_") and not n.endswith("_"))
+            for owner, names in (("torch", functions), ("Tensor", methods))}
+
+def covered() -> Dict[str, set]:
+    """The ops with a hook of their own: hand-written hooks and shape_rules.py."""
+    functions = {n.partition(".")[2] for n in FUNCTION_HOOKS if n.startswith("torch.") and n not in HARVESTED_FUNCTION_RULES}
+    methods = {n.rpartition(".")[2] for n in METHOD_HOOKS if n.startswith(array_family) and n not in HARVESTED_METHOD_RULES}
+    return {"torch": functions, "Tensor": methods}
+
+def _group(names: List[str], prefix: str, line: str, per_line: int = 12) -> List[str]:
+    lines = []
+    for i in range(0, len(names), per_line):
+        chunk = names[i:i + per_line]
+        members = chunk[0] if len(chunk) == 1 else f"{{{','.join(chunk)}}}"
+        lines.append(f"{prefix}.{members} {line}")
+    return lines
+
+def update_stub(path: str, names: List[str], declaration: str):
+    """Declare names in the block after HARVESTED_MARKER, which follows the block of the
+    shape_rules.py ops. Names of builtins are left out: they would shadow the builtin types."""
+    with open(path) as f:
+        lines = f.read().split("\n")
+    start = next(i for i, line in enumerate(lines) if line.strip() == RULES_MARKER)
+    indent = lines[start][:len(lines[start]) - len(lines[start].lstrip())]
+    end = next((i for i in range(start, len(lines)) if not lines[i].strip()), len(lines))
+    if end + 1 < len(lines) and lines[end + 1].strip() == HARVESTED_MARKER:
+        stop = next((i for i in range(end + 1, len(lines)) if not lines[i].strip()), len(lines))
+        del lines[end:stop]
+    declared = {line.split("def ", 1)[1].split("(")[0] for line in lines if line.lstrip().startswith("def ")}
+    block = [f"{indent}{declaration.format(name)}" for name in sorted(names) if name not in declared and not hasattr(builtins, name)]
+    if block:
+        lines[end:end] = ["", f"{indent}{HARVESTED_MARKER}", *block]
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+def harvest(verbose: bool) -> Tuple[List[str], Dict[str, Tuple[int, int, int]]]:
+    ops, hooked = native_ops(), covered()
+    grids = {kind: grid(kind) for kind in {kind for kind, _ in TEMPLATES}}
+    found: Dict[str, Dict[str, List[str]]] = {line: {"torch": [], "Tensor": []} for _, line in TEMPLATES}
+    for owner, names in ops.items():
+        for name in names:
+            if name in hooked[owner]:
+                continue
+            for kind, line in TEMPLATES:
+                if fits(owner, name, line, grids[kind]):
+                    found[line][owner].append(name)
+                    if verbose:
+                        print(f"{owner}.{name} {line}")
+                    break
+    rules = []
+    for _, line in TEMPLATES:
+        functions, methods = found[line]["torch"], found[line]["Tensor"]
+        both = sorted(set(functions) & set(methods))
+        rules += _group(both, "{torch,Tensor}", line)
+        rules += _group([n for n in functions if n not in both], "torch", line)
+        rules += _group([n for n in methods if n not in both], "Tensor", line)
+    coverage = {
+        owner: (len(names), sum(n in hooked[owner] for n in names), sum(len(found[line][owner]) for _, line in TEMPLATES))
+        for owner, names in ops.items()
+    }
+    update_stub(TORCH_STUB, [n for _, line in TEMPLATES for n in found[line]["torch"]], "def {}(*args: Any, **kwargs: Any) -> Tensor: ...")
+    update_stub(ARRAY_STUB, [n for _, line in TEMPLATES for n in found[line]["Tensor"]], "def {}(self, *args: Any, **kwargs: Any) -> Any: ...")
+    return rules, coverage
+
+def _version_key(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) if part.isdigit() else 0 for part in version.split("."))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        rules, coverage = harvest(args.verbose)
+    version = torch.__version__.split("+")[0]
+    versions = {**COVERAGE, version: coverage}
+    with open(OUTPUT, "w") as f:
+        f.write(f'''"""Shape rules of torch {version}, harvested from meta tensors.
+
+Generated by tools/harvest_shape_rules.py. Do not edit. The syntax is that of shape_rules.py;
+torch_rule_hooks compiles the rules of the ops without a hook of their own.
+"""
+
+TORCH_VERSION = "{version}"
+
+RULES = """
+''')
+        f.write("".join(f"{rule}\n" for rule in rules))
+        f.write('''"""
+
+# torch version -> owner -> (public native ops, ops with a hand-written hook, ops with a harvested rule).
+COVERAGE = {
+''')
+        for v in sorted(versions, key=_version_key):
+            counts = ", ".join(f'"{owner}": {versions[v][owner]!r}' for owner in ("torch", "Tensor"))
+            f.write(f'    "{v}": {{{counts}}},\n')
+        f.write("}\n")
+    for v in sorted(versions, key=_version_key):
+        for owner, (total, hand, harvested) in versions[v].items():
+            print(f"torch {v} {owner}: {total} native ops, {hand} with hooks, {harvested} harvested, "
+                  f"{(hand + harvested) / total:.0%} covered")
+
+if __name__ == "__main__":
+    main()